@@ -7,10 +7,13 @@ import os
 import sys
 import yaml
 
+from sample_catalog import SampleCatalog
+from yaml_utils import load
+
 def validate_yaml(content):
     """Validate YAML content"""
     try:
-        yaml.safe_load(content)
+        load(content)
         return True
     except yaml.YAMLError as e:
         print(f"❌ Invalid YAML: {e}")
@@ -82,12 +85,7 @@ def list_samples():
     print("📋 Available Samples:")
     print("=" * 30)
     
-    samples = []
-    for filename in os.listdir(samples_dir):
-        if filename.endswith(('.yaml', '.yml')):
-            display_name = filename.replace('.yaml', '').replace('.yml', '')
-            display_name = display_name.replace('-', ' ').replace('_', ' ').title()
-            samples.append((filename, display_name))
+    samples = [(sample.filename, sample.display_name) for sample in SampleCatalog(samples_dir).list()]
     
     if not samples:
         print("No samples found")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Global admission control for kustomize build subprocesses
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a build cannot get a slot; carries a Retry-After hint in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limits concurrent builds, with a bounded queue of waiters"""
+
+    def __init__(self, limit, max_queue, wait_timeout):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # Moving average of how long a slot is held, used for Retry-After
+        self._avg_hold = 1.0
+
+    @contextmanager
+    def slot(self):
+        """Hold a build slot for the duration of the with-block"""
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def acquire(self):
+        with self._cond:
+            if self.in_flight < self.limit and self.queued == 0:
+                self.in_flight += 1
+                self.admitted += 1
+                return
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected('Server is busy, too many builds queued', self._retry_after())
+
+            self.queued += 1
+            try:
+                ready = self._cond.wait_for(lambda: self.in_flight < self.limit, self.wait_timeout)
+            finally:
+                self.queued -= 1
+            if not ready:
+                self.timed_out += 1
+                raise AdmissionRejected('Server is busy, timed out waiting for a build slot',
+                                        self._retry_after())
+            self.in_flight += 1
+            self.admitted += 1
+
+    def release(self, held=None):
+        with self._cond:
+            self.in_flight -= 1
+            if held is not None:
+                self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'max_queue': self.max_queue,
+                'wait_timeout': self.wait_timeout,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+            }
+
+    def _retry_after(self):
+        """Seconds until the current backlog is likely to drain (caller holds lock)"""
+        backlog = (self.queued + 1) / max(self.limit, 1)
+        return max(1, math.ceil(backlog * self._avg_hold))
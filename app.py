@@ -1,83 +1,681 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
 import subprocess
 import tempfile
 import os
 import yaml
+import hmac
 import json
-import shutil
+import marshal
+import time
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import bundle
+import cache_backends
+import helm_render
+import incremental
+import kustomization_schema
+import manifest_diff
+import manifest_index
+import metrics
+import request_profiler
+import server_timing
+import tool_versions
+import yaml_utils
+from helm_values import chart_set_args, helm_template_command
+
+from admission import AdmissionController, AdmissionRejected
+from chart_cache import ChartCache, ChartCacheError
+from preview import SESSION_ID, PreviewBusy, PreviewHub
+from render_batch import normalize_documents, render_batch
+from render_cache import RenderCache, make_key
+from render_history import RenderHistory
+from render_jobs import JobQueueFull, RenderJobQueue
+from request_profiler import RequestProfiler, UnsafeProfileDir
+from render_stream import CHUNK_SIZE, BuildCancelled, ResourceLimits, StreamingBuild, peer_closed, run_build
+from sample_catalog import SampleCatalog
+from single_flight import SingleFlight
+from workspace_pool import WorkspacePool, default_root
+from yaml_utils import MemoCache, dump, load_cached
 
 app = Flask(__name__)
 
-def _extract_helm_set_args(values_inline, prefix=''):
-    """Extract helm --set arguments from valuesInline dictionary"""
-    helm_args = []
-    
-    for key, value in values_inline.items():
-        current_key = f"{prefix}.{key}" if prefix else key
-        
-        if isinstance(value, dict):
-            # Recursively handle nested dictionaries
-            helm_args.extend(_extract_helm_set_args(value, current_key))
-        elif isinstance(value, bool):
-            # Handle boolean values
-            helm_args.append(f"--set {current_key}={str(value).lower()}")
-        elif isinstance(value, (int, float)):
-            # Handle numeric values
-            helm_args.append(f"--set {current_key}={value}")
+# Cache shared by every replica (a directory on a shared volume or an http:// key-value service; empty disables)
+shared_cache = cache_backends.from_url(
+    os.environ.get('SHARED_CACHE_URL', ''),
+    timeout=float(os.environ.get('SHARED_CACHE_TIMEOUT', '2')),
+    token=os.environ.get('CACHE_BACKEND_TOKEN') or None,
+    ttl=int(os.environ.get('SHARED_CACHE_TTL', '0')) or None,
+    max_bytes=int(os.environ.get('SHARED_CACHE_MAX_BYTES', '0')) or None,
+)
+
+# Render cache settings (RENDER_CACHE_DIR enables the on-disk tier)
+render_cache = RenderCache(
+    max_entries=int(os.environ.get('RENDER_CACHE_MAX_ENTRIES', '256')),
+    max_bytes=int(os.environ.get('RENDER_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    ttl=int(os.environ.get('RENDER_CACHE_TTL', '3600')),
+    disk_dir=os.environ.get('RENDER_CACHE_DIR') or None,
+    disk_max_bytes=int(os.environ.get('RENDER_CACHE_DISK_MAX_BYTES', str(512 * 1024 * 1024))),
+    shared=shared_cache,
+)
+
+# Shared helm chart store (set CHART_CACHE_DIR to an empty string to disable)
+_chart_cache_dir = os.environ.get('CHART_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'kustomize-builder-charts'))
+chart_cache = ChartCache(_chart_cache_dir, shared=shared_cache) if _chart_cache_dir else None
+
+# Render history database (set HISTORY_DB to an empty string to disable)
+_history_db = os.environ.get('HISTORY_DB', os.path.join(tempfile.gettempdir(), 'kustomize-builder-history.sqlite3'))
+render_history = RenderHistory(
+    _history_db,
+    max_age=int(os.environ.get('HISTORY_MAX_AGE', str(7 * 24 * 3600))),
+    max_bytes=int(os.environ.get('HISTORY_MAX_BYTES', str(256 * 1024 * 1024))),
+    max_queue=int(os.environ.get('HISTORY_QUEUE_MAX', '1000')),
+) if _history_db else None
+
+# Sampled request profiles, shared by all workers (set PROFILE_DIR to an empty string to disable)
+_profile_dir = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'kustomize-builder-profiles'))
+try:
+    profiler = RequestProfiler(
+        _profile_dir,
+        max_recent=int(os.environ.get('PROFILE_MAX_RECENT', '200')),
+        max_slowest=int(os.environ.get('PROFILE_MAX_SLOWEST', '20')),
+    ) if _profile_dir else None
+except UnsafeProfileDir as e:
+    # Profiles are unmarshalled: never read a directory someone else could have filled
+    app.logger.warning("Request profiling disabled: %s", e)
+    profiler = None
+
+# Bearer token for the /admin endpoints (unset disables them)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# Stage durations in a Server-Timing header on every response (0 to leave it off)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+
+# Pre-created build directories on /dev/shm, recycled between builds
+workspace_pool = WorkspacePool(
+    size=int(os.environ.get('WORKSPACE_POOL_SIZE', str(2 * (os.cpu_count() or 1)))),
+    root=os.environ.get('WORKSPACE_POOL_DIR') or None,
+)
+
+# Seconds a single kustomize build may run
+BUILD_TIMEOUT = float(os.environ.get('BUILD_TIMEOUT', '30'))
+
+# Limits for each build's processes (kustomize, helm); 0 disables a limit
+BUILD_LIMITS = ResourceLimits(
+    cpu_seconds=int(os.environ.get('BUILD_CPU_SECONDS', '60')),
+    address_space_bytes=int(os.environ.get('BUILD_MEMORY_LIMIT_MB', '4096')) * 1024 * 1024,
+    max_output_bytes=int(os.environ.get('BUILD_MAX_OUTPUT_MB', '64')) * 1024 * 1024,
+)
+
+# Global limit on concurrent kustomize processes, with a bounded wait queue
+build_admission = AdmissionController(
+    limit=int(os.environ.get('BUILD_MAX_CONCURRENCY', str(os.cpu_count() or 1))),
+    max_queue=int(os.environ.get('BUILD_MAX_QUEUE', '16')),
+    wait_timeout=float(os.environ.get('BUILD_QUEUE_TIMEOUT', '10')),
+)
+
+# Prometheus metrics, served at /metrics
+metrics_registry = metrics.Registry()
+REQUEST_SECONDS = metrics_registry.histogram(
+    'kustomize_builder_request_duration_seconds',
+    'Time to produce a response (time to first byte for streamed routes)',
+    ['route', 'method', 'status'])
+STAGE_SECONDS = metrics_registry.histogram(
+    'kustomize_builder_stage_duration_seconds',
+    'Time spent in each stage of a render or validation',
+    ['operation', 'stage'],
+    # Stages also go into the Server-Timing header of the request running them
+    on_observe=lambda seconds, labels: server_timing.record(labels[1], seconds))
+SUBPROCESS_EXITS = metrics_registry.counter(
+    'kustomize_builder_subprocess_exits_total',
+    'Finished kustomize processes by exit code',
+    ['code'])
+SUBPROCESS_TIMEOUTS = metrics_registry.counter(
+    'kustomize_builder_subprocess_timeouts_total',
+    'kustomize processes killed after BUILD_TIMEOUT')
+BUILDS_CANCELLED = metrics_registry.counter(
+    'kustomize_builder_builds_cancelled_total',
+    'Builds killed because nobody was waiting for the result any more')
+HELM_FAST_PATH_RENDERS = metrics_registry.counter(
+    'kustomize_builder_helm_fast_path_total',
+    'Pure-helm renders by outcome (rendered, fallback, and match/mismatch in verify mode)',
+    ['outcome'])
+RENDERS_IN_FLIGHT = metrics_registry.gauge(
+    'kustomize_builder_renders_in_flight',
+    'Renders in progress, including cache lookups')
+BUILDS_IN_FLIGHT = metrics_registry.gauge(
+    'kustomize_builder_builds_in_flight',
+    'kustomize processes currently running')
+SCHEMA_REJECTIONS = metrics_registry.counter(
+    'kustomize_builder_schema_rejections_total',
+    'Requests answered by the schema pre-flight check without running kustomize',
+    ['operation'])
+OUTPUT_BYTES = metrics_registry.histogram(
+    'kustomize_builder_render_output_bytes',
+    'Size of successful render output',
+    ['cache'], buckets=metrics.SIZE_BUCKETS)
+
+# Tool version probe results are kept across restarts (empty string disables)
+TOOL_VERSIONS_CACHE = os.environ.get(
+    'TOOL_VERSIONS_CACHE', os.path.join(tempfile.gettempdir(), 'kustomize-builder-tool-versions.json'))
+
+@lru_cache(maxsize=1)
+def _tool_versions():
+    """Return the kustomize and helm versions, probed once per process"""
+    return tool_versions.probe(TOOL_VERSIONS_CACHE or None)
+
+def _create_workspace(yaml_content, extra_files=None):
+    """Create a scratch build directory holding yaml_content as kustomization.yaml
+
+    extra_files maps file names to contents written next to it.
+    """
+    # Take a scratch directory for kustomize build from the workspace pool
+    with STAGE_SECONDS.time('render', 'workspace'):
+        temp_dir = workspace_pool.acquire()
+    try:
+        kustomization_file = os.path.join(temp_dir, 'kustomization.yaml')
+        
+        # Write the YAML content to kustomization.yaml
+        with STAGE_SECONDS.time('render', 'write_files'):
+            with open(kustomization_file, 'w') as f:
+                f.write(yaml_content)
+            for filename, content in (extra_files or {}).items():
+                with open(os.path.join(temp_dir, filename), 'w') as f:
+                    f.write(content)
+        
+        # Link cached helm charts so kustomize does not pull them again
+        if chart_cache is not None:
+            try:
+                with STAGE_SECONDS.time('render', 'chart_prepare'):
+                    chart_cache.prepare_workspace(load_cached(yaml_content), temp_dir)
+            except (yaml.YAMLError, ChartCacheError, OSError) as e:
+                app.logger.warning("Chart cache unavailable, kustomize will pull charts itself: %s", e)
+    except Exception:
+        workspace_pool.release(temp_dir)
+        raise
+    return temp_dir
+
+def _kustomize_command(temp_dir):
+    return ['kustomize', 'build', '--enable-helm', temp_dir]
+
+# Pure-helm kustomizations skip kustomize and run `helm template` directly: on, off, or verify
+# (render both ways, serve kustomize's output and count any difference).  Off until verify mode has
+# shown byte-identical output against the real kustomize and helm binaries
+HELM_FAST_PATH = os.environ.get('HELM_FAST_PATH', 'off')
+
+def _run_kustomize_build(yaml_content, extra_files=None, should_abort=None):
+    """Run kustomize build on yaml_content in a scratch directory
+
+    The build runs in its own process group under BUILD_LIMITS; it is killed
+    at BUILD_TIMEOUT or as soon as should_abort() returns true.  Pure-helm
+    kustomizations are rendered by helm directly unless HELM_FAST_PATH is off.
+    """
+    fast = None
+    if HELM_FAST_PATH != 'off' and not extra_files:
+        fast = _run_helm_template(yaml_content, should_abort)
+        if fast is not None and HELM_FAST_PATH != 'verify':
+            return fast
+    
+    temp_dir = _create_workspace(yaml_content, extra_files)
+    try:
+        result = _build_directory(temp_dir, should_abort)
+    finally:
+        # Scrub the workspace and hand it back to the pool
+        with STAGE_SECONDS.time('render', 'cleanup'):
+            workspace_pool.release(temp_dir)
+    if fast is not None and result.returncode == 0:
+        if fast.stdout == result.stdout:
+            HELM_FAST_PATH_RENDERS.inc('match')
         else:
-            # Handle string values
-            helm_args.append(f"--set {current_key}={value}")
+            HELM_FAST_PATH_RENDERS.inc('mismatch')
+            app.logger.warning("helm fast path output differs from kustomize (%d vs %d bytes)",
+                               len(fast.stdout), len(result.stdout))
+    return result
+
+def _run_helm_template(yaml_content, should_abort=None):
+    """Render a pure-helm kustomization with `helm template`, as kustomize would
+
+    Returns a CompletedProcess, or None when kustomize has to build the
+    document: it is not pure helm, a chart is not in the chart cache, or
+    helm failed (kustomize then reports the error in its own words).
+    """
+    if chart_cache is None:
+        return None
+    try:
+        charts = helm_render.plan(load_cached(yaml_content))
+    except yaml.YAMLError:
+        return None
+    if charts is None:
+        return None
+    try:
+        with STAGE_SECONDS.time('render', 'chart_prepare'):
+            chart_dirs = [chart_cache.ensure(chart['repo'], str(chart['name']), str(chart['version']))
+                          for chart in charts]
+    except ChartCacheError as e:
+        app.logger.warning("Chart cache unavailable, falling back to kustomize: %s", e)
+        HELM_FAST_PATH_RENDERS.inc('fallback')
+        return None
+    
+    with STAGE_SECONDS.time('render', 'workspace'):
+        temp_dir = workspace_pool.acquire()
+    try:
+        with STAGE_SECONDS.time('render', 'admission_wait'):
+            build_admission.acquire()
+        started = time.monotonic()
+        outputs = []
+        try:
+            with STAGE_SECONDS.time('render', 'helm'), BUILDS_IN_FLIGHT.track():
+                for index, (chart, chart_dir) in enumerate(zip(charts, chart_dirs)):
+                    values_file = os.path.join(temp_dir, f"values-{index}.yaml")
+                    with open(values_file, 'w') as f:
+                        f.write(helm_render.values_yaml(chart))
+                    # All charts share one BUILD_TIMEOUT, like a single kustomize build
+                    result = run_build(
+                        helm_render.template_command(chart, chart_dir, values_file),
+                        max(BUILD_TIMEOUT - (time.monotonic() - started), 0.001),
+                        limits=BUILD_LIMITS,
+                        should_abort=should_abort
+                    )
+                    SUBPROCESS_EXITS.inc(str(result.returncode))
+                    if result.returncode != 0:
+                        HELM_FAST_PATH_RENDERS.inc('fallback')
+                        return None
+                    outputs.append(result.stdout)
+        except subprocess.TimeoutExpired:
+            SUBPROCESS_TIMEOUTS.inc()
+            raise
+        except BuildCancelled:
+            BUILDS_CANCELLED.inc()
+            raise
+        finally:
+            build_admission.release(time.monotonic() - started)
+    finally:
+        with STAGE_SECONDS.time('render', 'cleanup'):
+            workspace_pool.release(temp_dir)
     
-    return helm_args
+    try:
+        with STAGE_SECONDS.time('render', 'helm_serialize'):
+            output = helm_render.kustomize_output(outputs)
+    except (helm_render.NotPureHelm, yaml.YAMLError) as e:
+        app.logger.info("helm output needs kustomize, falling back: %s", e)
+        HELM_FAST_PATH_RENDERS.inc('fallback')
+        return None
+    HELM_FAST_PATH_RENDERS.inc('rendered')
+    return subprocess.CompletedProcess(['helm', 'template'], 0, output, '')
+
+def _build_directory(build_dir, should_abort=None):
+    """Run kustomize build on a prepared directory once an admission slot is free"""
+    with STAGE_SECONDS.time('render', 'admission_wait'):
+        build_admission.acquire()
+    started = time.monotonic()
+    try:
+        # Run kustomize build command on the directory
+        with STAGE_SECONDS.time('render', 'kustomize'), BUILDS_IN_FLIGHT.track():
+            result = run_build(
+                _kustomize_command(build_dir),
+                BUILD_TIMEOUT,
+                limits=BUILD_LIMITS,
+                should_abort=should_abort
+            )
+    except subprocess.TimeoutExpired:
+        SUBPROCESS_TIMEOUTS.inc()
+        raise
+    except BuildCancelled:
+        BUILDS_CANCELLED.inc()
+        raise
+    finally:
+        build_admission.release(time.monotonic() - started)
+    SUBPROCESS_EXITS.inc(str(result.returncode))
+    return result
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # Paging a summary needs follow-up requests to find the render whichever worker they reach
+    return render_template('index.html', summary_renders=_renders_shared())
+
+# Render helmCharts entries as separately cached units unless a request says otherwise
+INCREMENTAL_RENDER = os.environ.get('INCREMENTAL_RENDER', '0') == '1'
+
+def _render_incremental(document, charts, should_abort=None):
+    """Render each chart as a cached unit, then merge them with the rest of the kustomization
+
+    Returns (result, cache_status) where result looks like subprocess.run's.
+    """
+    unit_sources = [incremental.unit_yaml(document, chart) for chart in charts]
+    unit_keys = [make_key(source, _tool_versions()) for source in unit_sources]
+    outputs = [render_cache.get(key) for key in unit_keys]
+    pending = [index for index, output in enumerate(outputs) if output is None]
+    
+    # Only the charts whose entries changed are re-templated, in parallel
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(len(pending), os.cpu_count() or 1)) as executor:
+            results = list(executor.map(
+                lambda index: _run_kustomize_build(unit_sources[index], should_abort=should_abort), pending))
+        for index, result in zip(pending, results):
+            if result.returncode != 0:
+                return result, 'MISS'
+            render_cache.put(unit_keys[index], result.stdout)
+            outputs[index] = result.stdout
+    cache_status = 'MISS' if len(pending) == len(charts) else 'PARTIAL'
+    
+    if len(charts) == 1 and incremental.is_helm_only(document):
+        return subprocess.CompletedProcess([], 0, outputs[0], ''), cache_status
+    
+    unit_files = {incremental.UNIT_FILE_TEMPLATE.format(index=index): output
+                  for index, output in enumerate(outputs)}
+    merged = _run_kustomize_build(incremental.merge_yaml(document, len(charts)), unit_files, should_abort)
+    return merged, cache_status
+
+# Identical renders that overlap in time share one kustomize build
+render_flights = SingleFlight()
+
+def _render(yaml_content, incremental_mode=None, should_abort=None):
+    """Render yaml_content through the render cache
+
+    Returns the /generate response payload and the cache status (HIT, MISS,
+    PARTIAL when an incremental render reused some cached charts, or
+    COALESCED when an identical render already in progress was joined).
+    should_abort() is polled while kustomize runs; the build is killed when
+    it returns true and no coalesced request is waiting for the result.
+    """
+    with RENDERS_IN_FLIGHT.track():
+        payload, cache_status = _render_payload(yaml_content, incremental_mode, should_abort)
+    if payload['success']:
+        OUTPUT_BYTES.observe(len(payload['output']), cache_status)
+    return payload, cache_status
+
+def _render_payload(yaml_content, incremental_mode, should_abort):
+    return _render_keyed(
+        make_key(yaml_content, _tool_versions()),
+        lambda abort: _build_result(yaml_content, incremental_mode, abort),
+        should_abort)
+
+def _render_keyed(cache_key, build, should_abort):
+    """Serve cache_key from the render cache, or run build(should_abort) once for all concurrent callers"""
+    # Serve identical renders from the cache without forking kustomize
+    with STAGE_SECONDS.time('render', 'cache_lookup'):
+        cached_output = render_cache.get(cache_key)
+    if cached_output is not None:
+        return {
+            'success': True,
+            'output': cached_output,
+            'error': None
+        }, 'HIT'
+    
+    # Join an identical build that is already running instead of forking another
+    abandoned = None
+    if should_abort is not None:
+        def abandoned():
+            # Coalesced requests still want the result even if the first client left
+            return should_abort() and not render_flights.has_waiters(cache_key)
+    try:
+        # A cancelled build is this client's alone: anyone waiting on it runs the build again
+        (payload, cache_status), leader = render_flights.do(
+            cache_key, lambda: _build_payload(lambda: build(abandoned), cache_key), private=(BuildCancelled,))
+    except BuildCancelled:
+        return {
+            'success': False,
+            'output': None,
+            'error': 'Build cancelled because the client disconnected.'
+        }, 'MISS'
+    return payload, cache_status if leader else 'COALESCED'
+
+def _build_result(yaml_content, incremental_mode, should_abort=None):
+    """Build yaml_content, per chart when incremental; returns (CompletedProcess, cache_status)"""
+    if incremental_mode is None:
+        incremental_mode = INCREMENTAL_RENDER
+    
+    charts = None
+    if incremental_mode:
+        try:
+            document = load_cached(yaml_content)
+            charts = incremental.plan_units(document)
+        except yaml.YAMLError:
+            pass
+    if charts:
+        return _render_incremental(document, charts, should_abort)
+    return _run_kustomize_build(yaml_content, should_abort=should_abort), 'MISS'
+
+def _build_payload(build, cache_key):
+    """Run build() and turn its outcome into a /generate payload, caching successful output"""
+    try:
+        result, cache_status = build()
+    except subprocess.TimeoutExpired:
+        return {
+            'success': False,
+            'output': None,
+            'error': 'Build timed out. Please check your YAML configuration.'
+        }, 'MISS'
+    
+    if result.returncode == 0:
+        render_cache.put(cache_key, result.stdout)
+        return {
+            'success': True,
+            'output': result.stdout,
+            'error': None
+        }, cache_status
+    else:
+        return {
+            'success': False,
+            'output': None,
+            'error': result.stderr
+        }, cache_status
+
+def _client_abort_check():
+    """Return a should_abort callable that turns true once the client disconnects, or None"""
+    client_socket = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+    if client_socket is None:
+        return None
+    return lambda: peer_closed(client_socket)
+
+def _record_history(route, input_text, payload, cache_status, started, sample=None, input_hash=None):
+    """Queue a finished render for the history database; the write happens on another thread"""
+    if render_history is None:
+        return
+    render_history.record(
+        route, input_text, payload['output'], payload['success'], error=payload['error'],
+        cache=cache_status, duration=time.monotonic() - started, sample=sample, input_hash=input_hash)
+
+def _sample_name():
+    """The request's optional sample name, which names the render in the history"""
+    sample = request.json.get('sample')
+    if sample is None:
+        return None
+    if not isinstance(sample, str):
+        raise ValueError("'sample' must be a string")
+    try:
+        # SQLite stores UTF-8; a lone surrogate from a JSON escape has no encoding
+        sample.encode('utf-8')
+    except UnicodeEncodeError:
+        raise ValueError("'sample' must be valid Unicode text")
+    return sample
+
+# Check kustomizations against the Kustomization schema in-process before building (0 to disable)
+SCHEMA_PREFLIGHT = os.environ.get('SCHEMA_PREFLIGHT', '1') == '1'
+
+def _preflight(yaml_content, operation):
+    """Syntax and schema errors of yaml_content with line and column, or None if it may be built"""
+    if not SCHEMA_PREFLIGHT:
+        return None
+    with STAGE_SECONDS.time(operation, 'parse'):
+        try:
+            # Parsed once here; the check, cache key and build reuse the document
+            load_cached(yaml_content)
+        except yaml.YAMLError:
+            pass
+    with STAGE_SECONDS.time(operation, 'preflight'):
+        errors = kustomization_schema.errors(yaml_content)
+    if not errors:
+        return None
+    SCHEMA_REJECTIONS.inc(operation)
+    return errors
 
 @app.route('/generate', methods=['POST'])
 def generate():
     try:
         # Get the YAML content from the request
+        with STAGE_SECONDS.time('render', 'request_parse'):
+            yaml_content = request.json.get('yaml_content', '')
+            try:
+                sample = _sample_name()
+            except ValueError as e:
+                return jsonify({'success': False, 'output': None, 'error': str(e)}), 400
+        started = time.monotonic()
+        
+        # Mistakes the schema catches cost no workspace, chart download or kustomize process
+        errors = _preflight(yaml_content, 'render')
+        if errors:
+            payload = {
+                'success': False,
+                'output': None,
+                'error': kustomization_schema.describe(errors),
+                'errors': errors
+            }
+            _record_history('/generate', yaml_content, payload, 'INVALID', started, sample)
+            with STAGE_SECONDS.time('render', 'serialize'):
+                response = jsonify(payload)
+            response.headers['X-Render-Cache'] = 'INVALID'
+            return response
+        
+        # Stop the build if the browser goes away before it finishes
+        payload, cache_status = _render(yaml_content, request.json.get('incremental'), _client_abort_check())
+        _record_history('/generate', yaml_content, payload, cache_status, started, sample)
+        if request.json.get('summary') and payload['success']:
+            # Send the index summary instead of the manifest; clients page through /renders/<render_id>
+            render_id = make_key(yaml_content, _tool_versions())
+            index = _remember_index(render_id, payload['output'])
+            payload = dict(payload, output=None, render_id=render_id, summary=index.summary())
+        with STAGE_SECONDS.time('render', 'serialize'):
+            response = jsonify(payload)
+        response.headers['X-Render-Cache'] = cache_status
+        return response
+    except AdmissionRejected as e:
+        response = jsonify({
+            'success': False,
+            'output': None,
+            'error': str(e)
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'output': None,
+            'error': str(e)
+        })
+
+# Streamed output is also kept for the render cache while it stays below this many characters
+STREAM_CACHE_LIMIT = int(os.environ.get('STREAM_CACHE_LIMIT', str(8 * 1024 * 1024)))
+
+def _ndjson_response(lines, cache_status=None):
+    """Wrap an iterator of NDJSON lines in an unbuffered streaming response"""
+    response = Response(lines, mimetype='application/x-ndjson')
+    # Tell nginx to pass each line through as soon as it is written
+    response.headers['X-Accel-Buffering'] = 'no'
+    if cache_status:
+        response.headers['X-Render-Cache'] = cache_status
+    return response
+
+def _chunk_frame(text):
+    return json.dumps({'type': 'chunk', 'data': text}) + '\n'
+
+def _end_frame(success, returncode, error):
+    return json.dumps({'type': 'end', 'success': success, 'returncode': returncode, 'error': error}) + '\n'
+
+def _start_streaming_build(yaml_content):
+    """Take a build slot and a workspace and start kustomize with stdout piped
+
+    Both are released when the returned StreamingBuild is closed.
+    """
+    build_admission.acquire()
+    started = time.monotonic()
+    temp_dir = None
+    
+    def cleanup():
+        if temp_dir:
+            workspace_pool.release(temp_dir)
+        build_admission.release(time.monotonic() - started)
+    
+    try:
+        temp_dir = _create_workspace(yaml_content)
+        return StreamingBuild(_kustomize_command(temp_dir), BUILD_TIMEOUT, on_close=[cleanup], limits=BUILD_LIMITS)
+    except Exception:
+        cleanup()
+        raise
+
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """Render like /generate, streaming kustomize stdout as NDJSON chunk frames
+
+    The last frame has type "end" and carries success, exit status and stderr.
+    """
+    try:
         yaml_content = request.json.get('yaml_content', '')
+        try:
+            sample = _sample_name()
+        except ValueError as e:
+            return jsonify({'success': False, 'output': None, 'error': str(e)}), 400
+        started = time.monotonic()
         
-        # Create a temporary directory for kustomize build
-        temp_dir = tempfile.mkdtemp()
-        kustomization_file = os.path.join(temp_dir, 'kustomization.yaml')
+        cache_key = make_key(yaml_content, _tool_versions())
+        cached_output = render_cache.get(cache_key)
+        if cached_output is not None:
+            _record_history('/generate/stream', yaml_content,
+                            {'success': True, 'output': cached_output, 'error': None}, 'HIT', started, sample)
+            
+            def replay():
+                for start in range(0, len(cached_output), CHUNK_SIZE):
+                    yield _chunk_frame(cached_output[start:start + CHUNK_SIZE])
+                yield _end_frame(True, 0, None)
+            return _ndjson_response(replay(), 'HIT')
         
-        # Write the YAML content to kustomization.yaml
-        with open(kustomization_file, 'w') as f:
-            f.write(yaml_content)
+        # Take the build slot up front so a busy server can still answer 429
+        build = _start_streaming_build(yaml_content)
         
-        # Run kustomize build command on the directory
-        result = subprocess.run(
-            ['kustomize', 'build', '--enable-helm', temp_dir],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        
-        # Clean up the temporary directory
-        shutil.rmtree(temp_dir)
-        
-        if result.returncode == 0:
-            return jsonify({
-                'success': True,
-                'output': result.stdout,
-                'error': None
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'output': None,
-                'error': result.stderr
-            })
+        def frames():
+            kept, kept_size = [], 0
+            for text in build.iter_stdout():
+                if kept is not None:
+                    kept_size += len(text)
+                    if kept_size <= STREAM_CACHE_LIMIT:
+                        kept.append(text)
+                    else:
+                        kept = None
+                yield _chunk_frame(text)
             
-    except subprocess.TimeoutExpired:
-        return jsonify({
+            success = build.returncode == 0 and not build.timed_out and not build.truncated
+            if build.timed_out:
+                SUBPROCESS_TIMEOUTS.inc()
+            else:
+                SUBPROCESS_EXITS.inc(str(build.returncode))
+            if success:
+                OUTPUT_BYTES.observe(kept_size, 'MISS')
+            if success and kept is not None:
+                render_cache.put(cache_key, ''.join(kept))
+            if build.timed_out:
+                error = 'Build timed out. Please check your YAML configuration.'
+            else:
+                error = None if success else build.stderr
+            # Output beyond STREAM_CACHE_LIMIT was never kept, so history only has its outcome
+            output = ''.join(kept) if success and kept is not None else None
+            _record_history('/generate/stream', yaml_content,
+                            {'success': success, 'output': output, 'error': error}, 'MISS', started, sample)
+            yield _end_frame(success, build.returncode, error)
+        
+        response = _ndjson_response(frames(), 'MISS')
+        # Runs even if the client disconnects mid-stream: kills kustomize, frees the workspace and slot
+        response.call_on_close(build.close)
+        return response
+    except AdmissionRejected as e:
+        response = jsonify({
             'success': False,
             'output': None,
-            'error': 'Build timed out. Please check your YAML configuration.'
+            'error': str(e)
         })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
     except Exception as e:
         return jsonify({
             'success': False,
@@ -85,20 +683,254 @@ def generate():
             'error': str(e)
         })
 
-@app.route('/validate', methods=['POST'])
-def validate():
+def _render_preview(yaml_content, token):
+    """Render for a live preview session; cancelling token kills the build
+
+    Returns (payload, cache_status) like _render, or None once cancelled.
+    """
+    cache_key = make_key(yaml_content, _tool_versions())
+    cached_output = render_cache.get(cache_key)
+    if cached_output is not None:
+        return {
+            'success': True,
+            'output': cached_output,
+            'error': None
+        }, 'HIT'
+    if token.cancelled:
+        return None
+    
+    build = _start_streaming_build(yaml_content)
+    token.on_cancel(build.cancel)
     try:
-        yaml_content = request.json.get('yaml_content', '')
-        yaml.safe_load(yaml_content)
+        output = ''.join(build.iter_stdout())
+    finally:
+        build.close()
+    if build.cancelled:
+        return None
+    
+    if build.timed_out:
+        SUBPROCESS_TIMEOUTS.inc()
+        return {
+            'success': False,
+            'output': None,
+            'error': 'Build timed out. Please check your YAML configuration.'
+        }, 'MISS'
+    SUBPROCESS_EXITS.inc(str(build.returncode))
+    if build.returncode == 0:
+        render_cache.put(cache_key, output)
+        return {
+            'success': True,
+            'output': output,
+            'error': None
+        }, 'MISS'
+    return {
+        'success': False,
+        'output': None,
+        'error': build.stderr
+    }, 'MISS'
+
+# Live preview: edits are debounced for PREVIEW_DEBOUNCE seconds and superseded builds are killed
+preview_hub = PreviewHub(
+    _render_preview,
+    spool_dir=os.environ.get('PREVIEW_SPOOL_DIR') or os.path.join(default_root(), 'kustomize-builder-preview'),
+    debounce=float(os.environ.get('PREVIEW_DEBOUNCE', '0.3')),
+    max_sessions=int(os.environ.get('PREVIEW_MAX_SESSIONS', '64')),
+)
+
+@app.route('/preview/<session_id>', methods=['POST'])
+def submit_preview(session_id):
+    """Post the editor's current YAML as a new revision of a live preview session"""
+    if not SESSION_ID.match(session_id):
+        return jsonify({'error': 'Invalid session id'}), 400
+    try:
+        revision = request.json.get('revision')
+        if revision is not None and not isinstance(revision, int):
+            return jsonify({'error': 'revision must be an integer'}), 400
+        accepted = preview_hub.submit(session_id, request.json.get('yaml_content', ''), revision)
+        return jsonify({'accepted': accepted is not None, 'revision': accepted}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/preview/<session_id>/events', methods=['GET'])
+def preview_events(session_id):
+    """Server-Sent Events stream of the session's render results, latest revision only"""
+    if not SESSION_ID.match(session_id):
+        return jsonify({'error': 'Invalid session id'}), 400
+    try:
+        events = preview_hub.events(session_id)
+    except PreviewBusy as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+    response = Response(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Limits for uploaded kustomize trees (keep BUNDLE_MAX_BYTES within nginx's client_max_body_size)
+BUNDLE_LIMITS = bundle.BundleLimits(
+    max_bytes=int(os.environ.get('BUNDLE_MAX_BYTES', str(10 * 1024 * 1024))),
+    max_extracted_bytes=int(os.environ.get('BUNDLE_MAX_EXTRACTED_BYTES', str(64 * 1024 * 1024))),
+    max_files=int(os.environ.get('BUNDLE_MAX_FILES', '1000')),
+)
+
+def _prepare_bundle_charts(kustomization_file):
+    """Link cached helm charts next to the overlay's kustomization file"""
+    if chart_cache is None:
+        return
+    try:
+        with open(kustomization_file, encoding='utf-8') as f:
+            document = load_cached(f.read())
+        with STAGE_SECONDS.time('bundle', 'chart_prepare'):
+            chart_cache.prepare_workspace(document, os.path.dirname(kustomization_file))
+    except (yaml.YAMLError, ChartCacheError, OSError, UnicodeDecodeError) as e:
+        app.logger.warning("Chart cache unavailable, kustomize will pull charts itself: %s", e)
+
+@app.route('/generate/bundle', methods=['POST'])
+def generate_bundle():
+    """Render one directory of an uploaded tar or zip kustomize tree
+
+    The archive is the raw request body, extracted as it arrives; ?path=
+    names the directory to build (default: the bundle root).  The response
+    is /generate's payload plus the bundle's content digest.
+    """
+    try:
+        overlay = bundle.safe_path(request.args.get('path', ''))
+        started = time.monotonic()
+        if (request.content_length or 0) > BUNDLE_LIMITS.max_bytes:
+            raise bundle.BundleTooLarge(f"Bundle exceeds the {BUNDLE_LIMITS.max_bytes} byte upload limit")
         
-        # Generate a sample directory name for display
-        sample_dir = "my-kustomization"
+        with STAGE_SECONDS.time('bundle', 'workspace'):
+            temp_dir = workspace_pool.acquire()
+        try:
+            with STAGE_SECONDS.time('bundle', 'extract'):
+                digest, file_count = bundle.extract(request.stream, temp_dir, BUNDLE_LIMITS)
+            kustomization_file = bundle.find_kustomization(temp_dir, overlay)
+            
+            # Keyed on content, so re-uploading an unchanged tree skips kustomize
+            def build(should_abort):
+                _prepare_bundle_charts(kustomization_file)
+                return _build_directory(os.path.dirname(kustomization_file), should_abort), 'MISS'
+            
+            with RENDERS_IN_FLIGHT.track():
+                payload, cache_status = _render_keyed(
+                    bundle.cache_key(digest, overlay, _tool_versions()), build, _client_abort_check())
+        finally:
+            with STAGE_SECONDS.time('bundle', 'cleanup'):
+                workspace_pool.release(temp_dir)
+        if payload['success']:
+            OUTPUT_BYTES.observe(len(payload['output']), cache_status)
         
-        # Generate the kustomize build command
-        build_command = f"kustomize build --enable-helm {sample_dir}"
+        _record_history('/generate/bundle', None, payload, cache_status, started, input_hash=digest)
         
-        # Generate bash script with EOF
-        bash_script = f"""#!/bin/bash
+        response = jsonify(dict(payload, bundle_digest=digest, files=file_count))
+        response.headers['X-Render-Cache'] = cache_status
+        response.headers['X-Bundle-Digest'] = digest
+        return response
+    except bundle.BundleError as e:
+        return jsonify({
+            'success': False,
+            'output': None,
+            'error': str(e)
+        }), 413 if isinstance(e, bundle.BundleTooLarge) else 400
+    except AdmissionRejected as e:
+        response = jsonify({
+            'success': False,
+            'output': None,
+            'error': str(e)
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'output': None,
+            'error': str(e)
+        })
+
+# Largest batch accepted by /generate/batch and how many renders it runs at once
+BATCH_MAX_DOCUMENTS = int(os.environ.get('BATCH_MAX_DOCUMENTS', '200'))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', '0')) or None
+
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """Render a list of kustomizations in parallel, streaming NDJSON as each finishes"""
+    try:
+        documents = normalize_documents(request.json.get('documents', []))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    if len(documents) > BATCH_MAX_DOCUMENTS:
+        return jsonify({'error': f"Batch exceeds {BATCH_MAX_DOCUMENTS} documents"}), 400
+    
+    def stream():
+        succeeded = 0
+        for item in render_batch(lambda yaml_content: _render(yaml_content)[0], documents, BATCH_WORKERS):
+            succeeded += 1 if item['success'] else 0
+            yield json.dumps(item) + '\n'
+        # Final frame so clients know the stream is complete
+        yield json.dumps({
+            'done': True,
+            'total': len(documents),
+            'succeeded': succeeded,
+            'failed': len(documents) - succeeded
+        }) + '\n'
+    
+    return _ndjson_response(stream())
+
+# Background render jobs (RENDER_WORKERS defaults to the host's CPU count)
+render_jobs = RenderJobQueue(
+    lambda yaml_content: _render(yaml_content)[0],
+    workers=int(os.environ.get('RENDER_WORKERS', '0')) or None,
+    max_queue=int(os.environ.get('RENDER_QUEUE_MAX', '1000')),
+)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a render and return its job id immediately"""
+    try:
+        yaml_content = request.json.get('yaml_content', '')
+        job = render_jobs.submit(yaml_content)
+        return jsonify({'job_id': job.id, 'status': job.status}), 202
+    except JobQueueFull as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a render job; ?wait=<seconds> long-polls until it finishes"""
+    wait = min(request.args.get('wait', 0, type=float), 30.0)
+    job = render_jobs.wait(job_id, wait)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/stats', methods=['GET'])
+def get_job_stats():
+    """Get worker pool, queue depth and wait time statistics"""
+    return jsonify(render_jobs.stats())
+
+def _validate_payload(yaml_content):
+    """Build the /validate response for yaml_content from a single parse"""
+    try:
+        with STAGE_SECONDS.time('validate', 'parse'):
+            yaml_data = load_cached(yaml_content)
+    except yaml.YAMLError as e:
+        return {'valid': False, 'error': str(e), 'errors': _preflight(yaml_content, 'validate')}
+    errors = _preflight(yaml_content, 'validate')
+    if errors:
+        return {'valid': False, 'error': kustomization_schema.describe(errors), 'errors': errors}
+    
+    # Generate a sample directory name for display
+    sample_dir = "my-kustomization"
+    
+    # Generate the kustomize build command
+    build_command = f"kustomize build --enable-helm {sample_dir}"
+    
+    # Generate bash script with EOF
+    bash_script = f"""#!/bin/bash
 
 # Create directory
 mkdir -p {sample_dir}
@@ -112,25 +944,29 @@ EOF
 kustomize build --enable-helm {sample_dir}
 """
 
-        # Parse YAML to extract valuesInline for dynamic helm template
-        try:
-            yaml_data = yaml.safe_load(yaml_content)
-            helm_set_args = []
-            
-            # Extract valuesInline from the first helmChart
-            if 'helmCharts' in yaml_data and len(yaml_data['helmCharts']) > 0:
-                first_chart = yaml_data['helmCharts'][0]
-                if 'valuesInline' in first_chart:
-                    values_inline = first_chart['valuesInline']
-                    helm_set_args = _extract_helm_set_args(values_inline)
-            
-            # Generate helm template script with dynamic set arguments
-            helm_set_string = ' '.join(helm_set_args) if helm_set_args else '--set name=qoin-be-client-manager --set port=8086 --set image.repo=loyaltolpi/qoin-be-client-manager --set image.tag=2e6d963 --set privateReg.enabled=true --set secretName=regcred --set selector.enabled=true --set nodeSelector.nodetype=front'
-            
-            # Generate values.yaml content from valuesInline
-            values_yaml = yaml.dump(values_inline, default_flow_style=False, indent=2) if 'valuesInline' in first_chart else ""
-            
-            helm_script = f"""#!/bin/bash
+    # Flatten every chart's valuesInline in one pass
+    with STAGE_SECONDS.time('validate', 'helm_args'):
+        charts_with_args = chart_set_args(yaml_data)
+        helm_commands = [helm_template_command(chart, args) for chart, args in charts_with_args]
+
+    # Parse YAML to extract valuesInline for dynamic helm template
+    try:
+        helm_set_args = []
+        
+        # Extract valuesInline from the first helmChart
+        if 'helmCharts' in yaml_data and len(yaml_data['helmCharts']) > 0:
+            first_chart = yaml_data['helmCharts'][0]
+            if 'valuesInline' in first_chart:
+                values_inline = first_chart['valuesInline']
+                helm_set_args = charts_with_args[0][1]
+        
+        # Generate helm template script with dynamic set arguments
+        helm_set_string = ' '.join(helm_set_args) if helm_set_args else '--set name=qoin-be-client-manager --set port=8086 --set image.repo=loyaltolpi/qoin-be-client-manager --set image.tag=2e6d963 --set privateReg.enabled=true --set secretName=regcred --set selector.enabled=true --set nodeSelector.nodetype=front'
+        
+        # Generate values.yaml content from valuesInline
+        values_yaml = dump(values_inline, default_flow_style=False, indent=2) if 'valuesInline' in first_chart else ""
+        
+        helm_script = f"""#!/bin/bash
 
 # Add helm repository
 helm repo add loyaltolpi https://newrahmat.bitbucket.io
@@ -148,9 +984,10 @@ EOF
 
 helm template loyaltolpi/qoin -f values.yaml
 """
-        except Exception as e:
-            # Fallback to default values if parsing fails
-            default_values_yaml = """name: qoin-be-client-manager
+    except Exception as e:
+        # Fallback to default values if parsing fails
+        helm_set_string = '--set name=qoin-be-client-manager --set port=8086 --set image.repo=loyaltolpi/qoin-be-client-manager --set image.tag=2e6d963 --set privateReg.enabled=true --set secretName=regcred --set selector.enabled=true --set nodeSelector.nodetype=front'
+        default_values_yaml = """name: qoin-be-client-manager
 port: 8086
 image:
   repo: loyaltolpi/qoin-be-client-manager
@@ -162,8 +999,8 @@ selector:
   enabled: true
 nodeSelector:
   nodetype: front"""
-            
-            helm_script = f"""#!/bin/bash
+        
+        helm_script = f"""#!/bin/bash
 
 # Add helm repository
 helm repo add loyaltolpi https://newrahmat.bitbucket.io
@@ -181,42 +1018,78 @@ EOF
 
 helm template loyaltolpi/qoin -f values.yaml
 """
-        
-        return jsonify({
-            'valid': True, 
-            'error': None,
-            'build_command': build_command,
-            'sample_dir': sample_dir,
-            'bash_script': bash_script,
-            'helm_script': helm_script,
-            'helm_command': f"helm template loyaltolpi/qoin {helm_set_string}"
-        })
+    
+    return {
+        'valid': True, 
+        'error': None,
+        'build_command': build_command,
+        'sample_dir': sample_dir,
+        'bash_script': bash_script,
+        'helm_script': helm_script,
+        'helm_command': f"helm template loyaltolpi/qoin {helm_set_string}",
+        'helm_commands': helm_commands
+    }
+
+# Validate responses memoized by content hash, so repeated keystroke-driven requests are free
+_validate_memo = MemoCache(max_entries=int(os.environ.get('VALIDATE_MEMO_ENTRIES', '128')))
+
+@app.route('/validate', methods=['POST'])
+def validate():
+    try:
+        with STAGE_SECONDS.time('validate', 'request_parse'):
+            yaml_content = request.json.get('yaml_content', '')
+        with STAGE_SECONDS.time('validate', 'payload'):
+            payload = _validate_memo.get_or_compute(yaml_content, _validate_payload)
+        with STAGE_SECONDS.time('validate', 'serialize'):
+            return jsonify(payload)
     except yaml.YAMLError as e:
         return jsonify({'valid': False, 'error': str(e)})
     except Exception as e:
         return jsonify({'valid': False, 'error': str(e)})
 
+# Samples are served from memory; the directory is re-checked at most every SAMPLES_POLL_INTERVAL seconds
+sample_catalog = SampleCatalog('samples', poll_interval=float(os.environ.get('SAMPLES_POLL_INTERVAL', '2')))
+
+def _conditional_json(payload, etag, last_modified):
+    """JSON response with validators, answering 304 when the client's copy is current"""
+    with STAGE_SECONDS.time('samples', 'serialize'):
+        response = jsonify(payload)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = datetime.fromtimestamp(int(last_modified), tz=timezone.utc)
+    # Let browsers keep a copy but revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/samples', methods=['GET'])
 def get_samples():
     """Get list of available sample files"""
     try:
-        samples_dir = 'samples'
-        if not os.path.exists(samples_dir):
-            return jsonify({'samples': []})
-        
-        samples = []
-        for filename in os.listdir(samples_dir):
-            if filename.endswith('.yaml') or filename.endswith('.yml'):
-                # Remove extension for display name
-                display_name = filename.replace('.yaml', '').replace('.yml', '')
-                # Convert to readable format (e.g., qoin-helm -> Qoin Helm)
-                display_name = display_name.replace('-', ' ').replace('_', ' ').title()
-                samples.append({
-                    'filename': filename,
-                    'display_name': display_name
-                })
-        
-        return jsonify({'samples': samples})
+        with STAGE_SECONDS.time('samples', 'catalog'):
+            catalog = sample_catalog.list()
+        samples = [{
+            'filename': sample.filename,
+            'display_name': sample.display_name
+        } for sample in catalog]
+        
+        return _conditional_json({'samples': samples}, sample_catalog.etag, sample_catalog.last_modified)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/samples/all', methods=['GET'])
+def get_all_samples():
+    """Get every sample with its content in one response"""
+    try:
+        with STAGE_SECONDS.time('samples', 'catalog'):
+            catalog = sample_catalog.list()
+        samples = [{
+            'filename': sample.filename,
+            'display_name': sample.display_name,
+            'size': sample.size,
+            'content': sample.content
+        } for sample in catalog]
+        
+        return _conditional_json({'samples': samples}, sample_catalog.etag, sample_catalog.last_modified)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -228,16 +1101,360 @@ def get_sample(filename):
         if not filename.endswith(('.yaml', '.yml')):
             return jsonify({'error': 'Invalid file type'}), 400
         
-        file_path = os.path.join('samples', filename)
-        if not os.path.exists(file_path):
+        # Only names present in the catalog can be served, so paths never reach the filesystem
+        with STAGE_SECONDS.time('samples', 'catalog'):
+            sample = sample_catalog.get(filename)
+        if sample is None:
             return jsonify({'error': 'Sample not found'}), 404
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        return jsonify({'content': content})
+        return _conditional_json({'content': sample.content}, sample.etag, sample.mtime)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _history_disabled():
+    return jsonify({'error': 'Render history is disabled (HISTORY_DB is empty)'}), 404
+
+@app.route('/history', methods=['GET'])
+def list_history():
+    """List recorded renders, newest first
+
+    Filters: sample, input_hash, since and until (Unix timestamps); page
+    backwards by passing the returned next_until as until.
+    """
+    if render_history is None:
+        return _history_disabled()
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    renders = render_history.list(
+        sample=request.args.get('sample'),
+        input_hash=request.args.get('input_hash'),
+        since=request.args.get('since', type=float),
+        until=request.args.get('until', type=float),
+        limit=limit)
+    return jsonify({
+        'renders': renders,
+        'next_until': renders[-1]['created_at'] if len(renders) == limit else None
+    })
+
+@app.route('/history/<int:render_id>', methods=['GET'])
+def get_history_entry(render_id):
+    """A recorded render with its input and output"""
+    if render_history is None:
+        return _history_disabled()
+    entry = render_history.get(render_id)
+    if entry is None:
+        return jsonify({'error': 'Render not found'}), 404
+    return jsonify(entry)
+
+@app.route('/history/purge', methods=['POST'])
+def purge_history():
+    """Delete renders older than older_than seconds and/or the oldest beyond max_bytes stored"""
+    if render_history is None:
+        return _history_disabled()
+    body = request.get_json(silent=True) or {}
+    older_than, max_bytes = body.get('older_than'), body.get('max_bytes')
+    for name, value in (('older_than', older_than), ('max_bytes', max_bytes)):
+        if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0):
+            return jsonify({'error': f"'{name}' must be a non-negative number"}), 400
+    if older_than is None and max_bytes is None:
+        return jsonify({'error': "Give 'older_than' (seconds) and/or 'max_bytes'"}), 400
+    deleted = render_history.purge(older_than=older_than, max_bytes=max_bytes)
+    return jsonify({'deleted': deleted, 'stats': render_history.stats()})
+
+def _diff_side(side):
+    """Manifest text for one side of a diff
+
+    A side is manifest text, or an object with one of manifest, history_id
+    (a recorded render) or yaml_content (rendered now, through the cache).
+    """
+    if isinstance(side, str):
+        return side
+    if not isinstance(side, dict):
+        raise ValueError('Each side must be manifest text or an object')
+    if isinstance(side.get('manifest'), str):
+        return side['manifest']
+    if 'history_id' in side:
+        entry = render_history.get(side['history_id']) if render_history is not None else None
+        if entry is None or entry['output'] is None:
+            raise ValueError(f"No recorded output for history entry {side['history_id']}")
+        return entry['output']
+    if isinstance(side.get('yaml_content'), str):
+        payload, _ = _render(side['yaml_content'])
+        if not payload['success']:
+            raise ValueError(f"Render failed: {payload['error']}")
+        return payload['output']
+    raise ValueError("Each side needs 'manifest', 'history_id' or 'yaml_content'")
+
+@app.route('/diff', methods=['POST'])
+def diff_renders():
+    """Compare two renders resource by resource, streaming NDJSON events
+
+    Body: {"before": side, "after": side}.  Lines are added, removed and
+    changed resources (with field-level changes), then a summary line.
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        with STAGE_SECONDS.time('diff', 'resolve'):
+            before, after = _diff_side(body.get('before')), _diff_side(body.get('after'))
+        with STAGE_SECONDS.time('diff', 'index'):
+            events = manifest_diff.diff_manifests(before, after)
+    except (ValueError, yaml.YAMLError) as e:
+        return jsonify({'error': str(e)}), 400
+    except AdmissionRejected as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    
+    # YAML timestamps load as datetimes; report them as text
+    return _ndjson_response(json.dumps(event, default=str) + '\n' for event in events)
+
+# Resource indexes of recent renders, kept with their output for paging
+RENDER_INDEX_ENTRIES = int(os.environ.get('RENDER_INDEX_ENTRIES', '32'))
+RENDER_PAGE_MAX = 500
+_render_indexes = MemoCache(max_entries=RENDER_INDEX_ENTRIES)
+
+def _renders_shared():
+    """Whether every worker can find a render by its id (a disk or shared render cache tier)"""
+    return bool(render_cache.disk_dir or render_cache.shared is not None)
+
+def _remember_index(render_id, output):
+    """Index output under render_id (built once per render and process)"""
+    def build(_):
+        with STAGE_SECONDS.time('render', 'index'):
+            return manifest_index.build(output)
+    return _render_indexes.get_or_compute(render_id, build)
+
+def _render_index(render_id):
+    """The index of a render still in this process or the render cache, or None"""
+    if not re.fullmatch(r'[0-9a-f]{64}', render_id):
+        return None
+    def build(_):
+        output = render_cache.get(render_id)
+        if output is None:
+            # Raising keeps the miss out of the memo
+            raise KeyError(render_id)
+        with STAGE_SECONDS.time('render', 'index'):
+            return manifest_index.build(output)
+    try:
+        return _render_indexes.get_or_compute(render_id, build)
+    except KeyError:
+        return None
+
+def _render_not_found():
+    return jsonify({'error': 'Render not found; it may have expired, generate it again'}), 404
+
+@app.route('/renders/<render_id>/summary', methods=['GET'])
+def get_render_summary(render_id):
+    """Resource counts per kind and namespace and the size of a render"""
+    index = _render_index(render_id)
+    if index is None:
+        return _render_not_found()
+    return jsonify({'render_id': render_id, 'summary': index.summary()})
+
+@app.route('/renders/<render_id>/resources', methods=['GET'])
+def list_render_resources(render_id):
+    """A page of a render's resources
+
+    Filters: kind and namespace (repeatable) and selector (a label
+    selector); offset and limit page through the matches.  With
+    content=1 each resource carries its YAML document.
+    """
+    index = _render_index(render_id)
+    if index is None:
+        return _render_not_found()
+    try:
+        selector = manifest_index.parse_selector(request.args['selector']) if request.args.get('selector') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(1, min(request.args.get('limit', 50, type=int), RENDER_PAGE_MAX))
+    selected = index.select(kinds=set(request.args.getlist('kind')),
+                            namespaces=set(request.args.getlist('namespace')),
+                            selector=selector)
+    page = selected[offset:offset + limit]
+    if request.args.get('content') in ('1', 'true'):
+        page = [dict(entry, content=index.content(entry)) for entry in page]
+    return jsonify({
+        'render_id': render_id,
+        'total': len(selected),
+        'offset': offset,
+        'resources': page,
+        'next_offset': offset + limit if offset + limit < len(selected) else None
+    })
+
+@app.route('/renders/<render_id>/output', methods=['GET'])
+def get_render_output(render_id):
+    """The full manifest as text; Range requests fetch single resources by their byte offsets"""
+    index = _render_index(render_id)
+    if index is None:
+        return _render_not_found()
+    data = index.text.encode('utf-8')
+    response = Response(data, mimetype='text/yaml')
+    response.set_etag(render_id)
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+
+def _admin_denied():
+    """An error response unless the request carries ADMIN_TOKEN as a bearer token"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled (ADMIN_TOKEN is not set)'}), 404
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        response = jsonify({'error': 'Admin token required'})
+        response.headers['WWW-Authenticate'] = 'Bearer'
+        return response, 401
+    if profiler is None:
+        return jsonify({'error': 'Profiling is disabled (PROFILE_DIR is empty)'}), 404
+    return None
+
+def _profile_response(stats, filename, headers=None):
+    """A pstats dict as a download, or as pstats' text report with ?format=text"""
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls', 'ncalls', 'pcalls', 'filename', 'name'):
+            return jsonify({'error': f"Unknown sort key: {sort}"}), 400
+        limit = max(1, min(request.args.get('limit', 50, type=int), 1000))
+        return Response(request_profiler.render_text(stats, sort, limit), mimetype='text/plain', headers=headers)
+    response = Response(marshal.dumps(stats), mimetype='application/octet-stream', headers=headers)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def admin_profiling():
+    """Sampling status and the slowest profiled requests; POST {"sample_rate": 0-1} switches sampling
+
+    The rate applies to every worker sharing PROFILE_DIR; 0 turns sampling off.
+    """
+    denied = _admin_denied()
+    if denied is not None:
+        return denied
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        if body.get('clear'):
+            profiler.clear()
+        if 'sample_rate' in body:
+            rate = body['sample_rate']
+            if not isinstance(rate, (int, float)) or isinstance(rate, bool) or not 0 <= rate <= 1:
+                return jsonify({'error': "'sample_rate' must be a number from 0 to 1"}), 400
+            profiler.set_sample_rate(float(rate))
+    return jsonify(dict(profiler.stats(), slowest=profiler.slowest()))
+
+@app.route('/admin/profiling/aggregate', methods=['GET'])
+def admin_profile_aggregate():
+    """The recently sampled requests' profiles merged into one pstats file"""
+    denied = _admin_denied()
+    if denied is not None:
+        return denied
+    count, stats = profiler.aggregate()
+    if not count:
+        return jsonify({'error': 'No profiles recorded; set a sample_rate first'}), 404
+    return _profile_response(stats, 'aggregate.pstats', {'X-Profiled-Requests': str(count)})
+
+@app.route('/admin/profiling/slowest/<name>', methods=['GET'])
+def admin_profile_trace(name):
+    """The profile of one of the slowest sampled requests, by the name /admin/profiling lists"""
+    denied = _admin_denied()
+    if denied is not None:
+        return denied
+    trace = profiler.trace(name)
+    if trace is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return _profile_response(trace[1], name.replace('.prof', '.pstats'))
+
+@app.route('/admission/stats', methods=['GET'])
+def get_admission_stats():
+    """Get in-flight and queued kustomize build counts"""
+    return jsonify(build_admission.stats())
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get render cache hit/miss counters"""
+    return jsonify({
+        'render_cache': render_cache.stats(),
+        'chart_cache': chart_cache.stats() if chart_cache is not None else None,
+        'workspace_pool': workspace_pool.stats(),
+        'single_flight': render_flights.stats(),
+        'history': render_history.stats() if render_history is not None else None
+    })
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    if SERVER_TIMING:
+        server_timing.start()
+    if profiler is not None and not request.path.startswith('/admin/'):
+        g.profile = profiler.sample()
+
+@app.after_request
+def _observe_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, route, request.method, str(response.status_code))
+        timings = server_timing.finish()
+        if timings is not None:
+            response.headers['Server-Timing'] = server_timing.header(timings, elapsed)
+            g.stage_timings = timings.stages
+        g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def _finish_request_profile(exc):
+    # Teardown runs even when the view raised, so the profiler is always stopped
+    server_timing.finish()
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.finish(
+            profile, time.perf_counter() - g.request_started,
+            route=request.url_rule.rule if request.url_rule is not None else 'unmatched',
+            method=request.method, path=request.path, status=g.get('response_status', 500),
+            stages=g.get('stage_timings', {}))
+
+@metrics_registry.collector
+def _collect_component_stats():
+    """Report the counters the caches, pool and admission controller already keep"""
+    render = render_cache.stats()
+    charts = chart_cache.stats() if chart_cache is not None else {'hits': 0, 'shared_hits': 0, 'fetches': 0}
+    pool = workspace_pool.stats()
+    caches = {
+        'render': (render['hits'] + render['disk_hits'] + render['shared_hits'], render['misses']),
+        'chart': (charts['hits'] + charts['shared_hits'], charts['fetches']),
+        'workspace_pool': (pool['hits'], pool['fallbacks']),
+        'validate': (_validate_memo.hits, _validate_memo.misses),
+        'yaml_parse': yaml_utils.parse_counts(),
+    }
+    admission = build_admission.stats()
+    preview = preview_hub.stats()
+    return [
+        ('kustomize_builder_cache_hits_total', 'counter', 'Cache lookups answered from the cache',
+         [({'cache': name}, hits) for name, (hits, _) in caches.items()]),
+        ('kustomize_builder_cache_misses_total', 'counter', 'Cache lookups that had to compute',
+         [({'cache': name}, misses) for name, (_, misses) in caches.items()]),
+        ('kustomize_builder_cache_hit_ratio', 'gauge', 'Hits over all lookups since start',
+         [({'cache': name}, hits / (hits + misses) if hits + misses else 0.0)
+          for name, (hits, misses) in caches.items()]),
+        ('kustomize_builder_admission_in_flight', 'gauge', 'Builds holding an admission slot',
+         [({}, admission['in_flight'])]),
+        ('kustomize_builder_admission_queued', 'gauge', 'Builds waiting for an admission slot',
+         [({}, admission['queued'])]),
+        ('kustomize_builder_admission_rejected_total', 'counter', 'Builds turned away with 429',
+         [({}, admission['rejected'] + admission['timed_out'])]),
+        ('kustomize_builder_renders_coalesced_total', 'counter',
+         'Renders that joined an identical build already in progress',
+         [({}, render_flights.stats()['coalesced'])]),
+        ('kustomize_builder_preview_sessions', 'gauge', 'Open live preview streams',
+         [({}, preview['sessions'])]),
+        ('kustomize_builder_preview_renders_cancelled_total', 'counter',
+         'Live preview renders dropped because a newer revision arrived',
+         [({}, preview['cancelled'])]),
+        ('kustomize_builder_job_queue_depth', 'gauge', 'Render jobs waiting for a worker',
+         [({}, render_jobs.stats()['queue_depth'])]),
+    ]
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of request, stage, subprocess and cache metrics"""
+    return Response(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000, threaded=True) 
\ No newline at end of file
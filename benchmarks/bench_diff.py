@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark resource-level manifest diffs against a plain text diff
+
+Builds a manifest of N Deployments, changes one valuesInline-style field in
+a few of them, shuffles the document order (as a kustomize upgrade can) and
+times manifest_diff against difflib on the same pair.
+
+Usage: python benchmarks/bench_diff.py [--resources 2000] [--changed 5] [--iterations 5]
+"""
+
+import argparse
+import difflib
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import manifest_diff  # noqa: E402
+
+
+def deployment(index, image_tag):
+    return (f"---\napiVersion: apps/v1\nkind: Deployment\nmetadata:\n  name: svc-{index}\n  namespace: prod\n"
+            f"spec:\n  replicas: 2\n  template:\n    spec:\n      containers:\n      - name: app\n"
+            f"        image: registry/svc-{index}:{image_tag}\n        env:\n"
+            + ''.join(f"        - name: VAR_{var}\n          value: \"{index}-{var}\"\n" for var in range(10)))
+
+
+def manifests(resources, changed, shuffle):
+    rng = random.Random(42)
+    edited = set(rng.sample(range(resources), changed))
+    before = [deployment(index, '1.0') for index in range(resources)]
+    after = [deployment(index, '1.1' if index in edited else '1.0') for index in range(resources)]
+    if shuffle:
+        rng.shuffle(after)
+    return ''.join(before), ''.join(after)
+
+
+def measure(label, func, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<36} p50 {statistics.median(samples):9.1f} ms   max {max(samples):9.1f} ms")
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--resources', type=int, default=2000)
+    parser.add_argument('--changed', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    for shuffle in (False, True):
+        before, after = manifests(args.resources, args.changed, shuffle)
+        print(f"{args.resources} resources, {args.changed} changed, "
+              f"{'shuffled' if shuffle else 'same order'} ({len(after) / 1024 / 1024:.1f} MiB)")
+        print("=" * 64)
+        measure('difflib.unified_diff (text)',
+                lambda: sum(1 for _ in difflib.unified_diff(before.splitlines(), after.splitlines())),
+                args.iterations)
+        measure('manifest_diff (resources)', lambda: list(manifest_diff.diff_manifests(before, after)),
+                args.iterations)
+        events = list(manifest_diff.diff_manifests(before, after))
+        print(f"summary: {events[-1]}\n")
+
+
+if __name__ == '__main__':
+    main()
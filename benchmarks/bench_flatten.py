@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark valuesInline flattening on deep and wide values trees
+
+Compares the previous recursive extractor with helm_values.flatten_values.
+
+Usage: python benchmarks/bench_flatten.py [--width 5000] [--depth 2000] [--iterations 10]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from helm_values import helm_set_args  # noqa: E402
+
+
+def legacy_extract_helm_set_args(values_inline, prefix=''):
+    """The recursive extractor /validate used before helm_values"""
+    helm_args = []
+    for key, value in values_inline.items():
+        current_key = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            helm_args.extend(legacy_extract_helm_set_args(value, current_key))
+        elif isinstance(value, bool):
+            helm_args.append(f"--set {current_key}={str(value).lower()}")
+        else:
+            helm_args.append(f"--set {current_key}={value}")
+    return helm_args
+
+
+def wide_tree(width):
+    """width services, each a small nested block with a list"""
+    return {f"svc{i}": {'enabled': True, 'port': 8000 + i, 'image': {'repo': f"org/svc{i}", 'tag': 'v1'},
+                        'args': ['--verbose', f"--id={i}"]} for i in range(width)}
+
+
+def deep_tree(depth):
+    tree = leaf = {}
+    for i in range(depth):
+        leaf['level'] = {'value': i}
+        leaf = leaf['level']
+    return tree
+
+
+def measure(label, func, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        try:
+            count = len(func())
+        except RecursionError:
+            print(f"{label:<34} RecursionError")
+            return
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<34} p50 {statistics.median(samples):9.3f} ms   ({count} args)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--width', type=int, default=5000)
+    parser.add_argument('--depth', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    wide, deep = wide_tree(args.width), deep_tree(args.depth)
+    print("=" * 64)
+    measure(f"legacy, wide ({args.width} services)", lambda: legacy_extract_helm_set_args(wide), args.iterations)
+    measure(f"iterative, wide ({args.width} services)", lambda: helm_set_args(wide), args.iterations)
+    measure(f"legacy, deep ({args.depth} levels)", lambda: legacy_extract_helm_set_args(deep), args.iterations)
+    measure(f"iterative, deep ({args.depth} levels)", lambda: helm_set_args(deep), args.iterations)
+    print("=" * 64)
+    print("The legacy extractor emits lists as Python reprs; the iterative one indexes them.")
+
+
+if __name__ == "__main__":
+    main()
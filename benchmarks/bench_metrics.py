@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cost of recording metrics from many threads: per-thread shards versus one lock
+
+Usage: python benchmarks/bench_metrics.py [--threads 8] [--observations 100000]
+"""
+
+import argparse
+import bisect
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from metrics import LATENCY_BUCKETS, Registry  # noqa: E402
+
+
+class LockedHistogram:
+    """The straightforward alternative: one shared table behind one lock"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self.lock:
+            counts = self.values.setdefault(labels, [0] * (len(self.buckets) + 2))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+
+def measure(label, observe, threads, observations):
+    def work():
+        for index in range(observations):
+            observe(index * 1e-5, 'render', 'kustomize')
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    per_call = (time.perf_counter() - started) / (threads * observations) * 1e9
+    print(f"{label:<28} {per_call:8.1f} ns per observation")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--observations', type=int, default=100000)
+    args = parser.parse_args()
+
+    sharded = Registry().histogram('bench_seconds', 'Benchmark', ['operation', 'stage'])
+    locked = LockedHistogram(LATENCY_BUCKETS)
+    print(f"{args.threads} threads x {args.observations} observations")
+    print("=" * 52)
+    baseline = measure('single lock', locked.observe, args.threads, args.observations)
+    shards = measure('per-thread shards', sharded.observe, args.threads, args.observations)
+    print("=" * 52)
+    print(f"Per-observation cost: {baseline / shards:.1f}x lower with per-thread shards")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the schema pre-flight check against building bad kustomizations
+
+Takes samples/basic-template.yaml, breaks it in a dozen common ways (missing
+chart fields, typos in top-level fields, wrong types) and times, per input,
+what a failing build used to cost (workspace, kustomize process, cleanup)
+against the in-process check that now answers first.  Uses kustomize from
+PATH, or the stub kustomize when it is not installed (which measures the
+process and workspace overhead alone, as the stub does not validate).
+
+Usage: python benchmarks/bench_schema.py [--iterations 20]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as app_module  # noqa: E402
+import kustomization_schema  # noqa: E402
+import yaml_utils  # noqa: E402
+from loadtest import install_stub  # noqa: E402
+
+
+def bad_inputs():
+    """(name, yaml_content) pairs kustomize would reject or this service cannot build"""
+    with open(os.path.join(ROOT, 'samples', 'basic-template.yaml'), encoding='utf-8') as f:
+        good = f.read()
+
+    def swap(old, new):
+        assert old in good, old
+        return good.replace(old, new, 1)
+
+    return [
+        ('chart without name', swap('- name: qoin\n', '- releaseName: x\n')),
+        ('chart without version', swap('  version: 0.11.0\n', '')),
+        ('chart without repo', swap('  repo: https://newrahmat.bitbucket.io\n', '')),
+        ('numeric chart version', swap('version: 0.11.0', 'version: 1.0')),
+        ('typo in top-level field', swap('helmCharts:', 'helmChart:')),
+        ('unknown top-level field', good + 'namePrefixes: prod-\n'),
+        ('valuesInline as a list', swap('  valuesInline:\n', '  valuesInline:\n  - a\n  valuesLater:\n')),
+        ('includeCRDs as a string', swap('  releaseName: qoin\n', '  releaseName: qoin\n  includeCRDs: "yes"\n')),
+        ('numeric image tag', good + 'images:\n- name: api\n  newTag: 2\n'),
+        ('numeric label value', good + 'commonLabels:\n  tier: 1\n'),
+        ('resources as a string', good + 'resources: deployment.yaml\n'),
+        ('syntax error', swap('kind: Kustomization\n', 'kind: Kustomization\n  oops: [\n')),
+    ]
+
+
+def cold_check(yaml_content):
+    # Include the parse: the check is the first thing to read a new input
+    yaml_utils._parsed.clear()
+    return kustomization_schema.errors(yaml_content)
+
+
+def measure(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    bin_dir = tempfile.mkdtemp(prefix='bench-schema-')
+    if shutil.which('kustomize') is None:
+        install_stub(bin_dir)
+        os.environ['PATH'] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+        print('kustomize not on PATH: timing the stub kustomize (process overhead only)\n')
+    # Never download charts while timing; the build path is what is being measured
+    app_module.chart_cache = None
+    app_module.HELM_FAST_PATH = 'off'
+
+    print(f"{'input':<26} {'build':>11} {'pre-flight':>12} {'saved':>11}  first error")
+    print("=" * 100)
+    build_total = check_total = 0
+    missed = 0
+    try:
+        for name, yaml_content in bad_inputs():
+            errors = kustomization_schema.errors(yaml_content)
+            missed += not errors
+            build_ms = measure(lambda: app_module._run_kustomize_build(yaml_content), args.iterations)
+            check_ms = measure(lambda: cold_check(yaml_content), args.iterations)
+            build_total += build_ms
+            check_total += check_ms
+            first = f"{errors[0]['line']}:{errors[0]['column']} {errors[0]['message']}" if errors else 'NOT CAUGHT'
+            print(f"{name:<26} {build_ms:8.2f} ms {check_ms:9.3f} ms {build_ms - check_ms:8.2f} ms  {first}")
+    finally:
+        shutil.rmtree(bin_dir, ignore_errors=True)
+    print("=" * 100)
+    print(f"{'total':<26} {build_total:8.2f} ms {check_total:9.3f} ms {build_total - check_total:8.2f} ms  "
+          f"({build_total / check_total:.0f}x)")
+    return 1 if missed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Measure cold start: launching gunicorn with gunicorn.conf.py until the first request is served
+
+Runs against the stub kustomize, with the tool-version cache cold (first run)
+and warm (later runs), and reports time to the first /samples and /generate
+responses.
+
+Usage: python benchmarks/bench_startup.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from loadtest import free_port, install_stub  # noqa: E402
+
+
+def first_response(url, data=None, deadline=30):
+    started = time.monotonic()
+    while True:
+        try:
+            request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+                return
+        except OSError:
+            if time.monotonic() - started > deadline:
+                raise RuntimeError(f"No response from {url}")
+            time.sleep(0.005)
+
+
+def cold_start(env):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py'), 'app:app'],
+        cwd=ROOT, env={**env, 'BIND': f"127.0.0.1:{port}"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        first_response(base_url + '/samples')
+        samples = time.perf_counter() - started
+        first_response(base_url + '/generate', json.dumps({'yaml_content': 'kind: Kustomization\n'}).encode())
+        generate = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return samples * 1000, generate * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='kustomize-builder-startup-') as work_dir:
+        bin_dir = os.path.join(work_dir, 'bin')
+        os.mkdir(bin_dir)
+        install_stub(bin_dir)
+        env = {
+            **os.environ,
+            'PATH': f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            'CHART_CACHE_DIR': '',
+            'TOOL_VERSIONS_CACHE': os.path.join(work_dir, 'tool-versions.json'),
+            'GUNICORN_ACCESS_LOG': '',
+        }
+
+        print("run                    first /samples   first /generate")
+        print("=" * 58)
+        warm = []
+        for run in range(args.runs + 1):
+            samples_ms, generate_ms = cold_start(env)
+            label = 'cold (no probe cache)' if run == 0 else f"warm #{run}"
+            print(f"{label:<22} {samples_ms:10.0f} ms {generate_ms:14.0f} ms")
+            if run:
+                warm.append(samples_ms)
+        print("=" * 58)
+        print(f"Median cold start to first served request: {statistics.median(warm):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
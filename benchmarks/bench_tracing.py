@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request cost of Server-Timing and the sampling profiler
+
+Times /validate (memoized, so the request hooks dominate) through the Flask
+test client with Server-Timing off and on, profiling off, and profiling
+every request.
+
+Usage: python benchmarks/bench_tracing.py [--requests 2000]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as app_module  # noqa: E402
+from request_profiler import RequestProfiler  # noqa: E402
+
+
+def measure(label, client, requests):
+    body = {'yaml_content': 'kind: Kustomization\nnamespace: bench\n'}
+    client.post('/validate', json=body)
+    samples = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(requests):
+            client.post('/validate', json=body)
+        samples.append((time.perf_counter() - started) / requests * 1e6)
+    per_request = statistics.median(samples)
+    print(f"{label:<34} {per_request:8.1f} us per request")
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app_module.profiler = RequestProfiler(directory)
+        client = app_module.app.test_client()
+
+        app_module.SERVER_TIMING = False
+        app_module.profiler = None
+        baseline = measure('no Server-Timing, no profiler', client, args.requests)
+        app_module.SERVER_TIMING = True
+        with_header = measure('Server-Timing', client, args.requests)
+        app_module.profiler = RequestProfiler(directory)
+        off = measure('Server-Timing + profiler at 0', client, args.requests)
+        app_module.profiler.set_sample_rate(1)
+        every = measure('Server-Timing + profiling every one', client, max(1, args.requests // 10))
+        app_module.profiler.set_sample_rate(0)
+
+    print(f"\nServer-Timing adds {with_header - baseline:.1f} us, an idle profiler {off - with_header:.1f} us; "
+          f"profiling a request costs {every - off:.0f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark /validate latency on large valuesInline documents
+
+Compares the previous pipeline (two pure-Python parses plus a pure-Python dump
+per request) with the single libyaml parse, cold and memoized.
+
+Usage: python benchmarks/bench_validate.py [--keys 2000] [--iterations 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as app_module  # noqa: E402
+import yaml_utils  # noqa: E402
+from bench_flatten import legacy_extract_helm_set_args  # noqa: E402
+
+
+def large_document(extra_keys):
+    """samples/full-template.yaml with its valuesInline padded by extra_keys nested entries"""
+    with open(os.path.join(ROOT, 'samples', 'full-template.yaml'), encoding='utf-8') as f:
+        document = yaml.safe_load(f)
+    values = document['helmCharts'][0]['valuesInline']
+    for i in range(extra_keys):
+        values.setdefault(f"group{i % 50}", {})[f"key{i}"] = {
+            'enabled': i % 2 == 0, 'port': 8000 + i, 'name': f"service-{i}", 'tags': ['a', 'b'],
+        }
+    return yaml.safe_dump(document, sort_keys=False)
+
+
+def legacy_validate(yaml_content):
+    """The pre-optimisation work done per /validate request"""
+    yaml.safe_load(yaml_content)
+    data = yaml.safe_load(yaml_content)
+    values_inline = data['helmCharts'][0]['valuesInline']
+    legacy_extract_helm_set_args(values_inline)
+    yaml.dump(values_inline, default_flow_style=False, indent=2)
+
+
+def measure(label, func, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<28} p50 {statistics.median(samples):9.3f} ms   max {max(samples):9.3f} ms")
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--keys', type=int, default=2000, help='extra valuesInline entries')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    content = large_document(args.keys)
+    print(f"Document: {len(content) / 1024:.1f} KiB, libyaml={'yes' if yaml_utils.LIBYAML else 'no'}")
+    print("=" * 64)
+
+    def single_parse_cold():
+        yaml_utils._parsed.clear()
+        app_module._validate_payload(content)
+
+    client = app_module.app.test_client()
+
+    def endpoint_memoized():
+        client.post('/validate', json={'yaml_content': content})
+
+    legacy = measure('legacy (2x parse + dump)', lambda: legacy_validate(content), args.iterations)
+    cold = measure('single parse, cold', single_parse_cold, args.iterations)
+    endpoint_memoized()
+    warm = measure('/validate, memoized', endpoint_memoized, args.iterations)
+    print("=" * 64)
+    print(f"Speedup: {legacy / cold:.1f}x cold, {legacy / warm:.1f}x memoized (endpoint incl. JSON)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-build workspace overhead: mkdtemp/rmtree versus the workspace pool
+
+Usage: python benchmarks/bench_workspace.py [--iterations 2000] [--pool-dir /dev/shm]
+"""
+
+import argparse
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from workspace_pool import WorkspacePool, default_root  # noqa: E402
+
+CONTENT = open(os.path.join(ROOT, 'samples', 'full-template.yaml'), encoding='utf-8').read()
+
+
+def build_cycle(acquire, release):
+    path = acquire()
+    with open(os.path.join(path, 'kustomization.yaml'), 'w') as f:
+        f.write(CONTENT)
+    release(path)
+
+
+def measure(label, acquire, release, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        build_cycle(acquire, release)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    print(f"{label:<34} p50 {statistics.median(samples):8.1f} us   p99 {samples[math.ceil(len(samples) * 0.99) - 1]:8.1f} us")
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--pool-dir', default=default_root())
+    args = parser.parse_args()
+
+    pool = WorkspacePool(4, root=args.pool_dir)
+    print(f"temp dir: {tempfile.gettempdir()}   pool dir: {args.pool_dir}")
+    print("=" * 64)
+    baseline = measure('mkdtemp + write + rmtree', tempfile.mkdtemp,
+                       lambda path: shutil.rmtree(path, ignore_errors=True), args.iterations)
+    pooled = measure('pool acquire + write + release', pool.acquire, pool.release, args.iterations)
+    print("=" * 64)
+    print(f"Per-build filesystem overhead: {baseline / pooled:.1f}x lower with the pool")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
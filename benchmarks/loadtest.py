@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Load test /generate, /validate and /samples against a stub kustomize, fully offline
+
+Starts the app in-process (werkzeug, threaded) or under gunicorn with
+benchmarks/stub_kustomize.py on PATH, drives each scenario at the given
+concurrency and reports p50/p95/p99 latency and requests per second.
+--save-baseline stores the results; later runs compare against the stored
+baseline and exit 1 when a scenario regresses by more than --tolerance.
+
+Usage: python benchmarks/loadtest.py [--server inprocess|gunicorn|http://host:port]
+           [--scenarios generate,validate,samples] [--concurrency 8] [--duration 5]
+           [--stub-sleep 0.05] [--stub-output-mb 0] [--stub-fail-rate 0] [--unique]
+           [--baseline PATH] [--save-baseline] [--tolerance 0.25]
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import shutil
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from yaml_utils import dump, load  # noqa: E402
+
+STUB = os.path.join(ROOT, 'benchmarks', 'stub_kustomize.py')
+SAMPLE = open(os.path.join(ROOT, 'samples', 'full-template.yaml'), encoding='utf-8').read()
+DEFAULT_BASELINE_DIR = os.path.join(ROOT, 'benchmarks', 'baselines')
+
+
+def install_stub(bin_dir):
+    path = os.path.join(bin_dir, 'kustomize')
+    shutil.copyfile(STUB, path)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+def server_environment(args, bin_dir, work_dir):
+    """Environment for the app under test: stub kustomize first on PATH, no network caches"""
+    return {
+        'PATH': f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+        'STUB_KUSTOMIZE_SLEEP': str(args.stub_sleep),
+        'STUB_KUSTOMIZE_OUTPUT_MB': str(args.stub_output_mb),
+        'STUB_KUSTOMIZE_FAIL_RATE': str(args.stub_fail_rate),
+        # The chart cache would fetch from helm repositories
+        'CHART_CACHE_DIR': '',
+        'WORKSPACE_POOL_DIR': work_dir,
+        'BUILD_MAX_QUEUE': str(max(16, args.concurrency * 2)),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(base_url + '/samples', timeout=2):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server at {base_url} did not come up")
+            time.sleep(0.1)
+
+
+def start_inprocess(env):
+    os.environ.update(env)
+    from werkzeug.serving import make_server
+
+    import app as app_module
+
+    # Per-request access logging would dominate the measurement
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def start_gunicorn(env, args):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{port}",
+         '--workers', str(args.workers), '--threads', str(args.threads),
+         '--worker-class', 'gthread', '--log-level', 'warning', 'app:app'],
+        cwd=ROOT, env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url)
+    except RuntimeError:
+        process.kill()
+        raise
+
+    def stop():
+        process.terminate()
+        process.wait(timeout=30)
+    return base_url, stop
+
+
+def generate_bodies(unique):
+    """Request bodies for /generate; unique ones defeat the render cache"""
+    if not unique:
+        body = json.dumps({'yaml_content': SAMPLE})
+        return lambda index: body
+    document = load(SAMPLE)
+
+    def body(index):
+        variant = dict(document, commonAnnotations={'loadtest/request': str(index)})
+        return json.dumps({'yaml_content': dump(variant, default_flow_style=False, sort_keys=False)})
+    return body
+
+
+def scenarios(args):
+    """name -> (method, path, body_for(index), check(status, body))"""
+    validate_body = json.dumps({'yaml_content': SAMPLE})
+    return {
+        'generate': ('POST', '/generate', generate_bodies(args.unique),
+                     lambda status, body: status == 200 and json.loads(body)['success']),
+        'validate': ('POST', '/validate', lambda index: validate_body,
+                     lambda status, body: status == 200 and json.loads(body)['valid']),
+        'samples': ('GET', '/samples', lambda index: None,
+                    lambda status, body: status == 200),
+    }
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile: the smallest value with at least fraction of the samples at or below it"""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)]
+
+
+def run_scenario(base_url, scenario, concurrency, duration):
+    method, path, body_for, check = scenario
+    netloc = urllib.parse.urlsplit(base_url).netloc
+    counter = iter(range(sys.maxsize))
+    counter_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        latencies, errors = [], 0
+        connection = http.client.HTTPConnection(netloc, timeout=120)
+        while time.monotonic() < deadline:
+            with counter_lock:
+                index = next(counter)
+            body = body_for(index)
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                payload = response.read()
+                ok = check(response.status, payload)
+            except (OSError, http.client.HTTPException, ValueError, KeyError):
+                connection.close()
+                connection = http.client.HTTPConnection(netloc, timeout=120)
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += 0 if ok else 1
+        connection.close()
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda _: worker(), range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for worker_latencies, _ in outcomes for latency in worker_latencies)
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in outcomes),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regression messages for scenarios slower (p95) or lower-throughput than baseline"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if not reference:
+            continue
+        if result['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms vs baseline {reference['p95_ms']:.1f} ms")
+        if result['rps'] < reference['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rps']:.1f} req/s vs baseline {reference['rps']:.1f} req/s")
+        if result['errors'] > reference['errors']:
+            regressions.append(f"{name}: {result['errors']} errors vs baseline {reference['errors']}")
+    return regressions
+
+
+def config_of(args):
+    return {key: getattr(args, key) for key in (
+        'server', 'concurrency', 'duration', 'stub_sleep', 'stub_output_mb', 'stub_fail_rate', 'unique')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--server', default='inprocess',
+                        help='inprocess, gunicorn, or the URL of a running server')
+    parser.add_argument('--scenarios', default='generate,validate,samples')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--stub-sleep', type=float, default=0.05)
+    parser.add_argument('--stub-output-mb', type=float, default=0.0)
+    parser.add_argument('--stub-fail-rate', type=float, default=0.0)
+    parser.add_argument('--unique', action='store_true', help='make every /generate miss the render cache')
+    parser.add_argument('--baseline', help='baseline file (default: benchmarks/baselines/loadtest-<server>.json)')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed regression, as a fraction')
+    args = parser.parse_args()
+
+    server_kind = args.server if args.server in ('inprocess', 'gunicorn') else 'url'
+    baseline_path = args.baseline or os.path.join(DEFAULT_BASELINE_DIR, f"loadtest-{server_kind}.json")
+    selected = {name: scenario for name, scenario in scenarios(args).items()
+                if name in args.scenarios.split(',')}
+
+    with tempfile.TemporaryDirectory(prefix='kustomize-builder-loadtest-') as work_dir:
+        bin_dir = os.path.join(work_dir, 'bin')
+        os.mkdir(bin_dir)
+        install_stub(bin_dir)
+        env = server_environment(args, bin_dir, work_dir)
+        if server_kind == 'inprocess':
+            base_url, stop = start_inprocess(env)
+        elif server_kind == 'gunicorn':
+            base_url, stop = start_gunicorn(env, args)
+        else:
+            base_url, stop = args.server.rstrip('/'), lambda: None
+
+        results = {}
+        try:
+            print(f"{base_url}   concurrency {args.concurrency}   {args.duration:g}s per scenario")
+            print("=" * 78)
+            print(f"{'scenario':<10} {'requests':>9} {'errors':>7} {'req/s':>9} "
+                  f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+            for name, scenario in selected.items():
+                result = results[name] = run_scenario(base_url, scenario, args.concurrency, args.duration)
+                print(f"{name:<10} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+                      f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+            print("=" * 78)
+        finally:
+            stop()
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump({'config': config_of(args), 'results': results}, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one")
+        return 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != config_of(args):
+        print("Warning: baseline was recorded with a different configuration")
+    regressions = compare(results, baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} of {baseline_path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
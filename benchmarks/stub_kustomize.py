@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the kustomize binary, for tests and load tests that must run offline
+
+Installed on PATH as `kustomize`.  `kustomize build ... <dir>` echoes
+<dir>/kustomization.yaml (and any other files in <dir>) as the manifest.
+Behaviour is tuned through environment variables:
+
+  STUB_KUSTOMIZE_CALLS      append each build's arguments to this file
+  STUB_KUSTOMIZE_SLEEP      seconds to sleep before answering
+  STUB_KUSTOMIZE_OUTPUT_MB  pad the manifest to this many megabytes
+  STUB_KUSTOMIZE_FAIL_RATE  fraction of builds (0-1) that exit 1
+
+Builds whose kustomization contains FAIL always exit 1.
+"""
+
+import os
+import random
+import sys
+import time
+
+
+def padding(megabytes):
+    """Valid YAML documents adding up to roughly megabytes of output"""
+    line = '  key: ' + 'x' * 57 + '\n'
+    document = '---\napiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: padding\ndata:\n' + line * 1000
+    return document * max(1, int(megabytes * 1024 * 1024 / len(document)))
+
+
+def main(argv):
+    if argv[1:2] == ['version']:
+        print('v5.0.0-stub')
+        return 0
+    calls = os.environ.get('STUB_KUSTOMIZE_CALLS')
+    if calls:
+        with open(calls, 'a') as f:
+            f.write(' '.join(argv[1:]) + '\n')
+    time.sleep(float(os.environ.get('STUB_KUSTOMIZE_SLEEP', '0')))
+
+    workspace = argv[-1]
+    with open(os.path.join(workspace, 'kustomization.yaml')) as f:
+        content = f.read()
+    if 'FAIL' in content or random.random() < float(os.environ.get('STUB_KUSTOMIZE_FAIL_RATE', '0')):
+        sys.stderr.write('Error: stub build failed\n')
+        return 1
+
+    sys.stdout.write('---\n' + content)
+    # Echo any other workspace files so tests can see what the build was given
+    for name in sorted(os.listdir(workspace)):
+        path = os.path.join(workspace, name)
+        if name != 'kustomization.yaml' and os.path.isfile(path):
+            with open(path) as f:
+                sys.stdout.write('# ' + name + '\n' + f.read())
+    output_mb = float(os.environ.get('STUB_KUSTOMIZE_OUTPUT_MB', '0'))
+    if output_mb > 0:
+        sys.stdout.write(padding(output_mb))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Unpacking uploaded kustomize trees (tar or zip) into a build workspace
+
+Tar archives (plain, gzip, bzip2 or xz) are read member by member straight
+from the request stream.  Zip keeps its index at the end of the file, so zip
+uploads are spooled to a temporary file first (on disk beyond a small
+threshold) and extracted from there.  Either way every member is checked
+before anything is written: no absolute paths, no `..`, no links or device
+files, and the upload size, extracted size and file count stay within
+BundleLimits.
+
+While extracting, each file is hashed; the bundle digest combines the sorted
+(path, file hash) pairs, so the same tree gives the same digest whatever the
+archive format, member order or timestamps.
+"""
+
+import hashlib
+import os
+import posixpath
+import stat
+import tarfile
+import tempfile
+import zipfile
+
+CHUNK_SIZE = 64 * 1024
+ZIP_MAGIC = (b'PK\x03\x04', b'PK\x05\x06')
+KUSTOMIZATION_FILES = ('kustomization.yaml', 'kustomization.yml', 'Kustomization')
+
+
+class BundleError(Exception):
+    """Raised for archives that are malformed or contain unsafe members"""
+
+
+class BundleTooLarge(BundleError):
+    """Raised when an archive exceeds one of the BundleLimits"""
+
+
+class BundleLimits:
+    """Caps on one upload: archive bytes, extracted bytes and regular files"""
+
+    def __init__(self, max_bytes=10 * 1024 * 1024, max_extracted_bytes=64 * 1024 * 1024, max_files=1000):
+        self.max_bytes = max_bytes
+        self.max_extracted_bytes = max_extracted_bytes
+        self.max_files = max_files
+
+
+class _LimitedReader:
+    """File-like view of a stream that raises BundleTooLarge past limit bytes"""
+
+    def __init__(self, stream, limit, prefix=b''):
+        self.stream = stream
+        self.limit = limit
+        self.consumed = 0
+        self._prefix = prefix
+
+    def read(self, size=-1):
+        if size < 0:
+            size = CHUNK_SIZE
+        data = self._prefix[:size]
+        self._prefix = self._prefix[len(data):]
+        if len(data) < size:
+            # Format sniffing (tarfile's included) needs full reads, not just the peeked bytes
+            data += self.stream.read(size - len(data))
+        self.consumed += len(data)
+        if self.consumed > self.limit:
+            raise BundleTooLarge(f"Bundle exceeds the {self.limit} byte upload limit")
+        return data
+
+
+def safe_path(name):
+    """Normalize an archive member or overlay path; raise BundleError if it could escape the tree"""
+    if '\0' in name or '\\' in name:
+        raise BundleError(f"Unsupported characters in path: {name!r}")
+    if name.startswith('/') or (len(name) > 1 and name[1] == ':'):
+        raise BundleError(f"Absolute path in bundle: {name}")
+    path = posixpath.normpath(name)
+    if path == '..' or path.startswith('../'):
+        raise BundleError(f"Path escapes the bundle: {name}")
+    return '' if path == '.' else path
+
+
+def cache_key(digest, overlay, tool_versions=''):
+    """Render cache key for building overlay out of the bundle with this digest"""
+    return hashlib.sha256(f"bundle\0{digest}\0{overlay}\0{tool_versions}".encode('utf-8')).hexdigest()
+
+
+def find_kustomization(root, overlay):
+    """Return the path of overlay's kustomization file under root"""
+    directory = os.path.join(root, overlay) if overlay else root
+    for filename in KUSTOMIZATION_FILES:
+        path = os.path.join(directory, filename)
+        if os.path.isfile(path) and not os.path.islink(path):
+            return path
+    raise BundleError(f"No kustomization file in {overlay or 'the bundle root'}")
+
+
+class _Extraction:
+    """Writes members under dest while enforcing limits and building the digest"""
+
+    def __init__(self, dest, limits):
+        self.dest = dest
+        self.limits = limits
+        self.files = {}
+        self.extracted_bytes = 0
+
+    def directory(self, name):
+        path = safe_path(name)
+        if path:
+            try:
+                os.makedirs(os.path.join(self.dest, path), exist_ok=True)
+            except (FileExistsError, NotADirectoryError) as e:
+                raise BundleError(f"Conflicting paths in bundle: {name}") from e
+
+    def file(self, name, source):
+        path = safe_path(name)
+        if not path:
+            raise BundleError(f"Invalid file name in bundle: {name!r}")
+        if path in self.files:
+            raise BundleError(f"Duplicate file in bundle: {path}")
+        if len(self.files) >= self.limits.max_files:
+            raise BundleTooLarge(f"Bundle has more than {self.limits.max_files} files")
+
+        target = os.path.join(self.dest, path)
+        digest = hashlib.sha256()
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # O_EXCL | O_NOFOLLOW: never write through anything already in the workspace
+            fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+        except (FileExistsError, NotADirectoryError, IsADirectoryError) as e:
+            raise BundleError(f"Conflicting paths in bundle: {name}") from e
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                # Count what actually comes out, not what the header claims
+                self.extracted_bytes += len(chunk)
+                if self.extracted_bytes > self.limits.max_extracted_bytes:
+                    raise BundleTooLarge(
+                        f"Bundle expands beyond the {self.limits.max_extracted_bytes} byte limit")
+                digest.update(chunk)
+                f.write(chunk)
+        self.files[path] = digest.hexdigest()
+
+    def digest(self):
+        digest = hashlib.sha256()
+        for path in sorted(self.files):
+            digest.update(f"{path}\0{self.files[path]}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+
+def extract(stream, dest, limits=None):
+    """Unpack a tar or zip archive read from stream into dest
+
+    Returns (digest, file count).  dest should be empty; on error it may
+    hold a partial tree, which the caller discards.
+    """
+    limits = limits or BundleLimits()
+    head = stream.read(4)
+    reader = _LimitedReader(stream, limits.max_bytes, prefix=head)
+    extraction = _Extraction(dest, limits)
+    if head in ZIP_MAGIC:
+        _extract_zip(reader, extraction)
+    else:
+        _extract_tar(reader, extraction)
+    return extraction.digest(), len(extraction.files)
+
+
+def _extract_tar(reader, extraction):
+    try:
+        # '|' mode reads strictly forward, so nothing but the current member is buffered
+        with tarfile.open(fileobj=reader, mode='r|*') as archive:
+            for member in archive:
+                if member.isdir():
+                    extraction.directory(member.name)
+                elif member.isreg():
+                    extraction.file(member.name, archive.extractfile(member))
+                elif member.type in (tarfile.XHDTYPE, tarfile.XGLTYPE):
+                    continue
+                else:
+                    raise BundleError(f"Links and special files are not allowed in bundles: {member.name}")
+    except (tarfile.TarError, EOFError) as e:
+        raise BundleError(f"Not a valid tar or zip archive: {e}") from e
+
+
+def _extract_zip(reader, extraction):
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        for chunk in iter(lambda: reader.read(CHUNK_SIZE), b''):
+            spool.write(chunk)
+        spool.seek(0)
+        try:
+            with zipfile.ZipFile(spool) as archive:
+                for info in archive.infolist():
+                    file_type = stat.S_IFMT(info.external_attr >> 16)
+                    if info.is_dir():
+                        extraction.directory(info.filename)
+                    elif file_type not in (0, stat.S_IFREG):
+                        raise BundleError(f"Links and special files are not allowed in bundles: {info.filename}")
+                    else:
+                        with archive.open(info) as source:
+                            extraction.file(info.filename, source)
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, EOFError) as e:
+            raise BundleError(f"Not a valid zip archive: {e}") from e
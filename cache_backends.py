@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Shared cache backends, so replicas reuse each other's renders and charts
+
+A backend stores bytes under (namespace, key), where key is a hex sha256
+computed the same way on every replica: render cache keys hash the
+normalized kustomization and tool versions, chart keys hash the repo, name
+and version.  Whatever one replica renders or pulls is then a hit for all.
+
+  * FilesystemBackend keeps entries as files on a shared volume.  Writes go
+    to a temporary file and are renamed into place, so readers never take a
+    lock and never see a partial entry.
+  * HttpBackend talks to a key-value service over HTTP: GET and PUT on
+    <base>/<namespace>/<key>, 404 for a miss.  `python cache_backends.py
+    serve` runs such a service on top of a FilesystemBackend.
+
+Backends never raise on I/O errors: a failed lookup is a miss and a failed
+store is dropped, so an unreachable cache slows nothing down beyond its
+timeout.  After a network error HttpBackend stops trying for a few seconds.
+"""
+
+import argparse
+import hmac
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_KEY = re.compile(r'^[0-9a-f]{16,128}$')
+_NAMESPACE = re.compile(r'^[a-z][a-z0-9_-]{0,31}$')
+
+
+def _check(namespace, key):
+    if not _NAMESPACE.match(namespace) or not _KEY.match(key):
+        raise ValueError(f"Invalid cache key {namespace}/{key}")
+
+
+class CacheBackend:
+    """Byte store shared between replicas, addressed by (namespace, hex key)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    def get(self, namespace, key):
+        """The bytes stored under key, or None"""
+        _check(namespace, key)
+        data = self._get(namespace, key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def put(self, namespace, key, data):
+        """Store data under key; returns whether it was stored"""
+        _check(namespace, key)
+        stored = self._put(namespace, key, data)
+        if stored:
+            with self._lock:
+                self.stores += 1
+        return stored
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.describe(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'errors': self.errors,
+            }
+
+    def describe(self):
+        raise NotImplementedError
+
+    def _get(self, namespace, key):
+        raise NotImplementedError
+
+    def _put(self, namespace, key, data):
+        raise NotImplementedError
+
+    def _failed(self):
+        with self._lock:
+            self.errors += 1
+
+
+class FilesystemBackend(CacheBackend):
+    """Entries as files under root (a volume every replica mounts)
+
+    Entries older than ttl seconds are misses.  When max_bytes is set, a
+    put at most every prune_interval seconds walks the tree and removes
+    expired entries, then the oldest, until the rest fit.
+    """
+
+    def __init__(self, root, ttl=None, max_bytes=None, prune_interval=60):
+        super().__init__()
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self._next_prune = time.monotonic() + prune_interval
+        os.makedirs(root, exist_ok=True)
+
+    def describe(self):
+        return f"file://{os.path.abspath(self.root)}"
+
+    def path(self, namespace, key):
+        return os.path.join(self.root, namespace, key[:2], key)
+
+    def _get(self, namespace, key):
+        path = self.path(namespace, key)
+        try:
+            with open(path, 'rb') as f:
+                if self.ttl and time.time() - os.fstat(f.fileno()).st_mtime > self.ttl:
+                    return None
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError:
+            self._failed()
+            return None
+
+    def _put(self, namespace, key, data):
+        path = self.path(namespace, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # A unique temp file in the same directory, renamed over the entry: readers see old or new, never half
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError:
+            self._failed()
+            return False
+        if self.max_bytes and time.monotonic() >= self._next_prune:
+            self._next_prune = time.monotonic() + self.prune_interval
+            self.prune()
+        return True
+
+    def prune(self):
+        """Remove expired entries, then the oldest beyond max_bytes; returns the number removed"""
+        entries, total = [], 0
+        now = time.time()
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                try:
+                    status = os.stat(path)
+                except OSError:
+                    continue
+                if filename.startswith('.tmp-'):
+                    # Left behind by a writer that died; live writers finish well within the hour
+                    if now - status.st_mtime > 3600:
+                        removed += _remove(path)
+                    continue
+                if self.ttl and now - status.st_mtime > self.ttl:
+                    removed += _remove(path)
+                    continue
+                entries.append((status.st_mtime, status.st_size, path))
+                total += status.st_size
+        if self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                removed += _remove(path)
+                total -= size
+        return removed
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return 1
+    except OSError:
+        return 0
+
+
+class HttpBackend(CacheBackend):
+    """Entries in a key-value service at base_url (GET/PUT <base_url>/<namespace>/<key>)"""
+
+    def __init__(self, base_url, timeout=2.0, token=None, retry_after=5.0):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.token = token
+        self.retry_after = retry_after
+        self._down_until = 0.0
+
+    def describe(self):
+        parts = urllib.parse.urlsplit(self.base_url)
+        # Never report credentials embedded in the URL
+        return urllib.parse.urlunsplit((parts.scheme, (parts.hostname or '') + (f":{parts.port}" if parts.port else ''),
+                                        parts.path, '', ''))
+
+    def _request(self, method, namespace, key, data=None):
+        if time.monotonic() < self._down_until:
+            return None
+        request = urllib.request.Request(f"{self.base_url}/{namespace}/{key}", data=data, method=method)
+        if self.token:
+            request.add_header('Authorization', f"Bearer {self.token}")
+        if data is not None:
+            request.add_header('Content-Type', 'application/octet-stream')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404 and method == 'GET':
+                return None
+            self._failed()
+            return None
+        except (OSError, ValueError):
+            # Unreachable or timed out: skip the service for a while instead of paying the timeout every time
+            self._down_until = time.monotonic() + self.retry_after
+            self._failed()
+            return None
+
+    def _get(self, namespace, key):
+        return self._request('GET', namespace, key)
+
+    def _put(self, namespace, key, data):
+        return self._request('PUT', namespace, key, data) is not None
+
+
+def from_url(url, **options):
+    """Backend for url: file:///path, a plain path, or http(s)://host[:port]/prefix; None if url is empty"""
+    if not url:
+        return None
+    scheme = urllib.parse.urlsplit(url).scheme
+    if scheme in ('http', 'https'):
+        return HttpBackend(url, timeout=options.get('timeout', 2.0), token=options.get('token'))
+    if scheme == 'file':
+        url = urllib.parse.unquote(urllib.parse.urlsplit(url).path)
+    elif scheme:
+        raise ValueError(f"Unsupported cache backend: {url}")
+    return FilesystemBackend(url, ttl=options.get('ttl'), max_bytes=options.get('max_bytes'))
+
+
+def make_server(backend, address=('127.0.0.1', 8750), token=None, max_entry_bytes=256 * 1024 * 1024):
+    """HTTP key-value service storing into backend, for HttpBackend clients"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _target(self):
+            if token and not hmac.compare_digest(self.headers.get('Authorization', '').encode('utf-8'),
+                                                 f"Bearer {token}".encode('utf-8')):
+                self._reply(401)
+                return None
+            parts = self.path.strip('/').split('/')
+            if len(parts) != 2 or not _NAMESPACE.match(parts[0]) or not _KEY.match(parts[1]):
+                self._reply(400)
+                return None
+            return parts
+
+        def _reply(self, status, body=b''):
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            target = self._target()
+            if target is not None:
+                data = backend.get(*target)
+                self._reply(404) if data is None else self._reply(200, data)
+
+        def do_PUT(self):
+            target = self._target()
+            if target is None:
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > max_entry_bytes:
+                self.close_connection = True
+                self._reply(413)
+                return
+            data = self.rfile.read(length)
+            self._reply(204 if backend.put(*target, data) else 500)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer(address, Handler)
+
+
+def main():
+    """Run a cache service: python cache_backends.py serve --dir <path> [--host] [--port]"""
+    parser = argparse.ArgumentParser(description='Shared render and chart cache service')
+    parser.add_argument('command', choices=['serve'])
+    parser.add_argument('--dir', required=True, help='where entries are stored')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8750)
+    parser.add_argument('--max-bytes', type=int, default=0, help='size budget (0 for none)')
+    args = parser.parse_args()
+    server = make_server(FilesystemBackend(args.dir, max_bytes=args.max_bytes or None),
+                         (args.host, args.port), token=os.environ.get('CACHE_BACKEND_TOKEN'))
+    print(f"Serving the cache in {args.dir} on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Persistent Helm chart store shared across kustomize --enable-helm builds
+
+Charts are kept untarred under <root>/<repo-hash>/<name>/<version>/<name>, and
+linked into each build's chartHome so kustomize finds them locally and never
+runs its own `helm pull`.  With a shared backend (cache_backends), archives
+fetched by one replica are stored there and unpacked by the others instead
+of being downloaded again.
+"""
+
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+
+from yaml_utils import load
+
+
+class ChartCacheError(Exception):
+    """Raised when a chart cannot be fetched or unpacked"""
+
+
+def _repo_id(repo):
+    return hashlib.sha256(repo.rstrip('/').encode('utf-8')).hexdigest()[:16]
+
+
+def archive_key(repo, name, version):
+    """Shared backend key of a chart archive; chart versions are immutable, so this names its content"""
+    return hashlib.sha256(f"{repo.rstrip('/')}\0{name}\0{version}".encode('utf-8')).hexdigest()
+
+
+def _check_component(value, what):
+    """Refuse a chart name or version that would not stay a single path component"""
+    if not isinstance(value, str) or not value or '/' in value or '\\' in value or '\0' in value or '..' in value:
+        raise ChartCacheError(f"Invalid chart {what}: {value!r}")
+
+
+def _inside(path, root):
+    """Whether path resolves to root or somewhere below it"""
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return path == root or path.startswith(root + os.sep)
+
+
+def _read_limited(response, max_bytes, what):
+    """Read a response in chunks, giving up once it grows past max_bytes"""
+    chunks, total = [], 0
+    for chunk in iter(lambda: response.read(64 * 1024), b''):
+        total += len(chunk)
+        if total > max_bytes:
+            raise ChartCacheError(f"{what} is larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def _safe_extract(archive, dest, max_bytes):
+    """Extract a chart archive, refusing members that escape dest or unpack past max_bytes"""
+    dest = os.path.realpath(dest)
+    total = 0
+    for member in archive.getmembers():
+        target = os.path.realpath(os.path.join(dest, member.name))
+        if not target.startswith(dest + os.sep):
+            raise ChartCacheError(f"Unsafe path in chart archive: {member.name}")
+        if member.issym() or member.islnk() or member.isdev():
+            raise ChartCacheError(f"Unsupported member in chart archive: {member.name}")
+        total += member.size
+        if total > max_bytes:
+            raise ChartCacheError(f"Chart archive unpacks to more than {max_bytes} bytes")
+    if hasattr(tarfile, 'data_filter'):
+        archive.extractall(dest, filter='data')
+    else:
+        archive.extractall(dest)
+
+
+class ChartCache:
+    """Chart store keyed by (repo, chart name, version)"""
+
+    NAMESPACE = 'charts'
+
+    def __init__(self, root, fetch_timeout=30, shared=None, repo_schemes=('http', 'https'),
+                 max_archive_bytes=64 * 1024 * 1024, max_extracted_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.fetch_timeout = fetch_timeout
+        # Repos come from request bodies: never let one point the server at its own files, or fill its disk
+        self.repo_schemes = repo_schemes
+        self.max_archive_bytes = max_archive_bytes
+        self.max_extracted_bytes = max_extracted_bytes
+        self.shared = shared
+        # Chart path -> [lock, users]; an entry lives only while some thread installs or waits for that chart
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.fetches = 0
+        self.errors = 0
+
+        os.makedirs(self.root, exist_ok=True)
+
+    def chart_path(self, repo, name, version):
+        """Directory holding the untarred chart (its Chart.yaml lives inside)"""
+        _check_component(name, 'name')
+        _check_component(str(version), 'version')
+        path = os.path.join(self.root, _repo_id(repo), name, str(version), name)
+        if not _inside(path, self.root):
+            raise ChartCacheError(f"Chart {name}-{version} resolves outside the chart store")
+        return path
+
+    def has(self, repo, name, version):
+        return os.path.isfile(os.path.join(self.chart_path(repo, name, version), 'Chart.yaml'))
+
+    def ensure(self, repo, name, version):
+        """Return the local chart path, fetching it from repo on first use"""
+        path = self.chart_path(repo, name, version)
+        if self.has(repo, name, version):
+            self._count('hits')
+            return path
+
+        with self._locked(path):
+            # Another thread may have filled it while we waited
+            if self.has(repo, name, version):
+                self._count('hits')
+                return path
+            if self._install_shared(repo, name, version):
+                self._count('shared_hits')
+                return path
+            try:
+                with self._open(self._chart_url(repo, name, version)) as response:
+                    archive = _read_limited(response, self.max_archive_bytes, f"Chart archive {name}-{version}")
+                self._install(io.BytesIO(archive), repo, name, version)
+            except ChartCacheError:
+                self._count('errors')
+                raise
+            except Exception as e:
+                self._count('errors')
+                raise ChartCacheError(f"Failed to fetch {name}-{version} from {repo}: {e}")
+            self._count('fetches')
+            if self.shared is not None:
+                self.shared.put(self.NAMESPACE, archive_key(repo, name, version), archive)
+        return path
+
+    def seed_from_tgz(self, tgz_path, repo):
+        """Pre-seed the store from a local chart .tgz (air-gapped installs)"""
+        with tarfile.open(tgz_path, 'r:gz') as archive:
+            chart_yaml = next((m for m in archive.getmembers()
+                               if m.name.count('/') == 1 and m.name.endswith('/Chart.yaml')), None)
+            if chart_yaml is None:
+                raise ChartCacheError(f"No Chart.yaml found in {tgz_path}")
+            metadata = load(archive.extractfile(chart_yaml).read())
+        name, version = metadata['name'], str(metadata['version'])
+        if not self.has(repo, name, version):
+            with open(tgz_path, 'rb') as f:
+                self._install(f, repo, name, version)
+        if self.shared is not None:
+            with open(tgz_path, 'rb') as f:
+                self.shared.put(self.NAMESPACE, archive_key(repo, name, version), f.read())
+        return self.chart_path(repo, name, version)
+
+    def prepare_workspace(self, kustomization, workspace):
+        """Link cached charts for every helmCharts entry into workspace's chartHome
+
+        Entries without repo or version (or using OCI repos) are left for
+        kustomize to pull itself.  Returns the number of charts linked.
+        """
+        if not isinstance(kustomization, dict):
+            return 0
+        helm_globals = kustomization.get('helmGlobals') or {}
+        chart_home = os.path.join(workspace, str(helm_globals.get('chartHome') or 'charts'))
+        if not _inside(chart_home, workspace):
+            raise ChartCacheError(f"helmGlobals.chartHome must stay inside the build: {helm_globals['chartHome']!r}")
+
+        linked = 0
+        for chart in kustomization.get('helmCharts') or []:
+            if not isinstance(chart, dict):
+                continue
+            name, repo, version = chart.get('name'), chart.get('repo'), chart.get('version')
+            if not (name and isinstance(repo, str) and version) or repo.startswith('oci://'):
+                continue
+            name = str(name)
+            source = self.ensure(repo, name, str(version))
+            # kustomize looks in <chartHome>/<name>-<version>/<name> (v5.3+) or <chartHome>/<name>
+            for target in (os.path.join(chart_home, f"{name}-{version}", name),
+                           os.path.join(chart_home, name)):
+                if not os.path.lexists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.symlink(source, target)
+            linked += 1
+        return linked
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'root': self.root,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'fetches': self.fetches,
+                'errors': self.errors,
+            }
+        return dict(counters, shared=self.shared.stats() if self.shared is not None else None)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @contextlib.contextmanager
+    def _locked(self, key):
+        """Hold the per-chart lock for key, dropping it once no thread uses it"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    def _open(self, url):
+        if urllib.parse.urlsplit(url).scheme not in self.repo_schemes:
+            raise ChartCacheError(f"Unsupported chart repo URL: {url} (use {' or '.join(self.repo_schemes)})")
+        return urllib.request.urlopen(url, timeout=self.fetch_timeout)
+
+    def _chart_url(self, repo, name, version):
+        """Resolve the archive URL for name/version from the repo's index.yaml"""
+        index_url = repo.rstrip('/') + '/index.yaml'
+        with self._open(index_url) as response:
+            index = load(_read_limited(response, self.max_archive_bytes, index_url))
+        for entry in (index or {}).get('entries', {}).get(name, []):
+            if str(entry.get('version')) == str(version) and entry.get('urls'):
+                return urllib.parse.urljoin(repo.rstrip('/') + '/', entry['urls'][0])
+        raise ChartCacheError(f"Chart {name}-{version} not found in {index_url}")
+
+    def _install_shared(self, repo, name, version):
+        """Unpack the archive another replica stored in the shared backend; False when there is none"""
+        if self.shared is None:
+            return False
+        archive = self.shared.get(self.NAMESPACE, archive_key(repo, name, version))
+        if archive is None:
+            return False
+        try:
+            self._install(io.BytesIO(archive), repo, name, version)
+        except (ChartCacheError, OSError):
+            # A damaged entry: fetch from the repo as if it were not there
+            return False
+        return True
+
+    def _install(self, fileobj, repo, name, version):
+        """Unpack a chart archive stream into the store atomically"""
+        version_dir = os.path.dirname(self.chart_path(repo, name, version))
+        os.makedirs(os.path.dirname(version_dir), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(version_dir), prefix='.staging-')
+        try:
+            # Spool to a seekable file so member paths can be checked before extraction
+            with tempfile.TemporaryFile() as buffered:
+                shutil.copyfileobj(fileobj, buffered)
+                buffered.seek(0)
+                with tarfile.open(fileobj=buffered, mode='r:gz') as archive:
+                    _safe_extract(archive, staging, self.max_extracted_bytes)
+            if not os.path.isfile(os.path.join(staging, name, 'Chart.yaml')):
+                raise ChartCacheError(f"Archive for {name}-{version} has no {name}/Chart.yaml")
+            try:
+                os.rename(staging, version_dir)
+            except OSError:
+                # Lost a race with another process filling the same chart
+                if not self.has(repo, name, version):
+                    raise
+        except tarfile.TarError as e:
+            raise ChartCacheError(f"Invalid chart archive for {name}-{version}: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def main():
+    """Pre-seed the chart store: python chart_cache.py seed <repo> <chart.tgz>..."""
+    if len(sys.argv) < 4 or sys.argv[1] != 'seed':
+        print("Usage: python chart_cache.py seed <repo-url> <chart.tgz> [<chart.tgz> ...]")
+        return
+    root = os.environ.get('CHART_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'kustomize-builder-charts')
+    cache = ChartCache(root)
+    for tgz_path in sys.argv[3:]:
+        try:
+            print(f"✅ Seeded {cache.seed_from_tgz(tgz_path, sys.argv[2])}")
+        except (ChartCacheError, OSError, tarfile.TarError) as e:
+            print(f"❌ Failed to seed {tgz_path}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures for Kustomize Builder tests
+"""
+
+import os
+import shutil
+import stat
+
+import pytest
+
+# The same stub the load tests use (benchmarks/stub_kustomize.py)
+STUB_KUSTOMIZE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'stub_kustomize.py')
+
+
+@pytest.fixture
+def stub_kustomize(tmp_path, monkeypatch):
+    """Put a fake kustomize on PATH; returns a callable giving the build count"""
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    script = bin_dir / 'kustomize'
+    shutil.copyfile(STUB_KUSTOMIZE, script)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    calls_file = tmp_path / 'kustomize-calls.log'
+    calls_file.write_text('')
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv('STUB_KUSTOMIZE_CALLS', str(calls_file))
+
+    return lambda: len(calls_file.read_text().splitlines())
+
+
+@pytest.fixture
+def client(stub_kustomize, tmp_path, monkeypatch):
+    """Flask test client with fresh per-test caches"""
+    import app as app_module
+    from chart_cache import ChartCache
+    from render_cache import RenderCache
+    from render_history import RenderHistory
+    from request_profiler import RequestProfiler
+    from workspace_pool import WorkspacePool
+    from yaml_utils import MemoCache
+
+    app_module._tool_versions.cache_clear()
+    monkeypatch.setattr(app_module, 'TOOL_VERSIONS_CACHE', str(tmp_path / 'tool-versions.json'))
+    monkeypatch.setattr(app_module, 'render_cache', RenderCache())
+    monkeypatch.setattr(app_module, 'chart_cache', ChartCache(str(tmp_path / 'charts')))
+    monkeypatch.setattr(app_module, 'render_history', RenderHistory(str(tmp_path / 'history.sqlite3')))
+    monkeypatch.setattr(app_module, 'workspace_pool', WorkspacePool(2, root=str(tmp_path)))
+    monkeypatch.setattr(app_module, '_render_indexes', MemoCache(app_module.RENDER_INDEX_ENTRIES))
+    monkeypatch.setattr(app_module, 'profiler', RequestProfiler(str(tmp_path / 'profiles')))
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as test_client:
+        yield test_client
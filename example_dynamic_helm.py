@@ -5,27 +5,7 @@ Example script to demonstrate dynamic helm set arguments extraction
 
 import yaml
 
-def extract_helm_set_args(values_inline, prefix=''):
-    """Extract helm --set arguments from valuesInline dictionary"""
-    helm_args = []
-    
-    for key, value in values_inline.items():
-        current_key = f"{prefix}.{key}" if prefix else key
-        
-        if isinstance(value, dict):
-            # Recursively handle nested dictionaries
-            helm_args.extend(extract_helm_set_args(value, current_key))
-        elif isinstance(value, bool):
-            # Handle boolean values
-            helm_args.append(f"--set {current_key}={str(value).lower()}")
-        elif isinstance(value, (int, float)):
-            # Handle numeric values
-            helm_args.append(f"--set {current_key}={value}")
-        else:
-            # Handle string values
-            helm_args.append(f"--set {current_key}={value}")
-    
-    return helm_args
+from helm_values import chart_set_args, helm_template_command
 
 # Example YAML content
 sample_yaml = """apiVersion: kustomize.config.k8s.io/v1beta1
@@ -54,22 +34,19 @@ helmCharts:
 # Parse YAML and extract helm arguments
 yaml_data = yaml.safe_load(sample_yaml)
 
-if 'helmCharts' in yaml_data and len(yaml_data['helmCharts']) > 0:
-    first_chart = yaml_data['helmCharts'][0]
-    if 'valuesInline' in first_chart:
-        values_inline = first_chart['valuesInline']
-        helm_args = extract_helm_set_args(values_inline)
-        
-        print("🧪 Dynamic Helm Set Arguments Extraction")
-        print("=" * 50)
-        print(f"Input YAML valuesInline:")
-        print(yaml.dump(values_inline, default_flow_style=False, indent=2))
-        print("\nGenerated helm --set arguments:")
+charts = chart_set_args(yaml_data)
+
+if charts:
+    print("🧪 Dynamic Helm Set Arguments Extraction")
+    print("=" * 50)
+    for chart, helm_args in charts:
+        print(f"Input YAML valuesInline for {chart.get('name')}:")
+        print(yaml.dump(chart.get('valuesInline') or {}, default_flow_style=False, indent=2))
+        print("\nGenerated helm arguments:")
         for arg in helm_args:
             print(f"  {arg}")
         
         print(f"\nComplete helm command:")
-        helm_set_string = ' '.join(helm_args)
-        print(f"helm template loyaltolpi/qoin {helm_set_string}")
+        print(helm_template_command(chart, helm_args))
 else:
-    print("❌ No helmCharts found in YAML") 
\ No newline at end of file
+    print("❌ No helmCharts found in YAML")
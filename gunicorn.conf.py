@@ -0,0 +1,67 @@
+"""
+Gunicorn settings for Kustomize Builder
+
+Requests spend most of their time waiting on kustomize/helm child processes,
+so each worker runs many threads (gthread).  One worker is the default:
+render jobs and metrics are still kept per process.
+Every setting can be overridden through the environment.
+
+Usage: gunicorn --config gunicorn.conf.py app:app
+"""
+
+import math
+import os
+import time
+
+_cpus = os.cpu_count() or 1
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+worker_class = 'gthread'
+# One process until render jobs (/jobs/<id>) and /metrics counters are shared between workers: with more,
+# a job is only found by the worker that queued it and each scrape reports whichever worker answered
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+
+# Split the host-wide build limit across workers, since admission control is per process
+_build_limit = int(os.environ.get('BUILD_MAX_CONCURRENCY_TOTAL', str(_cpus)))
+os.environ.setdefault('BUILD_MAX_CONCURRENCY', str(max(1, math.ceil(_build_limit / workers))))
+os.environ.setdefault('WORKSPACE_POOL_SIZE', str(2 * int(os.environ['BUILD_MAX_CONCURRENCY'])))
+
+# Enough threads for every build slot and its queue, plus cheap requests (samples, validate, streams)
+threads = int(os.environ.get('GUNICORN_THREADS', str(max(8, 2 * int(os.environ['BUILD_MAX_CONCURRENCY']) + 16))))
+
+# Each live preview stream holds a thread for as long as it is open: let streams take at most half of
+# them, so open preview tabs cannot starve /generate, /validate and /samples
+os.environ.setdefault('PREVIEW_MAX_SESSIONS', str(max(1, threads // 2)))
+
+# Import the app once in the master; workers fork with the tool-version probe already done
+preload_app = True
+
+# Recycle workers now and then to bound slow leaks, jittered so they do not restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', str(max_requests // 10)))
+
+# A render may wait for an admission slot and then run up to BUILD_TIMEOUT; let it finish on reload
+_render_budget = float(os.environ.get('BUILD_TIMEOUT', '30')) + float(os.environ.get('BUILD_QUEUE_TIMEOUT', '10'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', str(int(_render_budget) + 15)))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', str(int(_render_budget) + 30)))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Heartbeat files on tmpfs so a slow overlay filesystem cannot stall workers
+if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+_started = time.monotonic()
+
+
+def when_ready(server):
+    """Probe tool versions in the master so every forked worker inherits the answer"""
+    import app
+
+    versions = app._tool_versions()
+    server.log.info("Tool versions: %s", versions)
+    server.log.info("Ready in %.0f ms: %d workers x %d threads, %s builds per worker",
+                    (time.monotonic() - _started) * 1000, workers, threads,
+                    os.environ['BUILD_MAX_CONCURRENCY'])
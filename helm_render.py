@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Rendering pure-helm kustomizations with `helm template` directly
+
+A kustomization with nothing but helmCharts (no resources, patches,
+namespace or other transformers) makes kustomize do three things: run
+`helm template` for each chart, sort the resulting objects into its legacy
+kind order and re-serialize them as YAML.  This module does the same without
+the kustomize process:
+
+  * plan() says whether a document qualifies, chart by chart;
+  * template_command() builds the helm argv kustomize would use;
+  * kustomize_output() turns helm's stdout into kustomize's output:
+    `List` objects expanded, objects in legacy order, keys sorted the way
+    Go's YAML encoder sorts them, scalars quoted the way it quotes them and
+    documents joined with `---`.
+
+Anything plan() does not recognise goes through kustomize as before.
+"""
+
+import functools
+
+import yaml
+
+from yaml_utils import SafeDumper, SafeLoader, dump
+
+# Fields of a kustomization that leave nothing for kustomize to do besides running helm
+_HELM_ONLY_FIELDS = {'apiVersion', 'kind', 'helmCharts', 'helmGlobals'}
+
+# helmCharts fields handled here; anything else (valuesFile, additionalValuesFiles...) needs kustomize
+_CHART_FIELDS = {'name', 'repo', 'version', 'releaseName', 'namespace', 'valuesInline', 'valuesMerge',
+                 'includeCRDs', 'skipTests', 'skipHooks', 'apiVersions', 'kubeVersion', 'nameTemplate'}
+
+# kustomize's legacy resource order (api/resid/gvk.go): these kinds first, in this order...
+ORDER_FIRST = (
+    'Namespace', 'ResourceQuota', 'StorageClass', 'CustomResourceDefinition', 'ServiceAccount',
+    'PodSecurityPolicy', 'Role', 'ClusterRole', 'RoleBinding', 'ClusterRoleBinding', 'ConfigMap',
+    'Secret', 'Endpoints', 'Service', 'LimitRange', 'PriorityClass', 'PersistentVolume',
+    'PersistentVolumeClaim', 'Deployment', 'StatefulSet', 'CronJob', 'PodDisruptionBudget',
+)
+# ... these last, and everything else in between
+ORDER_LAST = ('MutatingWebhookConfiguration', 'ValidatingWebhookConfiguration')
+_TYPE_ORDER = {kind: index - len(ORDER_FIRST) for index, kind in enumerate(ORDER_FIRST)}
+_TYPE_ORDER.update({kind: index + 1 for index, kind in enumerate(ORDER_LAST)})
+
+
+class NotPureHelm(Exception):
+    """Raised when helm's output holds something only kustomize should judge"""
+
+
+def plan(document):
+    """The helmCharts entries to template directly, or None if kustomize must build the document"""
+    if not isinstance(document, dict) or not set(document) <= _HELM_ONLY_FIELDS:
+        return None
+    charts = document.get('helmCharts')
+    if not isinstance(charts, list) or not charts:
+        return None
+    for chart in charts:
+        if not isinstance(chart, dict) or not set(chart) <= _CHART_FIELDS:
+            return None
+        # Charts come from the chart cache, which needs a plain repo URL and exact version
+        if not (chart.get('name') and chart.get('repo') and chart.get('version')):
+            return None
+        if str(chart['repo']).startswith('oci://'):
+            return None
+        # Without a release name kustomize asks helm to generate a random one
+        if not chart.get('releaseName'):
+            return None
+        # 'replace' and 'merge' combine valuesInline with the chart defaults differently from helm -f
+        if chart.get('valuesMerge', 'override') != 'override':
+            return None
+        if not isinstance(chart.get('valuesInline') or {}, dict):
+            return None
+    return charts
+
+
+def values_yaml(chart):
+    """valuesInline as the values file passed to helm"""
+    return dump(chart.get('valuesInline') or {}, default_flow_style=False, sort_keys=False)
+
+
+def template_command(chart, chart_dir, values_file):
+    """The `helm template` argv kustomize's helm generator runs for chart"""
+    command = ['helm', 'template', str(chart['releaseName']), chart_dir]
+    if chart.get('namespace'):
+        command += ['--namespace', str(chart['namespace'])]
+    if chart.get('nameTemplate'):
+        command += ['--name-template', str(chart['nameTemplate'])]
+    command += ['--values', values_file]
+    for api_version in chart.get('apiVersions') or []:
+        command += ['--api-versions', str(api_version)]
+    if chart.get('kubeVersion'):
+        command += ['--kube-version', str(chart['kubeVersion'])]
+    if chart.get('includeCRDs'):
+        command.append('--include-crds')
+    if chart.get('skipTests'):
+        command.append('--skip-tests')
+    if chart.get('skipHooks'):
+        command.append('--no-hooks')
+    return command
+
+
+def _go_key_less(a, b):
+    """Go yaml.v2's map key order: letters by code point, digit runs by value, other characters first"""
+    for index in range(min(len(a), len(b))):
+        ca, cb = a[index], b[index]
+        if ca == cb:
+            continue
+        a_letter, b_letter = ca.isalpha(), cb.isalpha()
+        if a_letter and b_letter:
+            return ca < cb
+        if a_letter or b_letter:
+            return b_letter
+        an = bn = 0
+        if ca == '0' or cb == '0':
+            back = index - 1
+            while back >= 0 and a[back].isdigit():
+                if a[back] != '0':
+                    an = bn = 1
+                    break
+                back -= 1
+        a_end = index
+        while a_end < len(a) and a[a_end].isdigit():
+            an = an * 10 + int(a[a_end])
+            a_end += 1
+        b_end = index
+        while b_end < len(b) and b[b_end].isdigit():
+            bn = bn * 10 + int(b[b_end])
+            b_end += 1
+        if an != bn:
+            return an < bn
+        if a_end != b_end:
+            return a_end < b_end
+        return ca < cb
+    return len(a) < len(b)
+
+
+_go_key = functools.cmp_to_key(lambda a, b: -1 if _go_key_less(a, b) else (1 if _go_key_less(b, a) else 0))
+
+
+def _sorted(value):
+    """Copy of value with every mapping's keys in Go's order (kustomize emits through a Go map)"""
+    if isinstance(value, dict):
+        return {key: _sorted(value[key]) for key in sorted(value, key=lambda key: _go_key(str(key)))}
+    if isinstance(value, list):
+        return [_sorted(item) for item in value]
+    return value
+
+
+# libyaml takes an int line width; this is as wide as it goes (float('inf') overflows it)
+_NO_FOLDING = 2 ** 31 - 1
+
+
+class _GoStyleDumper(SafeDumper):
+    """Scalars styled as Go's YAML encoder styles them"""
+
+
+def _represent_str(dumper, value):
+    if dumper.resolve(yaml.ScalarNode, value, (True, False)) != 'tag:yaml.org,2002:str' \
+            or value in ('y', 'Y', 'n', 'N'):
+        # Would read back as another type (Go also treats y/n as booleans): double-quote it
+        style = '"'
+    elif '\n' in value:
+        style = '|'
+    else:
+        style = None
+    return dumper.represent_scalar('tag:yaml.org,2002:str', value, style=style)
+
+
+_GoStyleDumper.add_representer(str, _represent_str)
+
+
+def _sort_key(resource):
+    """kustomize's legacy ordering: kind rank, then group/version/kind, then namespace and name"""
+    kind = resource.get('kind') or ''
+    api_version = resource.get('apiVersion') or ''
+    group, _, version = api_version.rpartition('/')
+    gvk = f"{kind or '[noKind]'}.{version or '[noVer]'}.{group or '[noGrp]'}"
+    metadata = resource.get('metadata') or {}
+    return (_TYPE_ORDER.get(kind, 0), gvk, metadata.get('namespace') or 'default', metadata.get('name') or '')
+
+
+def _resources(stdout):
+    for document in yaml.load_all(stdout, Loader=SafeLoader):
+        if document is None:
+            continue
+        if not isinstance(document, dict):
+            raise NotPureHelm('helm produced a document that is not an object')
+        if document.get('kind') == 'List' and isinstance(document.get('items'), list):
+            yield from document['items']
+        else:
+            yield document
+
+
+def kustomize_output(helm_outputs):
+    """kustomize's rendering of the concatenated `helm template` outputs"""
+    resources = []
+    for stdout in helm_outputs:
+        for resource in _resources(stdout):
+            metadata = resource.get('metadata')
+            if not (isinstance(resource, dict) and resource.get('kind') and isinstance(metadata, dict)
+                    and metadata.get('name')):
+                # Let kustomize produce its own error for objects it cannot identify
+                raise NotPureHelm('helm produced an object without kind or metadata.name')
+            resources.append(resource)
+    resources.sort(key=_sort_key)
+    return '---\n'.join(
+        # Go's encoder never folds long scalars; its 2-space indent and unindented sequences are PyYAML's too
+        yaml.dump(_sorted(resource), Dumper=_GoStyleDumper, default_flow_style=False, sort_keys=False,
+                  allow_unicode=True, width=_NO_FOLDING, indent=2)
+        for resource in resources)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Flatten helm valuesInline trees into --set / --set-string / --set-json arguments
+
+The traversal is iterative (no recursion limit on deep trees), lists are
+addressed as a[0].b, and keys and values are escaped for helm's strvals parser.
+"""
+
+import json
+import re
+import shlex
+from functools import lru_cache
+
+# Characters helm's --set parser treats specially inside a key
+_KEY_SPECIALS = re.compile(r'([\\.,=\[\]])')
+# ... and inside a value (a comma starts the next assignment)
+_VALUE_SPECIALS = re.compile(r'([\\,])')
+# What strconv.ParseInt(s, 10, 64) accepts, range aside
+_DECIMAL = re.compile(r'^[+-]?[0-9]+$')
+_INT64 = range(-2 ** 63, 2 ** 63)
+# First characters of every string that may need --set-string
+_TYPED_PREFIXES = frozenset('{+-0123456789tfnTFN')
+
+
+def _coercible(text):
+    """Whether helm's strvals.typedVal would read text as a bool, null or int64 rather than a string"""
+    if text.casefold() in ('true', 'false', 'null') or text == '0':
+        return True
+    # typedVal only tries ParseInt on values that do not start with 0, so 007 stays a string but -01 is -1
+    return text[:1] != '0' and _DECIMAL.match(text) is not None and int(text) in _INT64
+
+
+@lru_cache(maxsize=4096)
+def escape_key(key):
+    # Keys repeat heavily across a values tree, so escaping is memoized
+    key = str(key)
+    return _KEY_SPECIALS.sub(r'\\\1', key) if _KEY_SPECIALS.search(key) else key
+
+
+def escape_value(value):
+    return _VALUE_SPECIALS.sub(r'\\\1', value) if ',' in value or '\\' in value else value
+
+
+def _scalar_arg(path, value):
+    """Pick the flag that makes helm see exactly this value and type"""
+    if value is None or isinstance(value, float):
+        # --set would drop null keys and turn floats into strings
+        return '--set-json', f"{path}={json.dumps(value)}"
+    if isinstance(value, bool):
+        return '--set', f"{path}={'true' if value else 'false'}"
+    if isinstance(value, int):
+        # Beyond int64, --set would hand the digits back as a string
+        return ('--set', f"{path}={value}") if value in _INT64 else ('--set-json', f"{path}={value}")
+    text = str(value)
+    if not text or _coercible(text) or text.startswith('{'):
+        return '--set-string', f"{path}={escape_value(text)}"
+    return '--set', f"{path}={escape_value(text)}"
+
+
+def flatten_values(values):
+    """Return (flag, assignment) pairs for every leaf of a values tree, in document order"""
+    pairs = []
+    append = pairs.append
+    # Depth-first walk with an explicit stack of (path, iterator, is_list) frames
+    stack = [('', iter(values.items()), False)]
+    while stack:
+        prefix, items, is_list = stack[-1]
+        for key, value in items:
+            if is_list:
+                path = f"{prefix}[{key}]"
+            elif prefix:
+                path = f"{prefix}.{escape_key(key)}"
+            else:
+                path = escape_key(key)
+            kind = type(value)
+            if kind is str:
+                if value and value[0] not in _TYPED_PREFIXES:
+                    # Plain strings are by far the most common leaf
+                    append(('--set', f"{path}={escape_value(value)}"))
+                else:
+                    append(_scalar_arg(path, value))
+                continue
+            if kind is bool:
+                append(('--set', f"{path}={'true' if value else 'false'}"))
+                continue
+            if kind is int:
+                append(('--set', f"{path}={value}") if value in _INT64 else _scalar_arg(path, value))
+                continue
+            if kind is not dict and kind is not list:
+                kind = dict if isinstance(value, dict) else list if isinstance(value, list) else None
+            if kind is dict:
+                if value:
+                    stack.append((path, iter(value.items()), False))
+                    break
+                append(('--set-json', f"{path}={{}}"))
+            elif kind is list:
+                if value:
+                    stack.append((path, iter(enumerate(value)), True))
+                    break
+                append(('--set-json', f"{path}=[]"))
+            else:
+                append(_scalar_arg(path, value))
+        else:
+            stack.pop()
+    return pairs
+
+
+def helm_set_args(values):
+    """Shell-quoted helm arguments for a values tree, e.g. ['--set image.tag=2e6d963']"""
+    if not isinstance(values, dict):
+        return []
+    return [f"{flag} {shlex.quote(assignment)}" for flag, assignment in flatten_values(values)]
+
+
+def helm_template_command(chart, set_args):
+    """A standalone `helm template` command line for one helmCharts entry"""
+    name = str(chart.get('name') or '')
+    parts = ['helm', 'template', shlex.quote(str(chart.get('releaseName') or name)), shlex.quote(name)]
+    for option, field in (('--repo', 'repo'), ('--version', 'version'), ('--namespace', 'namespace')):
+        if chart.get(field):
+            parts += [option, shlex.quote(str(chart[field]))]
+    return ' '.join(parts + list(set_args))
+
+
+def chart_set_args(document):
+    """helm_set_args for every helmCharts entry of a kustomization, in one pass"""
+    if not isinstance(document, dict):
+        return []
+    return [
+        (chart, helm_set_args(chart.get('valuesInline') or {}))
+        for chart in document.get('helmCharts') or []
+        if isinstance(chart, dict)
+    ]
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+In-process schema check for Kustomization files
+
+kustomize decodes a kustomization strictly: an unknown top-level field, or a
+number where it expects a string (`version: 1.0`, `newTag: 2`), fails the
+build.  check() finds those mistakes, plus helm charts this service cannot
+pull (no name, repo or version) and a valuesInline that is not a mapping,
+without a workspace or a kustomize process.
+
+The schema below is compiled once, at import, into nested checker functions,
+so checking a parsed document is a walk over the fields it actually has.
+Only when something is wrong is the text composed again to find the line
+and column of each problem.
+
+The check is deliberately lenient about what kustomize itself would
+accept: nested objects may carry fields not listed here, and only the types
+kustomize rejects on decoding are enforced.
+"""
+
+import datetime
+
+import yaml
+
+from yaml_utils import SafeLoader, load_cached
+
+
+class _Problem:
+    __slots__ = ('path', 'message', 'at_key')
+
+    def __init__(self, path, message, at_key=False):
+        self.path = path
+        self.message = message
+        self.at_key = at_key
+
+
+def _type_name(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'a boolean'
+    if isinstance(value, (int, float)):
+        return 'a number'
+    if isinstance(value, dict):
+        return 'a mapping'
+    if isinstance(value, list):
+        return 'a list'
+    return 'a string'
+
+
+# Checkers take (value, path, problems) and append a _Problem for each mistake found
+
+def _string(value, path, problems):
+    # Go's YAML decoder reads timestamps into string fields as written
+    if not isinstance(value, (str, datetime.date)):
+        problems.append(_Problem(path, f"expected a string, got {_type_name(value)}"))
+
+
+def _boolean(value, path, problems):
+    if not isinstance(value, bool):
+        problems.append(_Problem(path, f"expected true or false, got {_type_name(value)}"))
+
+
+def _integer(value, path, problems):
+    if isinstance(value, bool) or not isinstance(value, int):
+        problems.append(_Problem(path, f"expected an integer, got {_type_name(value)}"))
+
+
+def _anything(value, path, problems):
+    pass
+
+
+def _list_of(item_check):
+    def check(value, path, problems):
+        if not isinstance(value, list):
+            problems.append(_Problem(path, f"expected a list, got {_type_name(value)}"))
+            return
+        for position, item in enumerate(value):
+            item_check(item, path + (position,), problems)
+    return check
+
+
+def _map_of(value_check):
+    def check(value, path, problems):
+        if not isinstance(value, dict):
+            problems.append(_Problem(path, f"expected a mapping, got {_type_name(value)}"))
+            return
+        for key, item in value.items():
+            value_check(item, path + (key,), problems)
+    return check
+
+
+def _object(fields, required=(), closed=False):
+    """Checker for a mapping with known fields; closed objects reject any other field"""
+    def check(value, path, problems):
+        if not isinstance(value, dict):
+            problems.append(_Problem(path, f"expected a mapping, got {_type_name(value)}"))
+            return
+        for name in required:
+            if value.get(name) in (None, ''):
+                problems.append(_Problem(path, f"missing required field '{name}'"))
+        for key, item in value.items():
+            field_check = fields.get(key)
+            if field_check is not None:
+                # `resources:` with every entry commented out is null; kustomize reads it as absent
+                if item is not None:
+                    field_check(item, path + (key,), problems)
+            elif closed:
+                problems.append(_Problem(path + (key,), f"unknown field '{key}'", at_key=True))
+    return check
+
+
+_strings = _list_of(_string)
+_string_map = _map_of(_string)
+
+_TARGET = _object({
+    'group': _string, 'version': _string, 'kind': _string, 'name': _string, 'namespace': _string,
+    'labelSelector': _string, 'annotationSelector': _string,
+})
+
+_GENERATOR = _object({
+    'name': _string, 'namespace': _string, 'behavior': _string, 'files': _strings, 'literals': _strings,
+    'envs': _strings, 'env': _string, 'type': _string,
+    'options': _object({'labels': _string_map, 'annotations': _string_map,
+                        'disableNameSuffixHash': _boolean, 'immutable': _boolean}),
+})
+
+# Charts are pulled by name from repo at a pinned version; a single-file kustomization has no local charts
+_HELM_CHART = _object({
+    'name': _string, 'version': _string, 'repo': _string, 'releaseName': _string, 'namespace': _string,
+    'additionalValuesFiles': _strings, 'valuesFile': _string,
+    'valuesInline': _map_of(_anything), 'valuesMerge': _string,
+    'includeCRDs': _boolean, 'skipHooks': _boolean, 'skipTests': _boolean,
+    'apiVersions': _strings, 'kubeVersion': _string, 'nameTemplate': _string,
+}, required=('name', 'repo', 'version'))
+
+# Top-level fields of kustomize's Kustomization type (api/types/kustomization.go)
+_KUSTOMIZATION = _object({
+    'apiVersion': _string,
+    'kind': _string,
+    'metadata': _map_of(_anything),
+    'openapi': _string_map,
+    'namePrefix': _string,
+    'nameSuffix': _string,
+    'namespace': _string,
+    'commonLabels': _string_map,
+    'labels': _list_of(_object({'pairs': _string_map, 'includeSelectors': _boolean,
+                                'includeTemplates': _boolean})),
+    'commonAnnotations': _string_map,
+    'patchesStrategicMerge': _strings,
+    'patchesJson6902': _list_of(_object({'path': _string, 'patch': _string, 'target': _TARGET})),
+    'patches': _list_of(_object({'path': _string, 'patch': _string, 'target': _TARGET,
+                                 'options': _map_of(_boolean)})),
+    'images': _list_of(_object({'name': _string, 'newName': _string, 'newTag': _string,
+                                'digest': _string, 'tagSuffix': _string})),
+    'imageTags': _list_of(_map_of(_anything)),
+    'replacements': _list_of(_map_of(_anything)),
+    'replicas': _list_of(_object({'name': _string, 'count': _integer}, required=('name',))),
+    'vars': _list_of(_map_of(_anything)),
+    'sortOptions': _map_of(_anything),
+    'resources': _strings,
+    'crds': _strings,
+    'bases': _strings,
+    'components': _strings,
+    'configMapGenerator': _list_of(_GENERATOR),
+    'secretGenerator': _list_of(_GENERATOR),
+    'generatorOptions': _object({'labels': _string_map, 'annotations': _string_map,
+                                 'disableNameSuffixHash': _boolean, 'immutable': _boolean}),
+    'configurations': _strings,
+    'generators': _strings,
+    'transformers': _strings,
+    'validators': _strings,
+    'helmGlobals': _object({'chartHome': _string, 'configHome': _string}),
+    'helmCharts': _list_of(_HELM_CHART),
+    'helmChartInflationGenerator': _list_of(_map_of(_anything)),
+    'buildMetadata': _strings,
+}, closed=True)
+
+KINDS = ('Kustomization', 'Component')
+
+
+def check(document):
+    """Schema problems of a parsed kustomization, as _Problem objects; empty when it looks buildable"""
+    problems = []
+    if document is None:
+        # An empty file: let kustomize word that one
+        return problems
+    if not isinstance(document, dict):
+        problems.append(_Problem((), f"a kustomization must be a mapping, got {_type_name(document)}"))
+        return problems
+    _KUSTOMIZATION(document, (), problems)
+    if isinstance(document.get('kind'), str) and document['kind'] not in KINDS:
+        problems.append(_Problem(('kind',), f"kind must be one of {', '.join(KINDS)}"))
+    return problems
+
+
+def format_path(path):
+    text = ''
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else (f".{part}" if text else str(part))
+    return text or '(document)'
+
+
+def errors(yaml_content):
+    """Schema and syntax errors of yaml_content as {'path', 'line', 'column', 'message'} (1-based positions)"""
+    try:
+        document = load_cached(yaml_content)
+    except yaml.YAMLError as e:
+        mark = getattr(e, 'problem_mark', None) or getattr(e, 'context_mark', None)
+        return [{
+            'path': None,
+            'line': mark.line + 1 if mark else None,
+            'column': mark.column + 1 if mark else None,
+            'message': getattr(e, 'problem', None) or str(e),
+        }]
+    problems = check(document)
+    if not problems:
+        return []
+    root = yaml.compose(yaml_content, Loader=SafeLoader)
+    located = []
+    for problem in problems:
+        mark = _locate(root, problem.path, problem.at_key)
+        located.append({
+            'path': format_path(problem.path),
+            'line': mark.line + 1 if mark else 1,
+            'column': mark.column + 1 if mark else 1,
+            'message': problem.message,
+        })
+    return located
+
+
+def describe(found):
+    """One message for a list of errors, one `line:column: path: message` per line"""
+    lines = []
+    for error in found:
+        where = f"{error['line']}:{error['column']}: " if error['line'] else ''
+        what = f"{error['path']}: " if error['path'] else ''
+        lines.append(f"kustomization.yaml:{where}{what}{error['message']}")
+    return '\n'.join(lines)
+
+
+def _locate(node, path, at_key):
+    """Start mark of the node at path (of its key when at_key), or of the deepest node found"""
+    mark = node.start_mark if node is not None else None
+    for depth, part in enumerate(path):
+        child = key_node = None
+        if isinstance(node, yaml.MappingNode):
+            for key, value in node.value:
+                if isinstance(key, yaml.ScalarNode) and key.value == str(part):
+                    key_node, child = key, value
+        elif isinstance(node, yaml.SequenceNode) and isinstance(part, int) and part < len(node.value):
+            child = node.value[part]
+        if child is None:
+            break
+        last = depth == len(path) - 1
+        mark = key_node.start_mark if last and at_key and key_node is not None else child.start_mark
+        node = child
+    return mark
+
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Resource-level diff of two rendered manifests
+
+Both manifests are split into YAML documents in one pass over their lines.
+Documents whose text appears unchanged on both sides are counted as
+unchanged without being parsed, so the cost of a diff follows the size of
+the change rather than the size of the render.  The rest are parsed and
+indexed by (apiVersion, kind, namespace, name) in a dict per side, and
+resources present on both sides are compared field by field.  Nothing is
+compared pairwise, so thousands of resources stay linear.
+
+kustomize never emits two resources with the same id; if a manifest does,
+the last one wins.
+"""
+
+import re
+from collections import Counter
+
+from yaml_utils import load
+
+_PLAIN_KEY = re.compile(r'^[A-Za-z_][A-Za-z0-9_-]*$')
+
+
+def split_documents(text):
+    """Split a multi-document YAML stream on its `---` separator lines"""
+    documents, current = [], []
+    for line in text.splitlines(keepends=True):
+        if line.startswith('---') and (len(line) == 3 or line[3] in ' \t\r\n#'):
+            if current:
+                documents.append(''.join(current))
+            current = []
+            rest = line[3:].strip()
+            if rest and not rest.startswith('#'):
+                current.append(rest + '\n')
+        else:
+            current.append(line)
+    if current:
+        documents.append(''.join(current))
+    return [document for document in documents if document.strip()]
+
+
+def resource_id(resource):
+    """The (apiVersion, kind, namespace, name) tuple identifying a resource"""
+    metadata = resource.get('metadata') or {}
+    if not isinstance(metadata, dict):
+        metadata = {}
+    return (resource.get('apiVersion'), resource.get('kind'), metadata.get('namespace') or '', metadata.get('name'))
+
+
+def _id_dict(key):
+    return dict(zip(('apiVersion', 'kind', 'namespace', 'name'), key))
+
+
+def _index(documents):
+    """Parse documents into {resource id: resource}, keeping document order"""
+    index = {}
+    for document in documents:
+        resource = load(document)
+        if isinstance(resource, dict):
+            index[resource_id(resource)] = resource
+    return index
+
+
+def _segment(key):
+    key = str(key)
+    return f".{key}" if _PLAIN_KEY.match(key) else f'["{key}"]'
+
+
+def _keyed_by_name(items):
+    """{name: item} when every item is a mapping with a distinct name (containers, ports, env...)"""
+    names = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('name'), str) or item['name'] in names:
+            return None
+        names[item['name']] = item
+    return names
+
+
+def diff_values(before, after, path=''):
+    """Yield {'path', 'op', 'before', 'after'} for every field that differs
+
+    Mappings are compared key by key and lists of named mappings by name,
+    other lists by position.
+    """
+    if before == after:
+        return
+    if isinstance(before, dict) and isinstance(after, dict):
+        for key in before:
+            if key not in after:
+                yield {'path': path + _segment(key), 'op': 'removed', 'before': before[key], 'after': None}
+            else:
+                yield from diff_values(before[key], after[key], path + _segment(key))
+        for key in after:
+            if key not in before:
+                yield {'path': path + _segment(key), 'op': 'added', 'before': None, 'after': after[key]}
+        return
+    if isinstance(before, list) and isinstance(after, list):
+        before_names, after_names = _keyed_by_name(before), _keyed_by_name(after)
+        if before_names is not None and after_names is not None:
+            yield from _diff_named(before_names, after_names, path)
+            return
+        for position in range(max(len(before), len(after))):
+            item_path = f"{path}[{position}]"
+            if position >= len(after):
+                yield {'path': item_path, 'op': 'removed', 'before': before[position], 'after': None}
+            elif position >= len(before):
+                yield {'path': item_path, 'op': 'added', 'before': None, 'after': after[position]}
+            else:
+                yield from diff_values(before[position], after[position], item_path)
+        return
+    yield {'path': path or '.', 'op': 'changed', 'before': before, 'after': after}
+
+
+def _diff_named(before, after, path):
+    for name, item in before.items():
+        item_path = f'{path}[name="{name}"]'
+        if name not in after:
+            yield {'path': item_path, 'op': 'removed', 'before': item, 'after': None}
+        else:
+            yield from diff_values(item, after[name], item_path)
+    for name, item in after.items():
+        if name not in before:
+            yield {'path': f'{path}[name="{name}"]', 'op': 'added', 'before': None, 'after': item}
+
+
+def diff_manifests(before, after):
+    """Compare two rendered manifests; returns an iterator of diff events
+
+    Events are {'type': 'added'|'removed', 'resource', 'object'},
+    {'type': 'changed', 'resource', 'changes'} and a final {'type': 'summary'}.
+    Both manifests are parsed before this returns, so YAML errors are raised
+    here rather than halfway through the iteration.
+    """
+    before_documents, after_documents = split_documents(before), split_documents(after)
+    # Byte-identical documents cannot differ; skip parsing them altogether
+    identical = Counter(before_documents) & Counter(after_documents)
+    before_index = _index(_without(before_documents, identical))
+    after_index = _index(_without(after_documents, identical))
+    return _events(before_index, after_index, sum(identical.values()))
+
+
+def _without(documents, identical):
+    remaining = Counter(identical)
+    kept = []
+    for document in documents:
+        if remaining[document] > 0:
+            remaining[document] -= 1
+        else:
+            kept.append(document)
+    return kept
+
+
+def _events(before_index, after_index, unchanged):
+    added = removed = changed = 0
+    for key, resource in after_index.items():
+        if key not in before_index:
+            added += 1
+            yield {'type': 'added', 'resource': _id_dict(key), 'object': resource}
+            continue
+        changes = list(diff_values(before_index[key], resource))
+        if changes:
+            changed += 1
+            yield {'type': 'changed', 'resource': _id_dict(key), 'changes': changes}
+        else:
+            # Same content, different formatting or key order
+            unchanged += 1
+    for key, resource in before_index.items():
+        if key not in after_index:
+            removed += 1
+            yield {'type': 'removed', 'resource': _id_dict(key), 'object': resource}
+    yield {'type': 'summary', 'added': added, 'removed': removed, 'changed': changed, 'unchanged': unchanged}
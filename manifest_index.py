@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Index of the resources in a rendered manifest
+
+build() scans kustomize's output once and records for every document its
+byte offset and size plus apiVersion, kind, namespace, name and labels.
+Only those header fields are parsed: the top-level `apiVersion:` and `kind:`
+lines and the `metadata:` block are picked out of the text with regular
+expressions and handed to the YAML parser on their own, so the spec, data
+and status of large objects are never parsed.  A document whose header
+cannot be read that way is parsed whole.
+
+The index answers summaries (per-kind and per-namespace counts, sizes) and
+filtered pages of resources, and slices single documents out of the output
+without parsing anything again.
+"""
+
+import re
+from collections import Counter
+
+import yaml
+
+from yaml_utils import load
+
+_SELECTOR_KEY = re.compile(r'^([A-Za-z0-9][-A-Za-z0-9_.]*/)?[A-Za-z0-9]([-A-Za-z0-9_.]*[A-Za-z0-9])?$')
+_SET_REQUIREMENT = re.compile(r'^(\S+)\s+(in|notin)\s*\((.*)\)$')
+
+# A `---` line, optionally followed by a comment
+_SEPARATOR = re.compile(r'^---(?:[ \t\r#][^\n]*)?(?:\n|\Z)', re.M)
+# Anything besides blank lines and comments
+_CONTENT = re.compile(r'^[ \t]*[^\s#]', re.M)
+# The top-level apiVersion and kind lines and the metadata block, which runs until the next top-level
+# key (kustomize does not indent block sequences, so `-` lines belong to it too)
+_HEADER = re.compile(r'^(?:apiVersion|kind):[^\n]*(?:\n|\Z)'
+                     r'|^metadata:[^\n]*(?:\n|\Z)(?:[ \t#-][^\n]*(?:\n|\Z)|\n)*', re.M)
+
+
+class ManifestIndex:
+    """Resources of one rendered manifest, in output order
+
+    entries are dicts with index, apiVersion, kind, namespace, name, labels,
+    offset and length (in bytes of the UTF-8 output), line (1-based) and
+    lines.
+    """
+
+    def __init__(self, text, entries, spans, total_bytes, total_lines):
+        self.text = text
+        self.entries = entries
+        self._spans = spans
+        self.total_bytes = total_bytes
+        self.total_lines = total_lines
+
+    def summary(self):
+        kinds = Counter(entry['kind'] for entry in self.entries)
+        namespaces = Counter(entry['namespace'] or '' for entry in self.entries)
+        kind_bytes = Counter()
+        for entry in self.entries:
+            kind_bytes[entry['kind']] += entry['length']
+        return {
+            'resources': len(self.entries),
+            'bytes': self.total_bytes,
+            'lines': self.total_lines,
+            'kinds': [{'kind': kind, 'count': count, 'bytes': kind_bytes[kind]}
+                      for kind, count in kinds.most_common()],
+            'namespaces': dict(namespaces.most_common()),
+        }
+
+    def select(self, kinds=None, namespaces=None, selector=None):
+        """Entries matching every given filter; selector is a parsed label selector"""
+        selected = []
+        for entry in self.entries:
+            if kinds and entry['kind'] not in kinds:
+                continue
+            if namespaces and (entry['namespace'] or '') not in namespaces:
+                continue
+            if selector and not matches(selector, entry['labels']):
+                continue
+            selected.append(entry)
+        return selected
+
+    def content(self, entry):
+        """The text of entry's document"""
+        start, end = self._spans[entry['index']]
+        return self.text[start:end]
+
+
+def build(text):
+    """Index text, a multi-document YAML stream, in a single pass"""
+    # Byte offsets equal character offsets for ASCII, by far the usual case
+    ascii_only = text.isascii()
+    entries, spans = [], []
+    start = byte_start = 0
+    line = 1
+    for separator in _SEPARATOR.finditer(text):
+        byte_end = byte_start + _byte_length(text, start, separator.start(), ascii_only)
+        _add_entry(text, start, separator.start(), byte_start, byte_end, line, entries, spans)
+        line += text.count('\n', start, separator.end())
+        start = separator.end()
+        byte_start = byte_end + _byte_length(text, separator.start(), start, ascii_only)
+    total_bytes = byte_start + _byte_length(text, start, len(text), ascii_only)
+    _add_entry(text, start, len(text), byte_start, total_bytes, line, entries, spans)
+    total_lines = text.count('\n') + (1 if text and not text.endswith('\n') else 0)
+    return ManifestIndex(text, entries, spans, total_bytes, total_lines)
+
+
+def _byte_length(text, start, end, ascii_only):
+    return end - start if ascii_only else len(text[start:end].encode('utf-8'))
+
+
+def _add_entry(text, start, end, byte_start, byte_end, line, entries, spans):
+    if not _CONTENT.search(text, start, end):
+        return
+    resource = _parse_header(text, start, end)
+    metadata = resource.get('metadata')
+    if not isinstance(metadata, dict):
+        metadata = {}
+    labels = metadata.get('labels')
+    entries.append({
+        'index': len(entries),
+        'apiVersion': _text(resource.get('apiVersion')),
+        'kind': _text(resource.get('kind')),
+        'namespace': _text(metadata.get('namespace')),
+        'name': _text(metadata.get('name')),
+        'labels': {str(key): _text(value) for key, value in labels.items()} if isinstance(labels, dict) else {},
+        'offset': byte_start,
+        'length': byte_end - byte_start,
+        'line': line,
+        'lines': text.count('\n', start, end) + (0 if text[end - 1] == '\n' else 1),
+    })
+    spans.append((start, end))
+
+
+def _parse_header(text, start, end):
+    """apiVersion, kind and metadata of the document text[start:end], parsed without the rest"""
+    header = ''.join(match.group() for match in _HEADER.finditer(text, start, end))
+    try:
+        resource = load(header)
+    except yaml.YAMLError:
+        resource = None
+    if not isinstance(resource, dict):
+        try:
+            # Anchors, flow style or odd indentation: fall back to the whole document
+            resource = load(text[start:end])
+        except yaml.YAMLError:
+            resource = None
+    return resource if isinstance(resource, dict) else {}
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def parse_selector(text):
+    """Parse a Kubernetes label selector into a list of (key, operator, values)
+
+    Supports `k=v`, `k==v`, `k!=v`, `k in (a,b)`, `k notin (a,b)`, `k` and
+    `!k`; raises ValueError for anything else.
+    """
+    requirements = []
+    for term in _split_terms(text):
+        term = term.strip()
+        if not term:
+            raise ValueError(f"Empty requirement in label selector: {text!r}")
+        match = _SET_REQUIREMENT.match(term)
+        if match:
+            key, operator, values = match.group(1), match.group(2), match.group(3)
+            values = frozenset(value.strip() for value in values.split(','))
+            if '' in values:
+                raise ValueError(f"Empty value in label selector: {term!r}")
+            requirement = (key, operator, values)
+        elif '!=' in term:
+            key, value = term.split('!=', 1)
+            requirement = (key.strip(), '!=', frozenset([value.strip()]))
+        elif '=' in term:
+            key, value = term.split('==', 1) if '==' in term else term.split('=', 1)
+            requirement = (key.strip(), '=', frozenset([value.strip()]))
+        elif term.startswith('!'):
+            requirement = (term[1:].strip(), '!exists', frozenset())
+        else:
+            requirement = (term, 'exists', frozenset())
+        if not _SELECTOR_KEY.match(requirement[0]):
+            raise ValueError(f"Invalid label key in selector: {requirement[0]!r}")
+        requirements.append(requirement)
+    return requirements
+
+
+def _split_terms(text):
+    # Commas separate requirements except inside the value list of in/notin
+    terms, current, depth = [], [], 0
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            terms.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    if depth != 0:
+        raise ValueError(f"Unbalanced parentheses in label selector: {text!r}")
+    terms.append(''.join(current))
+    return terms
+
+
+def matches(requirements, labels):
+    """Whether labels satisfy every requirement of a parsed selector"""
+    for key, operator, values in requirements:
+        present = key in labels
+        if operator == 'exists':
+            ok = present
+        elif operator == '!exists':
+            ok = not present
+        elif operator in ('=', 'in'):
+            ok = present and labels[key] in values
+        else:
+            # != and notin also match resources without the label, as in Kubernetes
+            ok = not present or labels[key] not in values
+        if not ok:
+            return False
+    return True
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Dependency-free Prometheus metrics with per-thread shards
+
+Every metric keeps one value table per thread, so recording a sample is a
+plain dict update with no lock.  A scrape sums the shards.  Shards of threads
+that have exited are folded into a single retired table whenever a new thread
+registers, which keeps thread-per-request servers from growing them forever.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans in-memory lookups up to builds that hit BUILD_TIMEOUT
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Bytes of rendered output
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            pass
+        values = {}
+        thread = threading.current_thread()
+        with self._lock:
+            live = []
+            for owner, shard in self._shards:
+                if owner.is_alive():
+                    live.append((owner, shard))
+                else:
+                    self._fold(self._retired, shard)
+            live.append((thread, values))
+            self._shards = live
+        self._local.values = values
+        return values
+
+    def _snapshot(self):
+        """Sum of every shard, keyed by label values"""
+        with self._lock:
+            total = {}
+            self._fold(total, self._retired)
+            for _, shard in self._shards:
+                # dict.copy() runs without releasing the GIL, so writers cannot interleave
+                self._fold(total, shard.copy())
+            return total
+
+    def _fold(self, into, shard):
+        for key, value in shard.items():
+            into[key] = into.get(key, 0) + value
+
+    def _samples(self):
+        for key, value in sorted(self._snapshot().items()):
+            yield self.name, _labels_text(self.labelnames, key), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_format_value(value)}" for name, labels, value in self._samples()]
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """Gauge built from increments, e.g. in-flight work
+
+    Increments and decrements may come from different threads; the scrape
+    adds them up.
+    """
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels):
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(_Metric):
+    """Histogram; on_observe(value, labels), when given, also sees every sample"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, on_observe=None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.on_observe = on_observe
+
+    def observe(self, value, *labels):
+        if self.on_observe is not None:
+            self.on_observe(value, labels)
+        values = self._shard()
+        counts = values.get(labels)
+        if counts is None:
+            # One slot per bucket plus +Inf, then the running sum
+            counts = values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _fold(self, into, shard):
+        for key, counts in shard.items():
+            total = into.get(key)
+            if total is None:
+                into[key] = list(counts)
+            else:
+                for index, count in enumerate(counts):
+                    total[index] += count
+
+    def _samples(self):
+        bounds = self.buckets + (math.inf,)
+        for key, counts in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield (f"{self.name}_bucket",
+                       _labels_text(self.labelnames, key, [('le', _format_value(float(bound)))]),
+                       cumulative)
+            yield f"{self.name}_sum", _labels_text(self.labelnames, key), counts[-1]
+            yield f"{self.name}_count", _labels_text(self.labelnames, key), cumulative
+
+
+class Registry:
+    """A set of metrics plus collectors that report existing counters at scrape time"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, on_observe=None):
+        return self._add(Histogram(name, documentation, labelnames, buckets, on_observe))
+
+    def collector(self, collect):
+        """Register collect(), returning (name, kind, documentation, [(labels dict, value)]) tuples"""
+        self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        blocks = [metric.render() for metric in self._metrics]
+        for collect in self._collectors:
+            for name, kind, documentation, samples in collect():
+                lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels_text(list(labels), list(labels.values()))} "
+                                 f"{_format_value(value)}")
+                blocks.append('\n'.join(lines))
+        return '\n'.join(blocks) + '\n'
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
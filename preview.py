@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Live preview sessions: debounced, latest-revision-wins renders pushed over SSE
+
+An editor session holds one Server-Sent Events stream open and posts each
+edit separately.  Edits land in a per-session mailbox file, so a POST that
+reaches a different server process than the stream still gets through.  The
+process holding the stream waits for the editor to go quiet, runs one render
+at a time, cancels it (killing kustomize) as soon as a newer revision shows
+up, and pushes only results for the latest revision.
+"""
+
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+SESSION_ID = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+class PreviewBusy(Exception):
+    """Raised when a process already holds max_sessions preview streams"""
+
+
+class CancelToken:
+    """Cancellation flag for one render; callbacks run once, on cancel()"""
+
+    def __init__(self):
+        self.cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class _Subscription:
+    def __init__(self):
+        self.wake = threading.Event()
+        self.replaced = False
+
+
+class _EventStream:
+    """A session's event generator that gives its slot back when closed, even if it never started"""
+
+    def __init__(self, events, release):
+        self._events = events
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._events)
+
+    def close(self):
+        self._events.close()
+        self._release()
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+class PreviewHub:
+    """Preview sessions of one server process
+
+    render(yaml_content, token) returns (payload, cache_status), or None
+    when the token was cancelled before a result was ready.
+    """
+
+    def __init__(self, render, spool_dir=None, debounce=0.3, poll_interval=0.05, heartbeat=15.0,
+                 max_sessions=256, mailbox_ttl=3600):
+        self.render = render
+        self.spool_dir = spool_dir or os.path.join(tempfile.gettempdir(), 'kustomize-builder-preview')
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.max_sessions = max_sessions
+        self.mailbox_ttl = mailbox_ttl
+
+        self._sessions = {}
+        self._parsed = {}
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+
+        self.submissions = 0
+        self.renders = 0
+        self.cancelled = 0
+        self.pushed = 0
+
+    def submit(self, session_id, yaml_content, revision=None):
+        """Record a new revision for a session; returns the revision, or None if it was stale"""
+        # Two edits posted at once must not both read revision n and both write n + 1
+        with self._mailboxes_locked():
+            current = self._read_mailbox(session_id)
+            current_revision = current['revision'] if current else 0
+            if revision is None:
+                revision = current_revision + 1
+            elif revision <= current_revision:
+                return None
+            self._write_mailbox(session_id, {'revision': revision, 'yaml_content': yaml_content})
+        with self._lock:
+            self.submissions += 1
+            subscription = self._sessions.get(session_id)
+        if subscription is not None:
+            subscription.wake.set()
+        return revision
+
+    def events(self, session_id):
+        """Open the session's event stream, replacing any earlier stream of the same session"""
+        subscription = _Subscription()
+        # Checked and registered in one step, so concurrent opens cannot overshoot max_sessions
+        with self._lock:
+            previous = self._sessions.get(session_id)
+            if previous is None and len(self._sessions) >= self.max_sessions:
+                raise PreviewBusy('Too many live preview sessions')
+            self._sessions[session_id] = subscription
+        if previous is not None:
+            previous.replaced = True
+            previous.wake.set()
+        self._sweep()
+        return _EventStream(self._stream(session_id, subscription),
+                            lambda: self._release(session_id, subscription))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'submissions': self.submissions,
+                'renders': self.renders,
+                'cancelled': self.cancelled,
+                'pushed': self.pushed,
+            }
+
+    def _stream(self, session_id, subscription):
+        token = None
+        rendered = 0
+        last_write = time.monotonic()
+        try:
+            yield f"retry: 1000\n\n{_event('ready', {'session': session_id})}"
+            while not subscription.replaced:
+                message = self._read_mailbox(session_id)
+                if message is None or message['revision'] <= rendered:
+                    subscription.wake.wait(self.poll_interval)
+                    subscription.wake.clear()
+                    if time.monotonic() - last_write >= self.heartbeat:
+                        # Comments keep proxies from timing out and reveal closed connections
+                        last_write = time.monotonic()
+                        self._touch_mailbox(session_id)
+                        yield ': keepalive\n\n'
+                    continue
+
+                message = self._settle(session_id, subscription, message)
+                if subscription.replaced:
+                    break
+                revision = message['revision']
+                yield _event('rendering', {'revision': revision})
+
+                token = CancelToken()
+                outcome = self._start_render(message['yaml_content'], token, subscription)
+                while not outcome['done'].is_set():
+                    subscription.wake.wait(self.poll_interval)
+                    subscription.wake.clear()
+                    latest = self._read_mailbox(session_id)
+                    if subscription.replaced or (latest and latest['revision'] > revision):
+                        token.cancel()
+                rendered = revision
+                last_write = time.monotonic()
+
+                if token.cancelled or outcome.get('result') is None:
+                    with self._lock:
+                        self.cancelled += 1
+                    continue
+                payload, cache_status = outcome['result']
+                with self._lock:
+                    self.pushed += 1
+                yield _event('result', dict(payload, revision=revision, cache=cache_status))
+        finally:
+            # Runs when the client disconnects too: stop the build and forget the session
+            if token is not None:
+                token.cancel()
+            self._release(session_id, subscription)
+
+    def _release(self, session_id, subscription):
+        """Forget the session, unless a newer stream has taken it over"""
+        with self._lock:
+            if self._sessions.get(session_id) is subscription:
+                del self._sessions[session_id]
+                self._parsed.pop(session_id, None)
+                self._remove_mailbox(session_id)
+
+    def _settle(self, session_id, subscription, message):
+        """Wait until no new revision has arrived for debounce seconds; return the latest"""
+        quiet_since = time.monotonic()
+        while not subscription.replaced:
+            remaining = self.debounce - (time.monotonic() - quiet_since)
+            if remaining <= 0:
+                break
+            subscription.wake.wait(min(remaining, self.poll_interval))
+            subscription.wake.clear()
+            latest = self._read_mailbox(session_id)
+            if latest and latest['revision'] > message['revision']:
+                message, quiet_since = latest, time.monotonic()
+        return message
+
+    def _start_render(self, yaml_content, token, subscription):
+        outcome = {'done': threading.Event()}
+
+        def run():
+            try:
+                outcome['result'] = self.render(yaml_content, token)
+            except Exception as e:
+                outcome['result'] = {'success': False, 'output': None, 'error': str(e)}, 'MISS'
+            finally:
+                outcome['done'].set()
+                subscription.wake.set()
+
+        with self._lock:
+            self.renders += 1
+        threading.Thread(target=run, daemon=True).start()
+        return outcome
+
+    def _mailbox_path(self, session_id):
+        return os.path.join(self.spool_dir, f"{session_id}.json")
+
+    def _read_mailbox(self, session_id):
+        # Polled every poll_interval, so only re-read the file when it was replaced
+        path = self._mailbox_path(session_id)
+        try:
+            info = os.stat(path)
+            signature = (info.st_ino, info.st_mtime_ns, info.st_size)
+            cached = self._parsed.get(session_id)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            with open(path, encoding='utf-8') as f:
+                message = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if session_id in self._sessions:
+            self._parsed[session_id] = (signature, message)
+        return message
+
+    @contextlib.contextmanager
+    def _mailboxes_locked(self):
+        """Serialize mailbox updates across threads and, through a lock file, across server processes"""
+        with self._submit_lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.spool_dir, exist_ok=True)
+            with open(os.path.join(self.spool_dir, '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def _write_mailbox(self, session_id, message):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.spool_dir, prefix='.incoming-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(message, f)
+            os.replace(temp_path, self._mailbox_path(session_id))
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _sweep(self):
+        """Delete mailboxes of sessions whose stream never opened or never closed cleanly
+
+        Open streams touch their mailbox at every heartbeat, so a quiet but live session is never swept.
+        """
+        cutoff = time.time() - self.mailbox_ttl
+        with self._lock:
+            live = {self._mailbox_path(session_id) for session_id in self._sessions}
+        try:
+            with os.scandir(self.spool_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.json') and entry.path not in live and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+        except OSError:
+            pass
+
+    def _touch_mailbox(self, session_id):
+        try:
+            os.utime(self._mailbox_path(session_id))
+        except OSError:
+            pass
+
+    def _remove_mailbox(self, session_id):
+        try:
+            os.unlink(self._mailbox_path(session_id))
+        except OSError:
+            pass
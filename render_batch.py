@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Parallel rendering of a batch of kustomization documents
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def normalize_documents(documents):
+    """Accept plain YAML strings or {'name', 'yaml_content'} objects"""
+    if not isinstance(documents, list):
+        raise ValueError("'documents' must be a list")
+    normalized = []
+    for index, document in enumerate(documents):
+        if isinstance(document, str):
+            normalized.append({'name': str(index), 'yaml_content': document})
+        elif isinstance(document, dict) and isinstance(document.get('yaml_content'), str):
+            normalized.append({'name': str(document.get('name', index)),
+                               'yaml_content': document['yaml_content']})
+        else:
+            raise ValueError(f"Document {index} must be a string or have a 'yaml_content' string")
+    return normalized
+
+
+def render_batch(render, documents, workers=None):
+    """Yield one result dict per document, in completion order
+
+    render(yaml_content) returns a /generate style payload; exceptions from it
+    become per-item errors so one bad document never fails the whole batch.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(documents)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-render')
+    try:
+        futures = {executor.submit(render, document['yaml_content']): (index, document['name'])
+                   for index, document in enumerate(documents)}
+        for future in as_completed(futures):
+            index, name = futures[future]
+            try:
+                payload = future.result()
+            except Exception as e:
+                payload = {'success': False, 'output': None, 'error': str(e)}
+            yield dict(payload, index=index, name=name)
+    finally:
+        # Stop queued renders if the client went away mid-stream
+        executor.shutdown(wait=False, cancel_futures=True)
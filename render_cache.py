@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for rendered kustomize output
+
+Keys hash the normalized kustomization and the tool versions, so replicas
+running the same image compute the same key for the same input, and a
+shared backend (cache_backends) lets one replica's render serve them all.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import yaml
+
+from yaml_utils import load_cached
+
+
+def normalize_yaml(yaml_content):
+    """Return a canonical form of yaml_content so cosmetic edits hash the same"""
+    try:
+        data = load_cached(yaml_content)
+    except yaml.YAMLError:
+        # Unparseable input is keyed on its raw text; kustomize will reject it anyway
+        return yaml_content.strip()
+    try:
+        return json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    except TypeError:
+        # Mappings mixing key types (`80: http` next to `metrics: 9090`) cannot be sorted as they are
+        return 'typed:' + json.dumps(_typed_keys(data), sort_keys=True, separators=(',', ':'), default=str)
+
+
+def _typed_keys(value):
+    """value with every mapping key turned into a string tagged with its type, so 80 and '80' stay apart"""
+    if isinstance(value, dict):
+        return {f"{type(key).__name__}:{key}": _typed_keys(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_typed_keys(item) for item in value]
+    return value
+
+
+def make_key(yaml_content, tool_versions=''):
+    """Build the cache key for a render from its YAML and the tool versions"""
+    digest = hashlib.sha256()
+    digest.update(normalize_yaml(yaml_content).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(tool_versions.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Memory LRU + optional local disk + optional shared backend cache of rendered manifests"""
+
+    NAMESPACE = 'renders'
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=3600,
+                 disk_dir=None, disk_max_bytes=512 * 1024 * 1024, shared=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.shared = shared
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._disk_bytes = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(os.path.getsize(path) for path, _ in self._disk_files())
+
+    def get(self, key):
+        """Return the cached output for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, output = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return output
+                self._remove(key)
+
+        output = self._disk_get(key, now)
+        if output is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self._insert(key, output, now)
+            return output
+
+        output = self._shared_get(key)
+        with self._lock:
+            if output is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._insert(key, output, now)
+        self._disk_put(key, output)
+        return output
+
+    def put(self, key, output):
+        """Store a rendered output under key in every configured tier"""
+        now = time.time()
+        with self._lock:
+            self._insert(key, output, now)
+        self._disk_put(key, output)
+        if self.shared is not None:
+            self.shared.put(self.NAMESPACE, key, output.encode('utf-8'))
+
+    def clear(self):
+        """Drop every memory entry (disk and shared entries are left to expire)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.disk_hits + self.shared_hits) / lookups if lookups else 0.0,
+                'disk_dir': self.disk_dir,
+                'disk_bytes': self._disk_bytes,
+                'shared': self.shared.stats() if self.shared is not None else None,
+            }
+
+    # Memory tier (callers hold self._lock)
+
+    def _insert(self, key, output, stored_at):
+        size = len(output)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (stored_at, output)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, output = self._entries.pop(key)
+        self._bytes -= len(output)
+
+    # Disk tier
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + '.yaml')
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for filename in files:
+                if filename.endswith('.yaml'):
+                    path = os.path.join(root, filename)
+                    try:
+                        yield path, os.path.getmtime(path)
+                    except OSError:
+                        continue
+
+    def _disk_get(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl:
+                self._disk_remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _disk_put(self, key, output):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a sibling temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(output)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._disk_bytes += os.path.getsize(path) - previous
+        if self._disk_bytes > self.disk_max_bytes:
+            self._disk_evict()
+
+    def _disk_remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes -= size
+
+    def _disk_evict(self):
+        """Remove the oldest disk entries until the tier fits its budget again"""
+        for path, _ in sorted(self._disk_files(), key=lambda item: item[1]):
+            if self._disk_bytes <= self.disk_max_bytes:
+                break
+            self._disk_remove(path)
+            with self._lock:
+                self.evictions += 1
+
+    # Shared tier
+
+    def _shared_get(self, key):
+        if self.shared is None:
+            return None
+        data = self.shared.get(self.NAMESPACE, key)
+        if data is None:
+            return None
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Local render history in SQLite, with compressed, deduplicated inputs and outputs
+
+Each render becomes a row in `renders` pointing at its input and output in
+`blobs`, where every distinct text is stored once, zlib-compressed, under
+its sha256.  Re-rendering an unchanged kustomization therefore adds a row of
+metadata and nothing else.
+
+record() only queues the entry; a background thread per process writes it,
+so history never adds latency to the request that produced the render.
+"""
+
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS renders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    route TEXT NOT NULL,
+    sample TEXT,
+    input_hash TEXT NOT NULL,
+    output_hash TEXT,
+    success INTEGER NOT NULL,
+    error TEXT,
+    cache TEXT,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS renders_created ON renders (created_at);
+CREATE INDEX IF NOT EXISTS renders_sample ON renders (sample, created_at);
+CREATE INDEX IF NOT EXISTS renders_input ON renders (input_hash, created_at);
+CREATE INDEX IF NOT EXISTS renders_output ON renders (output_hash);
+"""
+
+COLUMNS = ('id', 'created_at', 'route', 'sample', 'input_hash', 'output_hash',
+           'success', 'error', 'cache', 'duration')
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class RenderHistory:
+    """Render history in the SQLite database at path
+
+    max_age (seconds) and max_bytes (compressed blob bytes) are enforced by
+    the writer thread every purge_interval seconds; 0 disables either.
+    Entries arriving while max_queue are already waiting are dropped.
+    """
+
+    def __init__(self, path, max_age=7 * 24 * 3600, max_bytes=256 * 1024 * 1024,
+                 max_queue=1000, purge_interval=60, compress_level=6):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_queue = max_queue
+        self.purge_interval = purge_interval
+        self.compress_level = compress_level
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_purge = time.monotonic()
+
+        self.recorded = 0
+        self.dropped = 0
+        self.write_errors = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            # WAL lets the request threads of every worker read while one of them writes
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+
+    def record(self, route, input_text, output, success, error=None, cache=None, duration=None,
+               sample=None, input_hash=None):
+        """Queue a render for the history; never blocks
+
+        input_hash defaults to the sha256 of input_text; pass it (with
+        input_text None) for inputs that are not a single text, like bundles.
+        """
+        self._ensure_writer()
+        if self._queue.qsize() >= self.max_queue:
+            with self._lock:
+                self.dropped += 1
+            return False
+        self._queue.put((time.time(), route, sample, input_text, input_hash, output,
+                         bool(success), error, cache, duration))
+        return True
+
+    def flush(self):
+        """Block until every queued entry has been written"""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def list(self, sample=None, input_hash=None, since=None, until=None, limit=50):
+        """Newest-first metadata of renders matching every given filter
+
+        Page backwards by passing the last entry's created_at as until.
+        """
+        clauses, params = [], []
+        for clause, value in (('sample = ?', sample), ('input_hash = ?', input_hash),
+                              ('created_at >= ?', since), ('created_at < ?', until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM renders {where} ORDER BY created_at DESC LIMIT ?",
+                params + [limit]).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def get(self, render_id):
+        """One render with its input and output texts, or None"""
+        with self._connect() as db:
+            row = db.execute(f"SELECT {', '.join(COLUMNS)} FROM renders WHERE id = ?", (render_id,)).fetchone()
+            if row is None:
+                return None
+            entry = self._entry(row)
+            entry['input'] = self._blob(db, entry['input_hash'])
+            entry['output'] = self._blob(db, entry['output_hash'])
+        return entry
+
+    def purge(self, older_than=None, max_bytes=None):
+        """Delete renders older than older_than seconds, then the oldest until blobs fit in max_bytes
+
+        Blobs no longer referenced by any render are removed with them.
+        Returns the numbers of renders and blobs deleted.
+        """
+        with self._connect() as db:
+            renders = 0
+            if older_than is not None:
+                renders += db.execute('DELETE FROM renders WHERE created_at < ?',
+                                      (time.time() - older_than,)).rowcount
+            blobs = self._delete_orphans(db)
+            if max_bytes is not None:
+                while self._stored_bytes(db) > max_bytes:
+                    # Drop the oldest tenth at a time rather than one row per round trip
+                    count = db.execute('SELECT COUNT(*) FROM renders').fetchone()[0]
+                    if count == 0:
+                        break
+                    renders += db.execute(
+                        'DELETE FROM renders WHERE id IN (SELECT id FROM renders ORDER BY created_at LIMIT ?)',
+                        (max(1, count // 10),)).rowcount
+                    blobs += self._delete_orphans(db)
+        return {'renders': renders, 'blobs': blobs}
+
+    def stats(self):
+        with self._connect() as db:
+            renders = db.execute('SELECT COUNT(*) FROM renders').fetchone()[0]
+            blobs, size, stored = db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs').fetchone()
+        with self._lock:
+            return {
+                'renders': renders,
+                'blobs': blobs,
+                'content_bytes': size,
+                'stored_bytes': stored,
+                'queue_depth': self._queue.qsize(),
+                'recorded': self.recorded,
+                'dropped': self.dropped,
+                'write_errors': self.write_errors,
+            }
+
+    def _connect(self):
+        # A connection per call: cheap for SQLite, and safe across threads and forked workers
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        db.execute('PRAGMA synchronous=NORMAL')
+        return _Transaction(db)
+
+    @staticmethod
+    def _entry(row):
+        entry = dict(zip(COLUMNS, row))
+        entry['success'] = bool(entry['success'])
+        return entry
+
+    @staticmethod
+    def _blob(db, blob_hash):
+        if blob_hash is None:
+            return None
+        row = db.execute('SELECT data FROM blobs WHERE hash = ?', (blob_hash,)).fetchone()
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    @staticmethod
+    def _stored_bytes(db):
+        return db.execute('SELECT COALESCE(SUM(stored_size), 0) FROM blobs').fetchone()[0]
+
+    @staticmethod
+    def _delete_orphans(db):
+        return db.execute(
+            'DELETE FROM blobs WHERE NOT EXISTS (SELECT 1 FROM renders WHERE input_hash = blobs.hash)'
+            ' AND NOT EXISTS (SELECT 1 FROM renders WHERE output_hash = blobs.hash)').rowcount
+
+    def _ensure_writer(self):
+        # Threads do not survive fork, so (re)start the writer in whichever process records
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            threading.Thread(target=self._write_loop, name='render-history-writer', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _write_loop(self):
+        # Nothing may end this loop: a dead writer would stop the history for the life of the process
+        while True:
+            batch = [self._queue.get()]
+            # Whatever else is already waiting goes into the same transaction
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+                if time.monotonic() - self._last_purge >= self.purge_interval:
+                    self._last_purge = time.monotonic()
+                    self.purge(self.max_age or None, self.max_bytes or None)
+            except Exception:
+                with self._lock:
+                    self.write_errors += 1
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        try:
+            self._write(batch)
+            written = len(batch)
+        except Exception:
+            # One bad entry must not cost the others in its batch: write them one at a time
+            written = 0
+            for entry in batch:
+                try:
+                    self._write([entry])
+                    written += 1
+                except Exception:
+                    with self._lock:
+                        self.write_errors += 1
+        with self._lock:
+            self.recorded += written
+
+    def _write(self, batch):
+        # Compress outside the transaction so the write lock is held briefly
+        rows, blobs = [], {}
+        for created_at, route, sample, input_text, input_hash, output, success, error, cache, duration in batch:
+            if input_text is not None:
+                input_hash = content_hash(input_text)
+                blobs.setdefault(input_hash, input_text)
+            output_hash = None
+            if output is not None:
+                output_hash = content_hash(output)
+                blobs.setdefault(output_hash, output)
+            rows.append((created_at, route, sample, input_hash, output_hash, int(success), error, cache, duration))
+
+        with self._connect() as db:
+            known = {blob_hash for blob_hash in blobs
+                     if db.execute('SELECT 1 FROM blobs WHERE hash = ?', (blob_hash,)).fetchone()}
+        compressed = [self._compress(blob_hash, text) for blob_hash, text in blobs.items() if blob_hash not in known]
+
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            # A purge may have dropped a blob since it was looked up; store it again rather than dangle a render
+            compressed += [self._compress(blob_hash, blobs[blob_hash]) for blob_hash in known
+                           if not db.execute('SELECT 1 FROM blobs WHERE hash = ?', (blob_hash,)).fetchone()]
+            db.executemany('INSERT OR IGNORE INTO blobs (hash, size, stored_size, data) VALUES (?, ?, ?, ?)',
+                           [(blob_hash, size, len(data), data) for blob_hash, size, data in compressed])
+            db.executemany(
+                'INSERT INTO renders (created_at, route, sample, input_hash, output_hash, success, error, cache,'
+                ' duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _compress(self, blob_hash, text):
+        data = text.encode('utf-8')
+        return blob_hash, len(data), zlib.compress(data, self.compress_level)
+
+
+class _Transaction:
+    """Context manager around an autocommit connection: commits an open BEGIN on success, always closes"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.db.in_transaction:
+                if exc_type is None:
+                    self.db.commit()
+                else:
+                    self.db.rollback()
+        finally:
+            self.db.close()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Asynchronous render jobs executed by a fixed-size worker pool
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue is at its configured depth"""
+
+
+class RenderJob:
+    """A single queued render and its eventual result"""
+
+    def __init__(self, yaml_content):
+        self.id = uuid.uuid4().hex
+        self.yaml_content = yaml_content
+        self.status = 'queued'
+        self.result = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        info = {
+            'job_id': self.id,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.started_at is not None:
+            info['wait_time'] = self.started_at - self.submitted_at
+        if self.status == 'done':
+            info['run_time'] = self.finished_at - self.started_at
+            info['result'] = self.result
+        return info
+
+
+class RenderJobQueue:
+    """Runs render(yaml_content) -> payload for submitted jobs on worker threads"""
+
+    def __init__(self, render, workers=None, max_queue=1000, retention=600):
+        self.render = render
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.retention = retention
+
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+        self.running = 0
+        self.completed = 0
+        self._wait_times = deque(maxlen=100)
+
+    def submit(self, yaml_content):
+        """Queue a render and return its job"""
+        self._ensure_workers()
+        with self._lock:
+            self._prune()
+            if self._queue.qsize() >= self.max_queue:
+                raise JobQueueFull(f"Render queue is full ({self.max_queue} jobs)")
+            job = RenderJob(yaml_content)
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """Block up to timeout seconds for job_id to finish (long-poll)"""
+        job = self.get(job_id)
+        if job is not None and timeout > 0:
+            job.done.wait(timeout)
+        return job
+
+    def stats(self):
+        with self._lock:
+            waits = list(self._wait_times)
+            return {
+                'workers': self.workers,
+                'queue_depth': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'running': self.running,
+                'completed': self.completed,
+                'tracked_jobs': len(self._jobs),
+                'wait_time_avg': sum(waits) / len(waits) if waits else 0.0,
+                'wait_time_max': max(waits) if waits else 0.0,
+            }
+
+    def _ensure_workers(self):
+        # Threads do not survive fork, so (re)start them in whichever process submits
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = [
+                threading.Thread(target=self._work, name=f"render-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                job.status = 'running'
+                job.started_at = time.time()
+                self._wait_times.append(job.started_at - job.submitted_at)
+                self.running += 1
+            try:
+                result = self.render(job.yaml_content)
+            except Exception as e:
+                result = {'success': False, 'output': None, 'error': str(e)}
+            with self._lock:
+                job.result = result
+                job.status = 'done'
+                job.finished_at = time.time()
+                # The input is no longer needed once rendered
+                job.yaml_content = None
+                self.running -= 1
+                self.completed += 1
+            job.done.set()
+
+    def _prune(self):
+        """Forget finished jobs older than the retention window (caller holds lock)"""
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Running kustomize builds in their own process group, under resource limits
+
+StreamingBuild reads a build's stdout incrementally for streamed responses;
+run_build() collects it for everything else.  Each build is the leader of a
+new process group, so a deadline, a cancel or a disconnected client kills
+helm and any other grandchildren along with kustomize.
+"""
+
+import codecs
+import os
+import select
+import signal
+import socket
+import subprocess
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+CHUNK_SIZE = 64 * 1024
+MAX_STDERR_BYTES = 1024 * 1024
+
+
+class BuildCancelled(Exception):
+    """Raised by run_build when should_abort() asked for the build to stop"""
+
+
+class ResourceLimits:
+    """Per-process limits applied to a build and inherited by its children
+
+    cpu_seconds and address_space_bytes become RLIMIT_CPU and RLIMIT_AS;
+    max_output_bytes caps how much stdout is read before the build is
+    stopped.  None (or 0) leaves a limit off.
+    """
+
+    def __init__(self, cpu_seconds=None, address_space_bytes=None, max_output_bytes=None):
+        self.cpu_seconds = cpu_seconds or None
+        self.address_space_bytes = address_space_bytes or None
+        self.max_output_bytes = max_output_bytes or None
+
+    def preexec(self):
+        """A preexec_fn setting the rlimits in the child, or None when there are none (or no resource module)
+
+        The limits are in place before kustomize execs, so nothing it forks (helm included) runs unlimited.
+        """
+        if resource is None:
+            return None
+        limits = [(limit, int(value)) for limit, value in ((resource.RLIMIT_CPU, self.cpu_seconds),
+                                                            (resource.RLIMIT_AS, self.address_space_bytes)) if value]
+        if not limits:
+            return None
+
+        def set_limits():
+            for limit, value in limits:
+                resource.setrlimit(limit, (value, value))
+        return set_limits
+
+
+class StreamingBuild:
+    """A running build whose stdout is consumed chunk by chunk
+
+    After iter_stdout() is exhausted, returncode, stderr, timed_out and
+    truncated describe how the process ended.  close() must always be
+    called; it kills the process group if it is still running and then runs
+    the on_close callbacks once.
+    """
+
+    def __init__(self, command, timeout, on_close=(), limits=None):
+        self.returncode = None
+        self.timed_out = False
+        self.cancelled = False
+        self.truncated = False
+        self.limits = limits or ResourceLimits()
+        self._on_close = list(on_close)
+        self._closed = False
+        self._stderr = bytearray()
+
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                        start_new_session=True, preexec_fn=self.limits.preexec())
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+        self._deadline = threading.Timer(timeout, self._expire)
+        self._deadline.daemon = True
+        self._deadline.start()
+
+    @property
+    def stderr(self):
+        if self.truncated:
+            return (f"Build output exceeded the {self.limits.max_output_bytes} byte limit "
+                    f"and was stopped; the manifest was truncated.")
+        return self._stderr.decode('utf-8', errors='replace')
+
+    def iter_stdout(self, chunk_size=CHUNK_SIZE):
+        """Yield decoded stdout text as soon as each chunk is available"""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        remaining = self.limits.max_output_bytes
+        while True:
+            chunk = self.process.stdout.read1(chunk_size)
+            if not chunk:
+                break
+            if remaining is not None:
+                if len(chunk) > remaining:
+                    # Runaway output: stop the build rather than buffer it
+                    chunk = chunk[:remaining]
+                    self.truncated = True
+                    self.kill()
+                remaining -= len(chunk)
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+            if self.truncated:
+                break
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+        self.returncode = self.process.wait()
+        self._deadline.cancel()
+        self._stderr_thread.join()
+
+    def kill(self):
+        """SIGKILL the whole process group, grandchildren included"""
+        if not hasattr(os, 'killpg'):
+            if self.process.poll() is None:
+                self.process.kill()
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def cancel(self):
+        """Kill the build from any thread; the reader sees end of output"""
+        self.cancelled = True
+        self.kill()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._deadline.cancel()
+        # Also reaps helpers that outlived kustomize itself
+        self.kill()
+        self.process.wait()
+        self.process.stdout.close()
+        self._stderr_thread.join(timeout=1)
+        for callback in self._on_close:
+            callback()
+
+    def _expire(self):
+        self.timed_out = True
+        self.kill()
+
+    def _drain_stderr(self):
+        # Keep reading so the child never blocks on a full pipe, but cap what is kept
+        for chunk in iter(lambda: self.process.stderr.read1(CHUNK_SIZE), b''):
+            if len(self._stderr) < MAX_STDERR_BYTES:
+                self._stderr.extend(chunk[:MAX_STDERR_BYTES - len(self._stderr)])
+        self.process.stderr.close()
+
+
+def run_build(command, timeout, limits=None, should_abort=None, poll_interval=0.25):
+    """Run a build to completion and return a subprocess.CompletedProcess (text mode)
+
+    Raises subprocess.TimeoutExpired after timeout seconds and BuildCancelled
+    when should_abort() turns true while the build runs; either way the whole
+    process group is killed.
+    """
+    build = StreamingBuild(command, timeout, limits=limits)
+    if should_abort is not None:
+        def watch():
+            while build.process.poll() is None:
+                if should_abort():
+                    build.cancel()
+                    return
+                time.sleep(poll_interval)
+        threading.Thread(target=watch, daemon=True).start()
+    try:
+        output = ''.join(build.iter_stdout())
+    finally:
+        build.close()
+    if build.timed_out:
+        raise subprocess.TimeoutExpired(command, timeout, output=output)
+    if build.cancelled:
+        raise BuildCancelled('Build cancelled')
+    return subprocess.CompletedProcess(command, build.returncode, output, build.stderr)
+
+
+def peer_closed(sock):
+    """True once the client at the other end of sock has hung up"""
+    if sock is None:
+        return False
+    try:
+        if hasattr(select, 'poll'):
+            poller = select.poll()
+            poller.register(sock, select.POLLIN)
+            readable = bool(poller.poll(0))
+        else:
+            readable = bool(select.select([sock], [], [], 0)[0])
+        if not readable:
+            return False
+        # Readable with nothing to read means EOF; pipelined request bytes are left in place
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (BlockingIOError, ValueError):
+        # ValueError: e.g. TLS sockets, which cannot peek; assume the client is still there
+        return False
+    except OSError:
+        return True
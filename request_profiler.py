@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Sampling cProfile of live requests, shared by every worker process
+
+A RequestProfiler keeps its state in a directory so that gunicorn workers
+agree on it: `control.json` holds the sample rate, `recent/` a ring of the
+last max_recent request profiles and `slowest/` the max_slowest slowest
+ones.  Each profile file is a marshalled (metadata, pstats dict) pair,
+written atomically.  aggregate() merges the ring into one pstats dict, which
+`python -m pstats` and snakeviz read once marshalled.
+
+With the rate at zero, sample() costs an attribute read and, once a second,
+a stat() of the control file.  cProfile profiles one thread; a process
+profiles one request at a time, and samples skipped because another is
+being profiled are counted.
+"""
+
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import re
+import stat
+import tempfile
+import threading
+import time
+
+PROFILE_NAME = re.compile(r'^[0-9a-z-]+\.prof$')
+
+
+class UnsafeProfileDir(Exception):
+    """Raised when the profile directory could hold files planted by another user"""
+
+
+class RequestProfiler:
+    """Samples requests into profiles under directory"""
+
+    def __init__(self, directory, max_recent=200, max_slowest=20, check_interval=1.0):
+        self.directory = directory
+        self.max_recent = max_recent
+        self.max_slowest = max_slowest
+        self.check_interval = check_interval
+        for name in ('recent', 'slowest'):
+            # Profiles are read back with marshal, so keep the directory private
+            os.makedirs(os.path.join(directory, name), mode=0o700, exist_ok=True)
+        # makedirs leaves an existing directory as it is, mode and owner included
+        for path in (directory, os.path.join(directory, 'recent'), os.path.join(directory, 'slowest')):
+            _check_private(path)
+
+        self.sample_rate = 0.0
+        self._control_mtime = None
+        self._next_check = 0.0
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self.profiled = 0
+        self.skipped = 0
+        self._refresh()
+
+    @property
+    def _control_path(self):
+        return os.path.join(self.directory, 'control.json')
+
+    def set_sample_rate(self, rate):
+        """Profile this fraction (0-1) of requests in every process sharing the directory"""
+        _write_atomic(self._control_path, json.dumps({'sample_rate': rate}).encode('utf-8'))
+        self._next_check = 0.0
+        self._refresh()
+
+    def sample(self):
+        """Start profiling the current request when it is drawn; returns the profile or None"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._refresh()
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return None
+        if not self._busy.acquire(blocking=False):
+            with self._lock:
+                self.skipped += 1
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (a debugger, or a profiler in another thread on 3.12+) is active
+            self._busy.release()
+            return None
+        return profile
+
+    def finish(self, profile, duration, **meta):
+        """Stop profile and store it with meta (route, status...) and its duration in seconds"""
+        try:
+            profile.disable()
+        finally:
+            self._busy.release()
+        profile.create_stats()
+        meta.update(duration=duration, finished_at=time.time(), pid=os.getpid())
+        data = marshal.dumps((meta, profile.stats))
+        stamp = f"{time.time_ns():020d}-{os.getpid()}"
+        _write_atomic(os.path.join(self.directory, 'recent', f"{stamp}.prof"), data)
+        _prune(os.path.join(self.directory, 'recent'), self.max_recent)
+        # Zero-padded microseconds first, so names sort by duration
+        _write_atomic(os.path.join(self.directory, 'slowest', f"{int(duration * 1e6):012d}-{stamp}.prof"), data)
+        _prune(os.path.join(self.directory, 'slowest'), self.max_slowest)
+        with self._lock:
+            self.profiled += 1
+
+    def slowest(self):
+        """Metadata of the slowest profiled requests, slowest first, with the name to fetch each by"""
+        traces = []
+        for name in sorted(_profiles(os.path.join(self.directory, 'slowest')), reverse=True):
+            loaded = self._read('slowest', name)
+            if loaded is not None:
+                traces.append(dict(loaded[0], name=name))
+        return traces
+
+    def trace(self, name):
+        """(metadata, pstats dict) of one of the slowest requests, or None"""
+        if not PROFILE_NAME.match(name):
+            return None
+        return self._read('slowest', name)
+
+    def aggregate(self):
+        """(number of requests, merged pstats dict) over the recent ring"""
+        merged = {}
+        count = 0
+        for name in _profiles(os.path.join(self.directory, 'recent')):
+            loaded = self._read('recent', name)
+            if loaded is None:
+                continue
+            count += 1
+            for func, source in loaded[1].items():
+                target = merged.get(func)
+                merged[func] = source if target is None else pstats.add_func_stats(target, source)
+        return count, merged
+
+    def clear(self):
+        for name in ('recent', 'slowest'):
+            _prune(os.path.join(self.directory, name), 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'recent': len(_profiles(os.path.join(self.directory, 'recent'))),
+                'profiled': self.profiled,
+                'skipped_busy': self.skipped,
+            }
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self._control_path).st_mtime_ns
+        except FileNotFoundError:
+            self.sample_rate = 0.0
+            self._control_mtime = None
+            return
+        if mtime == self._control_mtime:
+            return
+        try:
+            with open(self._control_path, encoding='utf-8') as f:
+                self.sample_rate = float(json.load(f).get('sample_rate') or 0.0)
+            self._control_mtime = mtime
+        except (OSError, ValueError, AttributeError):
+            self.sample_rate = 0.0
+
+    def _read(self, kind, name):
+        try:
+            with open(os.path.join(self.directory, kind, name), 'rb') as f:
+                return marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            # Pruned by another worker since it was listed
+            return None
+
+
+def render_text(stats, sort='cumulative', limit=50):
+    """pstats' printed report for a pstats dict"""
+    stream = io.StringIO()
+    report = pstats.Stats(_Loaded(stats), stream=stream)
+    report.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+class _Loaded:
+    """What pstats.Stats accepts in place of a Profile: something with create_stats() and stats"""
+
+    def __init__(self, stats):
+        self.stats = dict(stats)
+
+    def create_stats(self):
+        pass
+
+
+def _profiles(directory):
+    try:
+        return [name for name in os.listdir(directory) if PROFILE_NAME.match(name)]
+    except FileNotFoundError:
+        return []
+
+
+def _prune(directory, keep):
+    # Names sort oldest (or fastest) first
+    names = sorted(_profiles(directory))
+    for name in names[:max(0, len(names) - keep)]:
+        try:
+            os.unlink(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def _check_private(path):
+    status = os.lstat(path)
+    if not stat.S_ISDIR(status.st_mode):
+        raise UnsafeProfileDir(f"{path} is not a directory")
+    if hasattr(os, 'geteuid') and status.st_uid != os.geteuid():
+        raise UnsafeProfileDir(f"{path} is owned by another user")
+    if status.st_mode & 0o022:
+        raise UnsafeProfileDir(f"{path} is writable by other users")
+
+
+def _write_atomic(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
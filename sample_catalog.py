@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+In-memory index of the samples/ directory with mtime-based change detection
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+SAMPLE_EXTENSIONS = ('.yaml', '.yml')
+
+logger = logging.getLogger(__name__)
+
+
+def display_name(filename):
+    """qoin-helm.yaml -> Qoin Helm"""
+    name = filename.replace('.yaml', '').replace('.yml', '')
+    return name.replace('-', ' ').replace('_', ' ').title()
+
+
+class Sample:
+    """One sample file as loaded into the catalog"""
+
+    def __init__(self, filename, content, mtime):
+        self.filename = filename
+        self.display_name = display_name(filename)
+        self.content = content
+        self.size = len(content.encode('utf-8'))
+        self.mtime = mtime
+        self.etag = hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+
+
+class SampleCatalog:
+    """Loads a samples directory once and re-reads only files whose mtime changed
+
+    The directory is re-checked at most every poll_interval seconds, on access.
+    """
+
+    def __init__(self, directory, poll_interval=2.0):
+        self.directory = directory
+        self.poll_interval = poll_interval
+
+        self._samples = {}
+        # Unreadable files by mtime, so each version is reported once rather than on every scan
+        self._skipped = {}
+        self._etag = None
+        self._last_modified = 0.0
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+        self.reloads = 0
+
+    def list(self):
+        """All samples, sorted by filename"""
+        self._refresh()
+        return [self._samples[name] for name in sorted(self._samples)]
+
+    def get(self, filename):
+        self._refresh()
+        return self._samples.get(filename)
+
+    @property
+    def etag(self):
+        """Validator covering every sample in the catalog"""
+        self._refresh()
+        return self._etag
+
+    @property
+    def last_modified(self):
+        self._refresh()
+        return self._last_modified
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.poll_interval:
+            return
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.poll_interval:
+                return
+            self._scan()
+            self._checked_at = now
+
+    def _scan(self):
+        """Reconcile the index with the directory (caller holds the lock)"""
+        current = {}
+        try:
+            # Adding or removing a file bumps the directory's own mtime
+            directory_mtime = os.stat(self.directory).st_mtime
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(SAMPLE_EXTENSIONS) and entry.is_file():
+                        current[entry.name] = entry.stat().st_mtime
+        except FileNotFoundError:
+            directory_mtime = 0.0
+
+        changed = False
+        for filename in list(self._samples):
+            if filename not in current:
+                del self._samples[filename]
+                changed = True
+        for filename, mtime in current.items():
+            known = self._samples.get(filename)
+            if known is not None and known.mtime == mtime or self._skipped.get(filename) == mtime:
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
+                    self._samples[filename] = Sample(filename, f.read(), mtime)
+                self._skipped.pop(filename, None)
+            except OSError:
+                self._samples.pop(filename, None)
+            except UnicodeDecodeError as e:
+                # One bad file must not take the whole catalog down
+                logger.warning("Skipping sample %s, it is not UTF-8: %s", filename, e)
+                self._samples.pop(filename, None)
+                self._skipped[filename] = mtime
+            changed = True
+        for filename in list(self._skipped):
+            if filename not in current:
+                del self._skipped[filename]
+
+        if changed or self._etag is None:
+            self.reloads += 1
+            digest = hashlib.sha256()
+            for filename in sorted(self._samples):
+                digest.update(f"{filename}\0{self._samples[filename].etag}\0".encode('utf-8'))
+            self._etag = digest.hexdigest()[:32]
+            self._last_modified = max([directory_mtime] + [sample.mtime for sample in self._samples.values()])
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Per-request stage timings, reported in the Server-Timing response header
+
+start() opens a timing record for the request handled by the current
+thread; record() adds a stage to it (stages observed more than once are
+summed), and header() formats what was recorded.  record() on a thread with
+no open record does nothing, so code shared with background work can report
+stages unconditionally.
+"""
+
+import re
+import threading
+
+_local = threading.local()
+_TOKEN = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+class Timings:
+    """Stage durations (seconds) of one request, in the order stages first ran"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+def start():
+    """Open a timing record for the current thread and return it"""
+    timings = _local.timings = Timings()
+    return timings
+
+
+def finish():
+    """Close the current thread's record and return it (None if none was open)"""
+    timings = getattr(_local, 'timings', None)
+    _local.timings = None
+    return timings
+
+
+def record(stage, seconds):
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def header(timings, total=None):
+    """Server-Timing value: `stage;dur=ms` per stage, then `total` when given"""
+    entries = [f"{_TOKEN.sub('_', stage)};dur={seconds * 1000:.2f}" for stage, seconds in timings.stages.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
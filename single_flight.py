@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Coalesce identical concurrent calls so only one of them does the work
+"""
+
+import threading
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error', 'waiters')
+
+    def __init__(self):
+        self.waiters = 0
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run fn once per key among callers that overlap in time
+
+    The first caller for a key (the leader) runs fn; callers arriving while it
+    runs wait and receive the same return value, or the same exception.  Once
+    the leader finishes the key is forgotten, so later calls run fn again.
+    Exceptions listed in `private` concern the leader alone (its client went
+    away, say): waiters never see them and make the call again instead.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, private=()):
+        """Return (fn's result, True if this caller ran fn)"""
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                    self.leaders += 1
+                else:
+                    flight.waiters += 1
+                    self.coalesced += 1
+            if leader:
+                break
+            flight.done.wait()
+            if isinstance(flight.error, private):
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, False
+
+        try:
+            flight.value = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value, True
+
+    def has_waiters(self, key):
+        """True if callers other than the leader are waiting on key"""
+        with self._lock:
+            flight = self._flights.get(key)
+            return flight is not None and flight.waiters > 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+            }
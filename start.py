@@ -4,7 +4,7 @@ Kustomize Builder Web App Launcher
 """
 
 import sys
-import subprocess
+import shutil
 import os
 
 def check_dependencies():
@@ -26,16 +26,11 @@ def check_dependencies():
         print("Run: pip install -r requirements.txt")
         return False
     
-    # Check if kustomize is installed
-    try:
-        result = subprocess.run(['kustomize', 'version'], 
-                              capture_output=True, text=True, timeout=5)
-        if result.returncode == 0:
-            print(f"✅ Kustomize found: {result.stdout.strip()}")
-        else:
-            print("❌ Kustomize is not working properly")
-            return False
-    except (subprocess.TimeoutExpired, FileNotFoundError):
+    # Check if kustomize is installed (PATH lookup only; the version is probed once by the app)
+    kustomize = shutil.which('kustomize')
+    if kustomize:
+        print(f"✅ Kustomize found: {kustomize}")
+    else:
         print("❌ Kustomize not found! Please install it:")
         print("   Windows: choco install kustomize")
         print("   macOS: brew install kustomize")
@@ -44,16 +39,14 @@ def check_dependencies():
     
     return True
 
-def install_dependencies():
-    """Install Python dependencies"""
-    print("📦 Installing Python dependencies...")
+def use_gunicorn():
+    """gunicorn serves production traffic; it does not run on Windows"""
+    if os.name == 'nt' or '--dev' in sys.argv[1:]:
+        return False
     try:
-        subprocess.run([sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt'], 
-                      check=True)
-        print("✅ Dependencies installed successfully!")
+        import gunicorn  # noqa: F401
         return True
-    except subprocess.CalledProcessError:
-        print("❌ Failed to install dependencies!")
+    except ImportError:
         return False
 
 def main():
@@ -61,27 +54,32 @@ def main():
     print("🚀 Kustomize Builder Web App Launcher")
     print("=" * 50)
     
-    # Check if dependencies are installed
+    # Never install packages at startup; that reaches the network and slows every launch
     if not check_dependencies():
-        print("\n📦 Installing missing dependencies...")
-        if not install_dependencies():
-            print("❌ Failed to install dependencies. Please install manually:")
-            print("   pip install -r requirements.txt")
-            return
+        print("\n📦 Install the missing dependencies and try again:")
+        print("   pip install -r requirements.txt")
+        sys.exit(1)
     
     print("\n🌐 Starting the web application...")
     print("📱 Open your browser and go to: http://localhost:5000")
     print("⏹️  Press Ctrl+C to stop the application")
     print("=" * 50)
     
-    # Start the Flask application
+    root = os.path.dirname(os.path.abspath(__file__))
+    if use_gunicorn():
+        # Replace this process so signals reach gunicorn's master directly
+        os.chdir(root)
+        os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn',
+                                   '--config', os.path.join(root, 'gunicorn.conf.py'), 'app:app'])
+    
+    # Development server (start.py --dev, or Windows)
     try:
         from app import app
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000, threaded=True)
     except KeyboardInterrupt:
         print("\n👋 Application stopped by user")
     except Exception as e:
         print(f"❌ Error starting application: {e}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for kustomize build admission control
+"""
+
+import threading
+
+import pytest
+
+import app as app_module
+from admission import AdmissionController, AdmissionRejected
+
+
+def test_limit_queue_and_rejection():
+    controller = AdmissionController(limit=1, max_queue=1, wait_timeout=5)
+    controller.acquire()
+
+    admitted = threading.Event()
+
+    def waiter():
+        with controller.slot():
+            admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while controller.stats()['queued'] == 0:
+        pass
+
+    # Queue is full: the next caller fails fast instead of piling up
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire()
+    assert excinfo.value.retry_after >= 1
+
+    controller.release()
+    thread.join(timeout=5)
+    assert admitted.is_set()
+    stats = controller.stats()
+    assert stats['in_flight'] == 0
+    assert stats['admitted'] == 2 and stats['rejected'] == 1
+
+
+def test_wait_timeout():
+    controller = AdmissionController(limit=1, max_queue=4, wait_timeout=0.05)
+    controller.acquire()
+    with pytest.raises(AdmissionRejected):
+        controller.acquire()
+    assert controller.stats()['timed_out'] == 1
+    assert controller.stats()['queued'] == 0
+
+
+def test_generate_returns_429_with_retry_after(client, monkeypatch):
+    controller = AdmissionController(limit=1, max_queue=0, wait_timeout=0)
+    monkeypatch.setattr(app_module, 'build_admission', controller)
+    controller.acquire()
+
+    response = client.post('/generate', json={'yaml_content': 'kind: Kustomization\n'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.json['success'] is False
+
+    stats = client.get('/admission/stats').json
+    assert stats['in_flight'] == 1 and stats['rejected'] == 1
+
+    controller.release()
+    assert client.post('/generate', json={'yaml_content': 'kind: Kustomization\n'}).status_code == 200
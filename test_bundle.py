@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for tar/zip bundle uploads to /generate/bundle
+"""
+
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+import app as app_module
+from bundle import BundleError, BundleLimits, BundleTooLarge, extract, safe_path
+
+TREE = {
+    'base/kustomization.yaml': 'resources:\n- deployment.yaml\n',
+    'base/deployment.yaml': 'kind: Deployment\n',
+    'overlays/prod/kustomization.yaml': 'resources:\n- ../../base\nnamePrefix: prod-\n',
+    'overlays/prod/replicas.yaml': 'kind: Patch\n',
+}
+
+
+def _tar(files, mode='w:gz', order=None):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name in order or files:
+            data = files[name].encode('utf-8')
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = len(name)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def _zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+class _Unseekable:
+    """Request-body stand-in that can only be read forward"""
+
+    def __init__(self, data):
+        self._buffer = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._buffer.read(size)
+
+
+def test_overlay_is_built_and_unchanged_reupload_hits_cache(client, stub_kustomize):
+    response = client.post('/generate/bundle?path=overlays/prod', data=_tar(TREE))
+    payload = response.get_json()
+    assert payload['success'] is True, payload
+    assert payload['output'].startswith('---\n' + TREE['overlays/prod/kustomization.yaml'])
+    assert '# replicas.yaml\nkind: Patch\n' in payload['output']
+    assert payload['files'] == 4
+    assert response.headers['X-Render-Cache'] == 'MISS'
+    assert response.headers['X-Bundle-Digest'] == payload['bundle_digest']
+
+    # Same tree, different format and member order: same digest, no second build
+    again = client.post('/generate/bundle?path=overlays/prod/', data=_zip(dict(reversed(list(TREE.items())))))
+    assert again.headers['X-Render-Cache'] == 'HIT'
+    assert again.get_json()['bundle_digest'] == payload['bundle_digest']
+    assert stub_kustomize() == 1
+
+    # Another overlay of the same bundle is a different render
+    base = client.post('/generate/bundle?path=base', data=_tar(TREE, mode='w'))
+    assert base.get_json()['output'].startswith('---\n' + TREE['base/kustomization.yaml'])
+    assert stub_kustomize() == 2
+
+
+def test_digest_ignores_archive_details_but_not_content(tmp_path):
+    digests = set()
+    for index, data in enumerate([_tar(TREE), _tar(TREE, mode='w:bz2', order=sorted(TREE, reverse=True)), _zip(TREE)]):
+        dest = tmp_path / str(index)
+        dest.mkdir()
+        digest, count = extract(_Unseekable(data), str(dest))
+        digests.add(digest)
+        assert count == 4
+        assert (dest / 'overlays' / 'prod' / 'replicas.yaml').read_text() == 'kind: Patch\n'
+    assert len(digests) == 1
+
+    changed = dict(TREE, **{'base/deployment.yaml': 'kind: StatefulSet\n'})
+    (tmp_path / 'changed').mkdir()
+    assert extract(io.BytesIO(_tar(changed)), str(tmp_path / 'changed'))[0] not in digests
+
+
+@pytest.mark.parametrize('name', ['../escape.yaml', 'base/../../escape.yaml', '/etc/escape.yaml', 'C:/escape.yaml'])
+def test_paths_outside_the_bundle_are_rejected(client, stub_kustomize, tmp_path, name):
+    files = dict(TREE, **{name: 'owned\n'})
+    for data in (_tar(files), _zip(files)):
+        response = client.post('/generate/bundle?path=overlays/prod', data=data)
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
+    assert not (tmp_path / 'escape.yaml').exists()
+    assert stub_kustomize() == 0
+
+
+def test_links_are_rejected(client, stub_kustomize):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as archive:
+        link = tarfile.TarInfo('base/kustomization.yaml')
+        link.type = tarfile.SYMTYPE
+        link.linkname = '/etc/passwd'
+        archive.addfile(link)
+    response = client.post('/generate/bundle?path=base', data=buffer.getvalue())
+    assert response.status_code == 400
+    assert 'Links' in response.get_json()['error']
+    assert stub_kustomize() == 0
+
+
+def test_limits_reject_large_bundles(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, 'BUNDLE_LIMITS', BundleLimits(max_bytes=4096, max_files=3))
+    too_many = client.post('/generate/bundle?path=base', data=_tar(TREE))
+    assert too_many.status_code == 413
+    assert 'more than 3 files' in too_many.get_json()['error']
+
+    too_big = client.post('/generate/bundle?path=base', data=_tar({'base/kustomization.yaml': 'x' * 100000}, mode='w'))
+    assert too_big.status_code == 413
+
+    with pytest.raises(BundleTooLarge):
+        # A small archive that expands far beyond max_extracted_bytes (zip bomb)
+        extract(io.BytesIO(_zip({'bomb.yaml': '0' * 1000000})), str(tmp_path),
+                BundleLimits(max_extracted_bytes=100000))
+
+
+def test_missing_overlay_and_garbage_are_client_errors(client, stub_kustomize):
+    missing = client.post('/generate/bundle?path=overlays/dev', data=_tar(TREE))
+    assert missing.status_code == 400
+    assert 'No kustomization file in overlays/dev' in missing.get_json()['error']
+
+    assert client.post('/generate/bundle', data=b'not an archive at all').status_code == 400
+    assert client.post('/generate/bundle?path=../x', data=_tar(TREE)).status_code == 400
+    assert stub_kustomize() == 0
+    assert app_module.workspace_pool.stats()['free'] == 2
+
+
+def test_safe_path_normalizes():
+    assert safe_path('overlays//prod/') == 'overlays/prod'
+    assert safe_path('./') == ''
+    with pytest.raises(BundleError):
+        safe_path('a\\..\\b')
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared cache backends, run against a shared directory and a
+local stand-in key-value server, and for replicas sharing renders and charts
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import cache_backends
+from cache_backends import FilesystemBackend, HttpBackend, from_url, make_server
+from chart_cache import ChartCache, archive_key
+from render_cache import RenderCache, make_key
+from test_chart_cache import chart_repo  # noqa: F401 (fixture)
+
+KEY = 'ab' * 32
+OTHER_KEY = 'cd' * 32
+
+
+@pytest.fixture
+def kv_server(tmp_path):
+    server = make_server(FilesystemBackend(str(tmp_path / 'kv')), ('127.0.0.1', 0), token='secret')
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['filesystem', 'http'])
+def backend_factory(request, tmp_path):
+    """Creates backends as separate replicas would, all sharing one store"""
+    if request.param == 'filesystem':
+        return lambda: FilesystemBackend(str(tmp_path / 'shared'))
+    url = request.getfixturevalue('kv_server')
+    return lambda: HttpBackend(url, token='secret')
+
+
+def test_put_then_get_from_another_instance(backend_factory):
+    writer, reader = backend_factory(), backend_factory()
+    assert reader.get('renders', KEY) is None
+    assert writer.put('renders', KEY, b'kind: ConfigMap\n')
+    assert reader.get('renders', KEY) == b'kind: ConfigMap\n'
+    assert reader.get('charts', KEY) is None
+    assert reader.stats()['hits'] == 1
+    assert reader.stats()['misses'] == 2
+    assert writer.stats()['stores'] == 1
+
+
+def test_invalid_keys_are_rejected(backend_factory):
+    backend = backend_factory()
+    for namespace, key in (('renders', '../etc/passwd'), ('renders', 'ABC' * 10), ('../x', KEY)):
+        with pytest.raises(ValueError):
+            backend.get(namespace, key)
+
+
+def test_filesystem_writes_are_atomic_and_leave_no_temp_files(tmp_path):
+    backend = FilesystemBackend(str(tmp_path))
+    backend.put('renders', KEY, b'first')
+    backend.put('renders', KEY, b'second')
+    assert backend.get('renders', KEY) == b'second'
+    assert os.listdir(os.path.dirname(backend.path('renders', KEY))) == [KEY]
+
+
+def test_filesystem_ttl_and_prune(tmp_path):
+    backend = FilesystemBackend(str(tmp_path), ttl=60, max_bytes=10)
+    backend.put('renders', KEY, b'x' * 8)
+    backend.put('renders', OTHER_KEY, b'y' * 8)
+    os.utime(backend.path('renders', KEY), (1, 1))
+    assert backend.get('renders', KEY) is None
+    assert backend.prune() == 1
+    assert backend.get('renders', OTHER_KEY) == b'y' * 8
+
+    os.utime(backend.path('renders', OTHER_KEY), None)
+    backend.ttl = None
+    backend.put('charts', KEY, b'z' * 8)
+    os.utime(backend.path('renders', OTHER_KEY), (os.path.getmtime(backend.path('charts', KEY)) - 10,) * 2)
+    # 16 bytes against a budget of 10: the older entry goes
+    assert backend.prune() == 1
+    assert backend.get('renders', OTHER_KEY) is None
+    assert backend.get('charts', KEY) == b'z' * 8
+
+
+def test_http_errors_are_misses_and_back_off(kv_server):
+    unauthorized = HttpBackend(kv_server, token='wrong')
+    assert not unauthorized.put('renders', KEY, b'data')
+    assert unauthorized.get('renders', KEY) is None
+    assert unauthorized.stats()['errors'] == 2
+
+    # Nothing listens on the discard port; one failed attempt, then the backend stops trying
+    down = HttpBackend('http://127.0.0.1:9', timeout=0.5, retry_after=60)
+    assert down.get('renders', KEY) is None
+    assert down.get('renders', KEY) is None
+    assert down.stats()['errors'] == 1
+
+
+def test_from_url(tmp_path):
+    assert from_url('') is None
+    assert isinstance(from_url(str(tmp_path)), FilesystemBackend)
+    assert from_url((tmp_path / 'x').as_uri()).root == str(tmp_path / 'x')
+    http = from_url('http://user:pw@cache:8750/kb', token='t')
+    assert isinstance(http, HttpBackend)
+    assert http.describe() == 'http://cache:8750/kb'
+    with pytest.raises(ValueError):
+        from_url('redis://cache:6379')
+
+
+def test_render_on_one_replica_is_a_hit_on_another(backend_factory):
+    first, second = RenderCache(shared=backend_factory()), RenderCache(shared=backend_factory())
+    key = make_key('resources:\n- a.yaml\n', 'kustomize v5')
+    assert second.get(key) is None
+    first.put(key, 'rendered ✓\n')
+
+    assert second.get(key) == 'rendered ✓\n'
+    assert second.get(key) == 'rendered ✓\n'
+    stats = second.stats()
+    assert (stats['hits'], stats['shared_hits'], stats['misses']) == (1, 1, 1)
+    assert stats['shared']['hits'] == 1
+
+
+def test_render_keys_agree_across_processes():
+    """Replicas are separate interpreters (with their own hash seeds) and must compute the same key"""
+    source = 'kind: Kustomization\nnamespace: web\nresources: [a.yaml, b.yaml]\ncommonLabels: {b: "2", a: "1"}\n'
+    script = f"from render_cache import make_key; print(make_key({source!r}, 'kustomize v5'))"
+    keys = {
+        subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                       cwd=os.path.dirname(os.path.abspath(cache_backends.__file__)),
+                       env=dict(os.environ, PYTHONHASHSEED=seed)).stdout.strip()
+        for seed in ('1', '2')
+    }
+    assert keys == {make_key(source, 'kustomize v5')}
+
+
+def test_chart_fetched_by_one_replica_is_installed_from_shared_by_another(tmp_path, chart_repo):  # noqa: F811
+    shared = FilesystemBackend(str(tmp_path / 'shared'))
+    repo = chart_repo.as_uri()
+    first = ChartCache(str(tmp_path / 'first'), shared=shared, repo_schemes=('file',))
+    first.ensure(repo, 'qoin', '0.11.0')
+    assert first.stats()['fetches'] == 1
+
+    # The repo is gone: the second replica can only get the chart from the shared store
+    shutil.rmtree(chart_repo)
+    second = ChartCache(str(tmp_path / 'second'), shared=shared, repo_schemes=('file',))
+    path = second.ensure(repo, 'qoin', '0.11.0')
+    assert os.path.isfile(os.path.join(path, 'Chart.yaml'))
+    assert (second.stats()['shared_hits'], second.stats()['fetches']) == (1, 0)
+
+
+def test_damaged_shared_chart_falls_back_to_the_repo(tmp_path, chart_repo):  # noqa: F811
+    shared = FilesystemBackend(str(tmp_path / 'shared'))
+    repo = chart_repo.as_uri()
+    key = archive_key(repo, 'qoin', '0.11.0')
+    shared.put('charts', key, b'not a tarball')
+    cache = ChartCache(str(tmp_path / 'store'), shared=shared, repo_schemes=('file',))
+    cache.ensure(repo, 'qoin', '0.11.0')
+    assert (cache.stats()['shared_hits'], cache.stats()['fetches']) == (0, 1)
+    # The good archive replaced the damaged one
+    assert shared.get('charts', key).startswith(b'\x1f\x8b')
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared helm chart store, using a local file:// chart repo
+"""
+
+import io
+import os
+import shutil
+import tarfile
+
+import pytest
+import yaml
+
+from chart_cache import ChartCache, ChartCacheError
+
+
+def _chart_tgz(path, name, version):
+    with tarfile.open(path, 'w:gz') as archive:
+        for member, content in ((f"{name}/Chart.yaml", f"apiVersion: v2\nname: {name}\nversion: {version}\n"),
+                                (f"{name}/templates/cm.yaml", "kind: ConfigMap\n")):
+            data = content.encode('utf-8')
+            info = tarfile.TarInfo(member)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture
+def chart_repo(tmp_path):
+    repo_dir = tmp_path / 'repo'
+    repo_dir.mkdir()
+    _chart_tgz(repo_dir / 'qoin-0.11.0.tgz', 'qoin', '0.11.0')
+    index = {'apiVersion': 'v1', 'entries': {'qoin': [{'version': '0.11.0', 'urls': ['qoin-0.11.0.tgz']}]}}
+    (repo_dir / 'index.yaml').write_text(yaml.safe_dump(index))
+    return repo_dir
+
+
+def test_ensure_fetches_once_then_serves_from_store(tmp_path, chart_repo):
+    cache = ChartCache(str(tmp_path / 'store'), repo_schemes=('file',))
+    repo = chart_repo.as_uri()
+
+    path = cache.ensure(repo, 'qoin', '0.11.0')
+    assert os.path.isfile(os.path.join(path, 'Chart.yaml'))
+
+    # The repo going away must not matter once the chart is stored
+    shutil.rmtree(chart_repo)
+    assert cache.ensure(repo, 'qoin', '0.11.0') == path
+    assert cache.stats()['fetches'] == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_missing_version_raises(tmp_path, chart_repo):
+    cache = ChartCache(str(tmp_path / 'store'), repo_schemes=('file',))
+    with pytest.raises(ChartCacheError):
+        cache.ensure(chart_repo.as_uri(), 'qoin', '9.9.9')
+
+
+def test_seed_from_tgz_for_air_gapped_use(tmp_path):
+    tgz = tmp_path / 'offline.tgz'
+    _chart_tgz(tgz, 'offline', '1.2.3')
+    cache = ChartCache(str(tmp_path / 'store'))
+
+    cache.seed_from_tgz(str(tgz), 'https://charts.example.invalid')
+    assert cache.has('https://charts.example.invalid', 'offline', '1.2.3')
+    cache.ensure('https://charts.example.invalid', 'offline', '1.2.3')
+    assert cache.stats()['fetches'] == 0
+
+
+def test_rejects_path_traversal(tmp_path):
+    tgz = tmp_path / 'evil.tgz'
+    with tarfile.open(tgz, 'w:gz') as archive:
+        info = tarfile.TarInfo('../evil/Chart.yaml')
+        archive.addfile(info, io.BytesIO(b''))
+    cache = ChartCache(str(tmp_path / 'store'))
+    with open(tgz, 'rb') as f, pytest.raises(ChartCacheError):
+        cache._install(f, 'https://x', 'evil', '1.0.0')
+
+
+def test_prepare_workspace_links_chart_home(tmp_path, chart_repo):
+    cache = ChartCache(str(tmp_path / 'store'), repo_schemes=('file',))
+    workspace = tmp_path / 'ws'
+    workspace.mkdir()
+    kustomization = {'helmCharts': [
+        {'name': 'qoin', 'repo': chart_repo.as_uri(), 'version': '0.11.0'},
+        {'name': 'unpinned', 'repo': chart_repo.as_uri()},
+    ]}
+
+    assert cache.prepare_workspace(kustomization, str(workspace)) == 1
+    assert (workspace / 'charts' / 'qoin-0.11.0' / 'qoin' / 'Chart.yaml').is_file()
+    assert (workspace / 'charts' / 'qoin' / 'Chart.yaml').is_file()
+
+
+def test_file_repos_are_refused_by_default(tmp_path, chart_repo):
+    cache = ChartCache(str(tmp_path / 'store'))
+    with pytest.raises(ChartCacheError, match='Unsupported chart repo URL'):
+        cache.ensure(chart_repo.as_uri(), 'qoin', '0.11.0')
+    assert cache.stats()['fetches'] == 0
+
+
+@pytest.mark.parametrize('name, version', [('../../outside', '1.0.0'), ('qoin', '../../..'),
+                                           ('qo\0in', '1.0.0'), ('qoin', 'a/b')])
+def test_rejects_names_and_versions_that_leave_the_store(tmp_path, name, version):
+    cache = ChartCache(str(tmp_path / 'store'))
+    with pytest.raises(ChartCacheError, match='Invalid chart'):
+        cache.ensure('https://charts.example.invalid', name, version)
+
+
+@pytest.mark.parametrize('chart_home', ['/tmp/outside', '../outside', 'charts/../../outside'])
+def test_prepare_workspace_keeps_chart_home_inside(tmp_path, chart_home):
+    workspace = tmp_path / 'ws'
+    workspace.mkdir()
+    kustomization = {'helmGlobals': {'chartHome': chart_home},
+                     'helmCharts': [{'name': 'qoin', 'repo': 'https://x.invalid', 'version': '0.11.0'}]}
+    with pytest.raises(ChartCacheError, match='chartHome'):
+        ChartCache(str(tmp_path / 'store')).prepare_workspace(kustomization, str(workspace))
+    assert not (tmp_path / 'outside').exists()
+
+
+def test_archive_and_unpacked_sizes_are_capped(tmp_path, chart_repo):
+    repo = chart_repo.as_uri()
+    small_download = ChartCache(str(tmp_path / 'a'), repo_schemes=('file',), max_archive_bytes=64)
+    with pytest.raises(ChartCacheError, match='larger than 64 bytes'):
+        small_download.ensure(repo, 'qoin', '0.11.0')
+
+    # Compresses to almost nothing, unpacks to far more than allowed
+    bomb = tmp_path / 'bomb.tgz'
+    with tarfile.open(bomb, 'w:gz') as archive:
+        for member, data in (('bomb/Chart.yaml', b'name: bomb\n'), ('bomb/padding', b'\0' * 1024 * 1024)):
+            info = tarfile.TarInfo(member)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    small_unpack = ChartCache(str(tmp_path / 'b'), max_extracted_bytes=1024)
+    with open(bomb, 'rb') as f, pytest.raises(ChartCacheError, match='more than 1024 bytes'):
+        small_unpack._install(f, 'https://x', 'bomb', '1.0.0')
+    assert small_download.stats()['errors'] == 1
+
+
+def test_chart_locks_are_dropped_after_install(tmp_path, chart_repo):
+    cache = ChartCache(str(tmp_path / 'store'), repo_schemes=('file',))
+    cache.ensure(chart_repo.as_uri(), 'qoin', '0.11.0')
+    with pytest.raises(ChartCacheError):
+        cache.ensure(chart_repo.as_uri(), 'qoin', '9.9.9')
+    assert cache._locks == {}
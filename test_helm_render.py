@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Tests for the direct `helm template` path for pure-helm kustomizations
+"""
+
+import stat
+import sys
+
+import pytest
+import yaml
+
+import app as app_module
+import helm_render
+
+PURE_HELM = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+helmCharts:
+- name: web
+  repo: https://charts.example.com
+  version: 1.2.3
+  releaseName: web
+  namespace: prod
+  includeCRDs: true
+  valuesInline:
+    replicas: 2
+"""
+
+# Unsorted, commented helm output with a List, a hook and strings that need quoting
+HELM_OUTPUT = """---
+# Source: web/templates/deployment.yaml
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: web
+  labels:
+    app: web
+spec:
+  replicas: 2
+  template:
+    spec:
+      containers:
+      - name: web
+        image: "nginx:1.25"
+        args: ["--port", "8080", "yes", ""]
+        env:
+        - name: SCRIPT
+          value: |
+            echo one
+            echo two
+---
+# Source: web/templates/service.yaml
+apiVersion: v1
+kind: Service
+metadata:
+  name: web
+spec:
+  ports:
+  - port: 80
+    targetPort: "80"
+---
+apiVersion: v1
+kind: List
+items:
+- apiVersion: networking.k8s.io/v1
+  kind: Ingress
+  metadata:
+    name: web
+- apiVersion: v1
+  kind: ConfigMap
+  metadata:
+    name: web-config
+  data:
+    key10: b
+    key2: a
+    Key_upper: c
+---
+"""
+
+EXPECTED = """apiVersion: v1
+data:
+  Key_upper: c
+  key2: a
+  key10: b
+kind: ConfigMap
+metadata:
+  name: web-config
+---
+apiVersion: v1
+kind: Service
+metadata:
+  name: web
+spec:
+  ports:
+  - port: 80
+    targetPort: "80"
+---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  labels:
+    app: web
+  name: web
+spec:
+  replicas: 2
+  template:
+    spec:
+      containers:
+      - args:
+        - --port
+        - "8080"
+        - "yes"
+        - ""
+        env:
+        - name: SCRIPT
+          value: |
+            echo one
+            echo two
+        image: nginx:1.25
+        name: web
+---
+apiVersion: networking.k8s.io/v1
+kind: Ingress
+metadata:
+  name: web
+"""
+
+
+@pytest.fixture
+def stub_helm(tmp_path, monkeypatch, stub_kustomize):
+    """A fake helm that prints HELM_OUTPUT; returns the recorded `helm template` argv lines"""
+    output_file = tmp_path / 'helm-output.yaml'
+    output_file.write_text(HELM_OUTPUT)
+    calls_file = tmp_path / 'helm-calls.log'
+    script = tmp_path / 'bin' / 'helm'
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import os, sys\n"
+        f"open({str(calls_file)!r}, 'a').write(' '.join(sys.argv[1:]) + '\\n')\n"
+        "if os.environ.get('STUB_HELM_FAIL'):\n"
+        "    sys.stderr.write('Error: chart broken\\n'); sys.exit(1)\n"
+        f"sys.stdout.write(open({str(output_file)!r}).read())\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    chart_dir = tmp_path / 'charts' / 'web'
+    chart_dir.mkdir(parents=True)
+    monkeypatch.setattr(app_module.chart_cache, 'ensure', lambda repo, name, version: str(chart_dir))
+    monkeypatch.setattr(app_module, 'HELM_FAST_PATH', 'on')
+    return lambda: [line for line in (calls_file.read_text().splitlines() if calls_file.exists() else [])
+                    if line.startswith('template ')]
+
+
+def test_output_matches_kustomize_ordering_and_formatting():
+    assert helm_render.kustomize_output([HELM_OUTPUT]) == EXPECTED
+
+
+def test_long_scalars_stay_on_one_line():
+    description = 'a long annotation ' * 10
+    helm_output = ('apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: long\n  annotations:\n'
+                   f'    description: {description.strip()}\n')
+    assert f"    description: {description.strip()}\n" in helm_render.kustomize_output([helm_output])
+
+
+def test_plan_only_accepts_pure_helm_documents():
+    document = yaml.safe_load(PURE_HELM)
+    assert helm_render.plan(document) == document['helmCharts']
+    for change in ({'namespace': 'other'}, {'resources': ['extra.yaml']}, {'patches': []}):
+        assert helm_render.plan(dict(document, **change)) is None
+    chart = document['helmCharts'][0]
+    for field, value in (('valuesFile', 'values.yaml'), ('valuesMerge', 'replace'), ('releaseName', None),
+                         ('repo', 'oci://registry/charts')):
+        assert helm_render.plan(dict(document, helmCharts=[dict(chart, **{field: value})])) is None
+
+
+def test_template_command_mirrors_kustomize():
+    chart = dict(yaml.safe_load(PURE_HELM)['helmCharts'][0], apiVersions=['v1'], skipTests=True)
+    assert helm_render.template_command(chart, '/charts/web', '/ws/values-0.yaml') == [
+        'helm', 'template', 'web', '/charts/web', '--namespace', 'prod', '--values', '/ws/values-0.yaml',
+        '--api-versions', 'v1', '--include-crds', '--skip-tests']
+
+
+def test_generate_uses_helm_directly(client, stub_helm, stub_kustomize):
+    payload = client.post('/generate', json={'yaml_content': PURE_HELM}).get_json()
+    assert payload == {'success': True, 'output': EXPECTED, 'error': None}
+    assert stub_kustomize() == 0
+    assert len(stub_helm()) == 1
+    assert app_module.workspace_pool.stats()['free'] == 2
+
+
+def test_other_documents_and_helm_failures_fall_back_to_kustomize(client, stub_helm, stub_kustomize, monkeypatch):
+    mixed = PURE_HELM + 'commonLabels:\n  team: web\n'
+    assert client.post('/generate', json={'yaml_content': mixed}).get_json()['output'].startswith('---\n')
+    assert stub_helm() == [] and stub_kustomize() == 1
+
+    monkeypatch.setenv('STUB_HELM_FAIL', '1')
+    payload = client.post('/generate', json={'yaml_content': PURE_HELM}).get_json()
+    assert payload['output'] == '---\n' + PURE_HELM
+    assert len(stub_helm()) == 1 and stub_kustomize() == 2
+
+
+def test_verify_mode_serves_kustomize_and_counts_mismatches(client, stub_helm, stub_kustomize, monkeypatch):
+    monkeypatch.setattr(app_module, 'HELM_FAST_PATH', 'verify')
+    before = app_module.HELM_FAST_PATH_RENDERS._snapshot().get(('mismatch',), 0)
+    payload = client.post('/generate', json={'yaml_content': PURE_HELM}).get_json()
+    # The stub kustomize echoes its input, so the two paths disagree
+    assert payload['output'] == '---\n' + PURE_HELM
+    assert app_module.HELM_FAST_PATH_RENDERS._snapshot()[('mismatch',)] == before + 1
+    assert len(stub_helm()) == 1 and stub_kustomize() == 1
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the valuesInline flattening engine
+"""
+
+from helm_values import chart_set_args, flatten_values, helm_set_args, helm_template_command
+
+
+def test_scalars_pick_the_right_flag():
+    pairs = dict((assignment, flag) for flag, assignment in flatten_values({
+        'name': 'api', 'port': 8086, 'enabled': True, 'ratio': 0.5, 'tag': '2e6d963',
+        'version': '1.0', 'code': '8086', 'flag': 'true', 'empty': '', 'nothing': None,
+    }))
+    assert pairs['name=api'] == '--set'
+    assert pairs['port=8086'] == '--set'
+    assert pairs['enabled=true'] == '--set'
+    assert pairs['ratio=0.5'] == '--set-json'
+    assert pairs['tag=2e6d963'] == '--set'
+    assert pairs['code=8086'] == '--set-string'
+    assert pairs['flag=true'] == '--set-string'
+    assert pairs['empty='] == '--set-string'
+    assert pairs['nothing=null'] == '--set-json'
+
+
+def test_flags_follow_helm_typed_val():
+    """A string helm's strvals.typedVal would coerce is sent with --set-string, anything else with --set"""
+    pairs = dict((assignment, flag) for flag, assignment in flatten_values({
+        'plus': '+5', 'negative_zero_padded': '-01', 'zero': '0', 'negative_zero': '-0', 'padded': '007',
+        'upper': 'NULL', 'mixed': 'tRuE', 'int64_max': str(2 ** 63 - 1), 'beyond_int64': str(2 ** 63),
+        'sign_only': '-', 'big': 2 ** 63, 'small': -2 ** 63 - 1, 'int64_min': -2 ** 63,
+    }))
+    for coerced in ('plus=+5', 'negative_zero_padded=-01', 'zero=0', 'negative_zero=-0', 'upper=NULL',
+                    'mixed=tRuE', f"int64_max={2 ** 63 - 1}"):
+        assert pairs[coerced] == '--set-string', coerced
+    for literal in ('padded=007', f"beyond_int64={2 ** 63}", 'sign_only=-', f"int64_min={-2 ** 63}"):
+        assert pairs[literal] == '--set', literal
+    # Out of int64 range helm would return the digits as a string; JSON keeps them a number
+    assert pairs[f"big={2 ** 63}"] == '--set-json'
+    assert pairs[f"small={-2 ** 63 - 1}"] == '--set-json'
+
+
+def test_lists_are_indexed_and_specials_escaped():
+    values = {
+        'ingress': {
+            'annotations': {'kubernetes.io/ingress.class': 'nginx'},
+            'hosts': [{'host': 'a.local', 'paths': ['/', '/api']}],
+        },
+        'args': ['--a=1,2'],
+        'tls': [],
+        'resources': {},
+    }
+    assert [assignment for _, assignment in flatten_values(values)] == [
+        r'ingress.annotations.kubernetes\.io/ingress\.class=nginx',
+        'ingress.hosts[0].host=a.local',
+        'ingress.hosts[0].paths[0]=/',
+        'ingress.hosts[0].paths[1]=/api',
+        r'args[0]=--a=1\,2',
+        'tls=[]',
+        'resources={}',
+    ]
+
+
+def test_shell_quoting():
+    assert helm_set_args({'blog': 'My Blog', 'image': {'tag': 'v1'}}) == ["--set 'blog=My Blog'", '--set image.tag=v1']
+
+
+def test_deep_trees_do_not_recurse():
+    tree = leaf = {}
+    for _ in range(5000):
+        leaf['n'] = {}
+        leaf = leaf['n']
+    leaf['value'] = 1
+    (flag, assignment), = flatten_values(tree)
+    assert assignment.endswith('.n.value=1') and assignment.count('.') == 5000
+
+
+def test_every_chart_in_one_pass():
+    document = {'helmCharts': [
+        {'name': 'api', 'repo': 'https://charts.example', 'version': '1.0.0', 'valuesInline': {'port': 80}},
+        {'name': 'worker', 'releaseName': 'jobs'},
+    ]}
+    (api, api_args), (worker, worker_args) = chart_set_args(document)
+    assert api_args == ['--set port=80'] and worker_args == []
+    assert helm_template_command(api, api_args) == \
+        'helm template api api --repo https://charts.example --version 1.0.0 --set port=80'
+    assert helm_template_command(worker, worker_args) == 'helm template jobs worker'
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for per-helmChart incremental rendering
+"""
+
+import yaml
+
+import incremental
+
+TWO_CHARTS = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+namespace: admin
+helmCharts:
+- name: qoin
+  repo: https://newrahmat.bitbucket.io
+  version: 0.11.0
+  releaseName: api
+  valuesInline:
+    port: 8086
+- name: qoin
+  repo: https://newrahmat.bitbucket.io
+  version: 0.11.0
+  releaseName: worker
+  valuesInline:
+    port: {worker_port}
+"""
+
+
+def test_only_changed_charts_are_rerendered(client, stub_kustomize):
+    first = client.post('/generate', json={'yaml_content': TWO_CHARTS.format(worker_port=9000), 'incremental': True})
+    assert first.json['success'] is True
+    assert first.headers['X-Render-Cache'] == 'MISS'
+    assert stub_kustomize() == 3
+
+    # The merge step sees both rendered units as resources
+    output = first.json['output']
+    assert '__helm_unit_0.yaml' in output and '__helm_unit_1.yaml' in output
+    assert 'releaseName: api' in output and 'port: 9000' in output
+
+    second = client.post('/generate', json={'yaml_content': TWO_CHARTS.format(worker_port=9001), 'incremental': True})
+    assert second.headers['X-Render-Cache'] == 'PARTIAL'
+    assert 'port: 9001' in second.json['output']
+    assert stub_kustomize() == 5
+
+
+def test_single_helm_only_chart_skips_merge_build(client, stub_kustomize):
+    document = yaml.safe_load(TWO_CHARTS.format(worker_port=1))
+    del document['namespace']
+    document['helmCharts'] = document['helmCharts'][:1]
+    response = client.post('/generate', json={'yaml_content': yaml.safe_dump(document), 'incremental': True})
+    assert response.json['success'] is True
+    assert stub_kustomize() == 1
+
+
+def test_unit_failure_is_reported(client):
+    content = TWO_CHARTS.format(worker_port='FAIL')
+    response = client.post('/generate', json={'yaml_content': content, 'incremental': True})
+    assert response.json['success'] is False
+    assert 'stub build failed' in response.json['error']
+
+
+def test_unsplittable_layouts_fall_back():
+    document = yaml.safe_load(TWO_CHARTS.format(worker_port=1))
+    assert len(incremental.plan_units(document)) == 2
+
+    with_values_file = dict(document, helmCharts=[dict(document['helmCharts'][0], valuesFile='values.yaml')])
+    assert incremental.plan_units(with_values_file) is None
+
+    fifo = dict(document, sortOptions={'order': 'fifo'}, configMapGenerator=[{'name': 'cfg'}])
+    assert incremental.plan_units(fifo) is None
+    assert incremental.plan_units({'resources': ['a.yaml']}) is None
+
+    with_origins = dict(document, buildMetadata=['originAnnotations'])
+    assert incremental.plan_units(with_origins) is None
+
+
+def test_merge_keeps_resources_before_units():
+    document = dict(yaml.safe_load(TWO_CHARTS.format(worker_port=1)), resources=['deployment.yaml'])
+    merged = yaml.safe_load(incremental.merge_yaml(document, 2))
+    assert merged['resources'] == ['deployment.yaml', '__helm_unit_0.yaml', '__helm_unit_1.yaml']
+    assert merged['namespace'] == 'admin'
+    assert 'helmCharts' not in merged
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process Kustomization schema check
+"""
+
+import glob
+
+import pytest
+
+import app as app_module
+from kustomization_schema import describe, errors
+
+CHART = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+helmCharts:
+- name: qoin
+  repo: https://charts.example
+  version: 1.0.0
+  releaseName: qoin
+  valuesInline:
+    port: 8086
+"""
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob('samples/*.yaml') + glob.glob('old-samples/*.yaml')))
+def test_samples_pass(path):
+    with open(path, encoding='utf-8') as f:
+        assert errors(f.read()) == []
+
+
+@pytest.mark.parametrize('content, expected', [
+    (CHART.replace('  version: 1.0.0\n', ''), ('helmCharts[0]', 4, 3, "missing required field 'version'")),
+    (CHART.replace('  repo: https://charts.example\n', ''), ('helmCharts[0]', 4, 3, "missing required field 'repo'")),
+    (CHART.replace('version: 1.0.0', 'version: 1.0'), ('helmCharts[0].version', 6, 12, 'expected a string')),
+    (CHART.replace('helmCharts:', 'helmChart:'), ('helmChart', 3, 1, "unknown field 'helmChart'")),
+    (CHART.replace('    port: 8086\n', '  - port\n'), ('helmCharts[0].valuesInline', 9, 3, 'expected a mapping')),
+    (CHART + 'images:\n- name: api\n  newTag: 2\n', ('images[0].newTag', 12, 11, 'expected a string')),
+    (CHART + 'commonLabels:\n  tier: true\n', ('commonLabels.tier', 11, 9, 'expected a string')),
+    (CHART + 'resources: app.yaml\n', ('resources', 10, 12, 'expected a list')),
+    (CHART.replace('Kustomization', 'Deployment'), ('kind', 2, 7, 'kind must be one of')),
+    ('kind: Kustomization\n  oops: [\n', (None, 2, 7, 'mapping values are not allowed')),
+])
+def test_errors_carry_line_and_column(content, expected):
+    path, line, column, message = expected
+    found = errors(content)
+    assert len(found) == 1, found
+    assert (found[0]['path'], found[0]['line'], found[0]['column']) == (path, line, column)
+    assert found[0]['message'].startswith(message)
+
+
+def test_lenient_where_kustomize_is():
+    # Timestamps read as strings in Go, nested objects may grow fields, empty files are kustomize's call
+    assert errors(CHART.replace('version: 1.0.0', 'version: 2024-01-01') + 'sortOptions: {order: legacy}\n') == []
+    assert errors(CHART.replace('  releaseName', '  debug: true\n  releaseName')) == []
+    assert errors('') == []
+
+
+def test_null_fields_are_absent():
+    # Every entry commented out leaves the key with a null value, which kustomize reads as empty
+    assert errors('kind: Kustomization\nresources:\n# - deployment.yaml\n') == []
+    assert errors(CHART.replace('  valuesInline:\n    port: 8086\n', '  valuesInline:\n')) == []
+
+
+def test_generate_and_validate_skip_kustomize_for_invalid_input(client, stub_kustomize):
+    bad = CHART.replace('  version: 1.0.0\n', '') + 'namePrefixes: prod-\n'
+    rejected = dict(app_module.SCHEMA_REJECTIONS._snapshot())
+    response = client.post('/generate', json={'yaml_content': bad})
+    payload = response.get_json()
+    assert payload['success'] is False
+    assert response.headers['X-Render-Cache'] == 'INVALID'
+    assert [(e['line'], e['path']) for e in payload['errors']] == [(4, 'helmCharts[0]'), (9, 'namePrefixes')]
+    assert payload['error'] == describe(payload['errors'])
+    assert payload['error'].startswith("kustomization.yaml:4:3: helmCharts[0]: missing required field 'version'")
+    assert stub_kustomize() == 0
+
+    validated = client.post('/validate', json={'yaml_content': bad}).get_json()
+    assert validated['valid'] is False
+    assert validated['errors'] == payload['errors']
+
+    assert client.post('/generate', json={'yaml_content': 'kind: Kustomization\n'}).get_json()['success'] is True
+    assert stub_kustomize() == 1
+    for operation in ('render', 'validate'):
+        assert app_module.SCHEMA_REJECTIONS._snapshot()[(operation,)] == rejected.get((operation,), 0) + 1
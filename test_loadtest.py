@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the load-test harness and its stub kustomize
+"""
+
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import loadtest  # noqa: E402
+
+
+def result(rps, p95_ms, errors=0):
+    return {'requests': 100, 'errors': errors, 'rps': rps, 'p50_ms': 1.0, 'p95_ms': p95_ms, 'p99_ms': p95_ms}
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {'results': {'generate': result(100.0, 10.0), 'samples': result(1000.0, 2.0)}}
+    current = {
+        'generate': result(90.0, 12.0),
+        'samples': result(600.0, 3.0, errors=1),
+        'validate': result(1.0, 500.0),
+    }
+    regressions = loadtest.compare(current, baseline, tolerance=0.25)
+    assert regressions == [
+        'samples: p95 3.0 ms vs baseline 2.0 ms',
+        'samples: 600.0 req/s vs baseline 1000.0 req/s',
+        'samples: 1 errors vs baseline 0',
+    ]
+
+
+def test_percentile_uses_nearest_rank():
+    ordered = [float(value) for value in range(1, 101)]
+    assert loadtest.percentile(ordered, 0.5) == 50.0
+    assert loadtest.percentile(ordered, 0.99) == 99.0
+    assert loadtest.percentile(ordered, 1.0) == 100.0
+    assert loadtest.percentile(ordered, 0.0) == 1.0
+    assert loadtest.percentile([], 0.99) == 0.0
+
+
+def test_stub_emits_padding_and_fails_on_demand(stub_kustomize, tmp_path, monkeypatch):
+    (tmp_path / 'kustomization.yaml').write_text('kind: Kustomization\n')
+    monkeypatch.setenv('STUB_KUSTOMIZE_OUTPUT_MB', '1')
+    build = subprocess.run(['kustomize', 'build', str(tmp_path)], capture_output=True, text=True)
+    assert build.returncode == 0
+    assert build.stdout.startswith('---\nkind: Kustomization\n')
+    assert 0.9 * 1024 * 1024 < len(build.stdout) < 1.2 * 1024 * 1024
+
+    monkeypatch.setenv('STUB_KUSTOMIZE_FAIL_RATE', '1')
+    failed = subprocess.run(['kustomize', 'build', str(tmp_path)], capture_output=True, text=True)
+    assert failed.returncode == 1
+    assert stub_kustomize() == 2
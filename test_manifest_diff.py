@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for the resource-level manifest diff and /diff
+"""
+
+import json
+
+import pytest
+
+import app as app_module
+import manifest_diff
+from manifest_diff import diff_manifests, diff_values, split_documents
+
+BEFORE = """---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: api
+  namespace: prod
+spec:
+  replicas: 2
+  template:
+    spec:
+      containers:
+      - name: app
+        image: api:1.0
+        env:
+        - name: MODE
+          value: fast
+      - name: sidecar
+        image: proxy:1
+---
+apiVersion: v1
+kind: Service
+metadata:
+  name: api
+  namespace: prod
+spec:
+  ports:
+  - port: 80
+---
+apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: legacy
+  namespace: prod
+"""
+
+# Reordered, reformatted, one Deployment edit, ConfigMap replaced by a Secret
+AFTER = """---
+apiVersion: v1
+kind: Service
+metadata: {name: api, namespace: prod}
+spec:
+  ports:
+  - port: 80
+---
+apiVersion: v1
+kind: Secret
+metadata:
+  name: token
+  namespace: prod
+---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: api
+  namespace: prod
+  labels:
+    app.kubernetes.io/name: api
+spec:
+  replicas: 3
+  template:
+    spec:
+      containers:
+      - name: sidecar
+        image: proxy:1
+      - name: app
+        image: api:1.1
+        env:
+        - name: MODE
+          value: fast
+"""
+
+
+def _events(before, after):
+    return list(diff_manifests(before, after))
+
+
+def test_resources_are_matched_by_id_not_position():
+    events = _events(BEFORE, AFTER)
+    assert events[-1] == {'type': 'summary', 'added': 1, 'removed': 1, 'changed': 1, 'unchanged': 1}
+
+    by_type = {event['type']: event for event in events}
+    assert by_type['added']['resource'] == {'apiVersion': 'v1', 'kind': 'Secret', 'namespace': 'prod', 'name': 'token'}
+    assert by_type['removed']['resource']['name'] == 'legacy'
+    changes = {change['path']: change for change in by_type['changed']['changes']}
+    assert set(changes) == {
+        '.metadata.labels',
+        '.spec.replicas',
+        '.spec.template.spec.containers[name="app"].image',
+    }
+    assert changes['.spec.replicas'] == {'path': '.spec.replicas', 'op': 'changed', 'before': 2, 'after': 3}
+    assert changes['.metadata.labels']['op'] == 'added'
+
+
+def test_field_paths_for_lists_and_odd_keys():
+    changes = list(diff_values({'args': ['a', 'b'], 'labels': {'app.kubernetes.io/name': 'x'}},
+                               {'args': ['a', 'c', 'd'], 'labels': {'app.kubernetes.io/name': 'y'}}))
+    assert [(change['path'], change['op']) for change in changes] == [
+        ('.args[1]', 'changed'), ('.args[2]', 'added'), ('.labels["app.kubernetes.io/name"]', 'changed')]
+
+
+def test_identical_documents_are_not_parsed(monkeypatch):
+    services = ''.join(f"---\napiVersion: v1\nkind: Service\nmetadata:\n  name: svc-{index}\n"
+                       for index in range(3000))
+    parsed = []
+    monkeypatch.setattr(manifest_diff, 'load', lambda text: parsed.append(text) or __import__('yaml').safe_load(text))
+
+    events = _events(services, services.replace('name: svc-1500\n', 'name: svc-1500\n  labels: {a: b}\n'))
+    assert events[-1] == {'type': 'summary', 'added': 0, 'removed': 0, 'changed': 1, 'unchanged': 2999}
+    assert len(parsed) == 2
+
+
+def test_split_documents_handles_separator_variants():
+    assert split_documents('a: 1\n--- # first\nb: 2\n---\n\n---\nc: 3') == ['a: 1\n', 'b: 2\n', 'c: 3']
+
+
+def test_diff_endpoint_streams_events(client, stub_kustomize):
+    response = client.post('/diff', json={'before': BEFORE, 'after': {'manifest': AFTER}})
+    assert response.mimetype == 'application/x-ndjson'
+    events = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [event['type'] for event in events] == ['added', 'changed', 'removed', 'summary']
+
+
+def test_diff_endpoint_resolves_history_and_renders(client, stub_kustomize):
+    yaml_before = 'apiVersion: kustomize.config.k8s.io/v1beta1\nkind: Kustomization\nnamespace: a\n'
+    client.post('/generate', json={'yaml_content': yaml_before})
+    app_module.render_history.flush()
+    history_id = app_module.render_history.list(limit=1)[0]['id']
+
+    response = client.post('/diff', json={
+        'before': {'history_id': history_id},
+        'after': {'yaml_content': yaml_before.replace('namespace: a', 'namespace: b')},
+    })
+    summary = json.loads(response.data.decode().splitlines()[-1])
+    assert summary == {'type': 'summary', 'added': 0, 'removed': 0, 'changed': 1, 'unchanged': 0}
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'before': BEFORE}, 'must be manifest text'),
+    ({'before': BEFORE, 'after': {}}, "needs 'manifest'"),
+    ({'before': BEFORE, 'after': {'history_id': 12345}}, 'No recorded output'),
+    ({'before': BEFORE, 'after': {'yaml_content': 'kind: Kustomization\nnamespace: FAIL\n'}}, 'Render failed'),
+    ({'before': BEFORE, 'after': 'a: [unclosed\n'}, 'expected'),
+])
+def test_diff_endpoint_rejects_bad_sides(client, stub_kustomize, body, message):
+    response = client.post('/diff', json=body)
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
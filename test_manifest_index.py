@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for the rendered-manifest resource index and /renders
+"""
+
+import pytest
+
+import app as app_module
+from manifest_index import build, matches, parse_selector
+from render_cache import RenderCache
+
+MANIFEST = """apiVersion: v1
+kind: Namespace
+metadata:
+  name: prod
+---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  labels:
+    app: api
+    tier: backend
+  name: api
+  namespace: prod
+spec:
+  template:
+    metadata:
+      name: not-the-resource-name
+    spec:
+      containers:
+      - image: api:1.0
+        name: app
+---
+apiVersion: v1
+data:
+  greeting: "héllo"
+kind: ConfigMap
+metadata: {name: greetings, namespace: prod, labels: {app: api}}
+---
+apiVersion: v1
+kind: Service
+metadata:
+  labels:
+    app: web
+  name: web
+  namespace: edge
+"""
+
+
+def test_build_records_header_fields_and_byte_offsets():
+    index = build(MANIFEST)
+    assert [(e['kind'], e['namespace'], e['name']) for e in index.entries] == [
+        ('Namespace', None, 'prod'), ('Deployment', 'prod', 'api'),
+        ('ConfigMap', 'prod', 'greetings'), ('Service', 'edge', 'web')]
+    assert index.entries[1]['labels'] == {'app': 'api', 'tier': 'backend'}
+    assert index.entries[2]['labels'] == {'app': 'api'}
+
+    data = MANIFEST.encode('utf-8')
+    assert index.total_bytes == len(data)
+    for entry in index.entries:
+        # Offsets are bytes of the UTF-8 output, so the non-ASCII ConfigMap shifts what follows
+        document = data[entry['offset']:entry['offset'] + entry['length']].decode('utf-8')
+        assert document == index.content(entry)
+        assert MANIFEST.splitlines()[entry['line'] - 1].startswith('apiVersion:')
+    assert index.content(index.entries[3]).endswith('namespace: edge\n')
+
+    summary = index.summary()
+    assert summary['resources'] == 4
+    assert summary['lines'] == len(MANIFEST.splitlines())
+    assert summary['namespaces'] == {'prod': 2, '': 1, 'edge': 1}
+    assert {kind['kind']: kind['count'] for kind in summary['kinds']} == {
+        'Namespace': 1, 'Deployment': 1, 'ConfigMap': 1, 'Service': 1}
+
+
+def test_header_that_does_not_parse_alone_falls_back_to_the_document():
+    index = build("---\nkind: ConfigMap\ndata: &shared\n  name: x\nmetadata:\n  labels: *shared\n  name: y\n---\n")
+    assert len(index.entries) == 1
+    assert index.entries[0]['name'] == 'y'
+    assert index.entries[0]['labels'] == {'name': 'x'}
+
+
+@pytest.mark.parametrize('selector, names', [
+    ('app=api', ['api', 'greetings']),
+    ('app==api,tier=backend', ['api']),
+    ('app!=api', ['prod', 'web']),
+    ('app in (web, api),!tier', ['greetings', 'web']),
+    ('app notin (api)', ['prod', 'web']),
+    ('tier', ['api']),
+])
+def test_label_selectors(selector, names):
+    index = build(MANIFEST)
+    assert [entry['name'] for entry in index.select(selector=parse_selector(selector))] == names
+
+
+@pytest.mark.parametrize('selector', ['app in (a,', 'app=a,,b=c', 'bad key=x', 'app in ()'])
+def test_invalid_selectors_raise(selector):
+    with pytest.raises(ValueError):
+        parse_selector(selector)
+    assert matches([], {})
+
+
+@pytest.fixture
+def echo_manifest(monkeypatch):
+    """The stub kustomize echoes its input, so /generate can be fed a manifest instead of a kustomization"""
+    monkeypatch.setattr(app_module, 'SCHEMA_PREFLIGHT', False)
+
+
+def test_generate_summary_and_paged_resources(client, stub_kustomize, echo_manifest):
+    response = client.post('/generate', json={'yaml_content': MANIFEST, 'summary': True})
+    payload = response.get_json()
+    assert payload['success'] is True
+    assert payload['output'] is None
+    assert payload['summary']['resources'] == 4
+    render_id = payload['render_id']
+
+    first = client.get(f'/renders/{render_id}/resources?namespace=prod&limit=1').get_json()
+    assert first['total'] == 2
+    assert [r['name'] for r in first['resources']] == ['api']
+    assert 'content' not in first['resources'][0]
+    second = client.get(f"/renders/{render_id}/resources?namespace=prod&limit=1&offset={first['next_offset']}"
+                        '&content=1').get_json()
+    assert second['next_offset'] is None
+    assert second['resources'][0]['content'].startswith('apiVersion: v1\ndata:')
+
+    by_kind = client.get(f'/renders/{render_id}/resources?kind=Service&kind=Namespace').get_json()
+    assert [r['name'] for r in by_kind['resources']] == ['prod', 'web']
+    selected = client.get(f'/renders/{render_id}/resources?selector=app%3Dweb').get_json()
+    assert [r['name'] for r in selected['resources']] == ['web']
+    assert client.get(f'/renders/{render_id}/resources?selector=app+in+(').status_code == 400
+
+    # The full text and single documents by byte range, for copy and lazy display
+    output = client.get(f'/renders/{render_id}/output')
+    assert output.get_data(as_text=True) == '---\n' + MANIFEST
+    service = by_kind['resources'][1]
+    ranged = client.get(f'/renders/{render_id}/output', headers={
+        'Range': f"bytes={service['offset']}-{service['offset'] + service['length'] - 1}"})
+    assert ranged.status_code == 206
+    assert ranged.get_data(as_text=True).startswith('apiVersion: v1\nkind: Service\n')
+    assert stub_kustomize() == 1
+
+
+def test_evicted_and_unknown_renders_are_not_found(client, stub_kustomize, echo_manifest):
+    render_id = client.post('/generate', json={'yaml_content': MANIFEST, 'summary': True}).get_json()['render_id']
+    # Another worker has neither the index nor the output: served from the render cache if it is there
+    app_module._render_indexes.clear()
+    assert client.get(f'/renders/{render_id}/summary').get_json()['summary']['resources'] == 4
+    app_module._render_indexes.clear()
+    app_module.render_cache.clear()
+    assert client.get(f'/renders/{render_id}/summary').status_code == 404
+    assert client.get('/renders/..%2Fetc/summary').status_code == 404
+
+
+def test_editor_asks_for_summaries_only_with_a_shared_render_tier(client, tmp_path, monkeypatch):
+    assert b'const SUMMARY_RENDERS = false;' in client.get('/').data
+    monkeypatch.setattr(app_module, 'render_cache', RenderCache(disk_dir=str(tmp_path / 'renders')))
+    assert b'const SUMMARY_RENDERS = true;' in client.get('/').data
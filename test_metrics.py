@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics registry and /metrics endpoint
+"""
+
+import threading
+
+from metrics import Registry
+
+
+def test_histogram_counter_and_gauge_exposition():
+    registry = Registry()
+    latency = registry.histogram('demo_seconds', 'Demo latency', ['stage'], buckets=(0.1, 1.0))
+    exits = registry.counter('demo_exits_total', 'Demo exits', ['code'])
+    in_flight = registry.gauge('demo_in_flight', 'Demo in flight')
+
+    latency.observe(0.05, 'build')
+    latency.observe(0.5, 'build')
+    latency.observe(5, 'build')
+    exits.inc('0')
+    exits.inc('0')
+    exits.inc('1')
+    in_flight.inc()
+
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="build",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="build",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="build",le="+Inf"} 3' in text
+    assert 'demo_seconds_sum{stage="build"} 5.55' in text
+    assert 'demo_seconds_count{stage="build"} 3' in text
+    assert 'demo_exits_total{code="0"} 2' in text
+    assert 'demo_exits_total{code="1"} 1' in text
+    assert 'demo_in_flight 1' in text
+
+
+def test_shards_from_exited_threads_are_kept():
+    registry = Registry()
+    counter = registry.counter('demo_total', 'Demo')
+    gauge = registry.gauge('demo_in_flight', 'Demo')
+
+    def work():
+        for _ in range(100):
+            counter.inc()
+        gauge.inc()
+
+    for _ in range(5):
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    # Decrements from another thread still cancel out
+    gauge.dec(amount=20)
+    counter.inc()
+
+    assert 'demo_total 2001' in registry.render()
+    assert 'demo_in_flight 0' in registry.render()
+    # Dead threads' shards were folded when the main thread registered
+    assert len(counter._shards) <= 2
+
+
+def test_metrics_endpoint_reports_stages_and_caches(client):
+    client.post('/generate', json={'yaml_content': 'kind: Kustomization\n'})
+    client.post('/generate', json={'yaml_content': 'kind: Kustomization\n'})
+    client.post('/generate', json={'yaml_content': 'kind: Kustomization\nnamespace: FAIL\n'})
+    client.post('/validate', json={'yaml_content': 'kind: Kustomization\n'})
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert 'kustomize_builder_stage_duration_seconds_count{operation="render",stage="kustomize"}' in text
+    assert 'kustomize_builder_stage_duration_seconds_count{operation="validate",stage="parse"}' in text
+    assert 'kustomize_builder_subprocess_exits_total{code="1"}' in text
+    assert 'kustomize_builder_request_duration_seconds_count{route="/generate",method="POST",status="200"}' in text
+    assert 'kustomize_builder_render_output_bytes_count{cache="HIT"}' in text
+    assert 'kustomize_builder_cache_hit_ratio{cache="render"} 0.3333333333333333' in text
+    assert 'kustomize_builder_renders_in_flight 0' in text
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Tests for live preview sessions
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as app_module
+from preview import CancelToken, PreviewBusy, PreviewHub
+
+SAMPLE_YAML = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+namespace: admin
+"""
+
+
+def parse_events(chunks):
+    """Yield (event, data) pairs from an SSE byte or text stream"""
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+        while '\n\n' in buffer:
+            block, buffer = buffer.split('\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+            if 'event' in fields:
+                yield fields['event'], json.loads(fields['data'])
+
+
+def collect(stream, events, close):
+    """Read stream on a background thread, putting parsed events on a queue
+
+    The reader closes the stream itself after the first result, as a server
+    does on the thread that was writing it.
+    """
+    def read():
+        for item in parse_events(stream):
+            events.put(item)
+            if item[0] == 'result':
+                break
+        close()
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    return thread
+
+
+def next_event(events, name, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        event, data = events.get(timeout=max(0.01, deadline - time.monotonic()))
+        if event == name:
+            return data
+
+
+def test_cancel_token_runs_callbacks_once():
+    token = CancelToken()
+    calls = []
+    token.on_cancel(lambda: calls.append('first'))
+    token.cancel()
+    token.cancel()
+    token.on_cancel(lambda: calls.append('late'))
+    assert calls == ['first', 'late']
+
+
+def test_rapid_edits_are_debounced_into_one_render(tmp_path):
+    rendered = []
+
+    def render(yaml_content, token):
+        rendered.append(yaml_content)
+        return {'success': True, 'output': yaml_content, 'error': None}, 'MISS'
+
+    hub = PreviewHub(render, spool_dir=str(tmp_path), debounce=0.2, poll_interval=0.01)
+    stream = hub.events('session-1')
+    events = queue.Queue()
+    reader = collect(stream, events, stream.close)
+    for revision in range(1, 6):
+        assert hub.submit('session-1', f"rev {revision}") == revision
+        time.sleep(0.02)
+
+    result = next_event(events, 'result')
+    assert result['revision'] == 5 and result['output'] == 'rev 5'
+    assert rendered == ['rev 5']
+    # Stale revisions (e.g. a slow request arriving late) are ignored
+    assert hub.submit('session-1', 'old', revision=3) is None
+    reader.join(5)
+    assert hub.stats()['sessions'] == 0
+    assert not list(tmp_path.glob('*.json'))
+
+
+def test_newer_revision_cancels_running_render(tmp_path):
+    started = threading.Event()
+
+    def render(yaml_content, token):
+        if yaml_content == 'slow':
+            started.set()
+            cancelled = threading.Event()
+            token.on_cancel(cancelled.set)
+            cancelled.wait(10)
+            return None
+        return {'success': True, 'output': yaml_content, 'error': None}, 'MISS'
+
+    hub = PreviewHub(render, spool_dir=str(tmp_path), debounce=0.01, poll_interval=0.01)
+    stream = hub.events('session-1')
+    events = queue.Queue()
+    reader = collect(stream, events, stream.close)
+    hub.submit('session-1', 'slow')
+    assert started.wait(5)
+    # The edit may come through another server process, which only writes the mailbox
+    PreviewHub(render, spool_dir=str(tmp_path)).submit('session-1', 'fast')
+
+    result = next_event(events, 'result')
+    assert result['output'] == 'fast' and result['revision'] == 2
+    assert hub.stats()['cancelled'] == 1
+    reader.join(5)
+
+
+def test_session_limit(tmp_path):
+    hub = PreviewHub(lambda yaml_content, token: None, spool_dir=str(tmp_path), max_sessions=1)
+    first = hub.events('session-1')
+    next(first)
+    with pytest.raises(PreviewBusy):
+        hub.events('session-2')
+    # Reopening the same session replaces the old stream instead
+    second = hub.events('session-1')
+    next(second)
+    assert list(first) == []
+    second.close()
+    assert hub.stats()['sessions'] == 0
+
+
+def test_concurrent_submits_get_distinct_revisions(tmp_path):
+    hub = PreviewHub(lambda yaml_content, token: None, spool_dir=str(tmp_path))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        revisions = list(executor.map(lambda index: hub.submit('session-1', f"n: {index}\n"), range(40)))
+    assert sorted(revisions) == list(range(1, 41))
+
+
+def test_unstarted_streams_hold_no_slot_and_live_mailboxes_survive_sweeps(tmp_path):
+    hub = PreviewHub(lambda yaml_content, token: None, spool_dir=str(tmp_path), max_sessions=1, mailbox_ttl=60)
+    hub.events('session-1').close()
+    assert hub.stats()['sessions'] == 0
+
+    stream = hub.events('session-1')
+    next(stream)
+    hub.submit('session-1', SAMPLE_YAML)
+    mailbox = tmp_path / 'session-1.json'
+    os.utime(mailbox, (1, 1))
+    with pytest.raises(PreviewBusy):
+        hub.events('session-2')
+    hub._sweep()
+    assert mailbox.exists()
+    stream.close()
+    assert not mailbox.exists() and hub.stats()['sessions'] == 0
+
+
+def test_preview_endpoints_kill_superseded_kustomize(client, stub_kustomize, tmp_path, monkeypatch):
+    hub = PreviewHub(app_module._render_preview, spool_dir=str(tmp_path / 'spool'), debounce=0.05,
+                     poll_interval=0.01)
+    monkeypatch.setattr(app_module, 'preview_hub', hub)
+    monkeypatch.setenv('STUB_KUSTOMIZE_SLEEP', '0.5')
+
+    assert client.post('/preview/bad id!/events').status_code == 405
+    assert client.get('/preview/x/events').status_code == 400
+
+    response = client.get('/preview/editor-session-1/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    events = queue.Queue()
+    reader = collect(response.response, events, response.close)
+
+    assert client.post('/preview/editor-session-1', json={'yaml_content': SAMPLE_YAML, 'revision': 1}).json == {
+        'accepted': True, 'revision': 1}
+    assert next_event(events, 'rendering')['revision'] == 1
+    while stub_kustomize() < 1:
+        time.sleep(0.01)
+    started = time.monotonic()
+    client.post('/preview/editor-session-1', json={'yaml_content': SAMPLE_YAML + 'nameSuffix: -v2\n', 'revision': 2})
+
+    result = next_event(events, 'result')
+    assert result['revision'] == 2 and result['success']
+    assert 'nameSuffix: -v2' in result['output']
+    # Revision 1 was killed rather than run to completion alongside revision 2
+    assert time.monotonic() - started < 0.95
+    assert hub.stats()['cancelled'] == 1
+    assert stub_kustomize() == 2
+    reader.join(5)
+    assert hub.stats()['sessions'] == 0
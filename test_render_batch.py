@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for the /generate/batch NDJSON endpoint
+"""
+
+import json
+
+from render_batch import render_batch
+
+SAMPLE_YAML = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+namespace: {namespace}
+"""
+
+
+def test_batch_streams_every_item_and_isolates_errors(client, stub_kustomize):
+    documents = [{'name': f"svc-{i}", 'yaml_content': SAMPLE_YAML.format(namespace=f"ns-{i}")} for i in range(5)]
+    documents.append({'name': 'broken', 'yaml_content': SAMPLE_YAML.format(namespace='FAIL')})
+
+    response = client.post('/generate/batch', json={'documents': documents})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    frames = [json.loads(line) for line in response.data.decode().splitlines()]
+    items, summary = frames[:-1], frames[-1]
+    assert summary == {'done': True, 'total': 6, 'succeeded': 5, 'failed': 1}
+    assert sorted(item['index'] for item in items) == list(range(6))
+
+    by_name = {item['name']: item for item in items}
+    assert by_name['broken']['success'] is False
+    assert 'namespace: ns-3' in by_name['svc-3']['output']
+    assert stub_kustomize() == 6
+
+
+def test_batch_rejects_malformed_documents(client):
+    assert client.post('/generate/batch', json={'documents': 'nope'}).status_code == 400
+    assert client.post('/generate/batch', json={'documents': [{'name': 'x'}]}).status_code == 400
+
+
+def test_render_batch_reports_exceptions_per_item():
+    def render(yaml_content):
+        if yaml_content == 'boom':
+            raise RuntimeError('exploded')
+        return {'success': True, 'output': yaml_content, 'error': None}
+
+    documents = [{'name': 'a', 'yaml_content': 'ok'}, {'name': 'b', 'yaml_content': 'boom'}]
+    results = {item['name']: item for item in render_batch(render, documents, workers=2)}
+    assert results['a']['success'] is True
+    assert results['b'] == {'success': False, 'output': None, 'error': 'exploded', 'index': 1, 'name': 'b'}
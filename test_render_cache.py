@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed render cache
+"""
+
+import os
+import time
+
+from render_cache import RenderCache, make_key
+
+SAMPLE_YAML = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+namespace: admin
+"""
+
+
+def test_make_key_ignores_formatting_and_comments():
+    reordered = "# comment\nnamespace: admin\nkind: Kustomization\napiVersion: kustomize.config.k8s.io/v1beta1\n"
+    assert make_key(SAMPLE_YAML, 'v1') == make_key(reordered, 'v1')
+    assert make_key(SAMPLE_YAML, 'v1') != make_key(SAMPLE_YAML, 'v2')
+    assert make_key(SAMPLE_YAML, 'v1') != make_key(SAMPLE_YAML.replace('admin', 'dev'), 'v1')
+
+
+def test_make_key_handles_mixed_key_types():
+    mixed = "helmCharts:\n- name: web\n  valuesInline:\n    ports: {80: http, metrics: 9090}\n"
+    assert make_key(mixed, 'v1') == make_key(mixed.replace('{80: http, metrics: 9090}', '{metrics: 9090, 80: http}'), 'v1')
+    assert make_key(mixed, 'v1') != make_key(mixed.replace('80: http', "'80': http"), 'v1')
+    assert make_key(mixed, 'v1') != make_key(mixed.replace('80: http', '81: http'), 'v1')
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = RenderCache(max_entries=2, max_bytes=10)
+    cache.put('a', 'aaaa')
+    cache.put('b', 'bbbb')
+    cache.get('a')
+    cache.put('c', 'cccc')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'aaaa'
+
+    cache.put('d', 'dddddddd')
+    assert cache.stats()['bytes'] <= 10
+    assert cache.stats()['evictions'] >= 2
+
+
+def test_ttl_expiry():
+    cache = RenderCache(ttl=0)
+    cache.put('a', 'output')
+    time.sleep(0.01)
+    assert cache.get('a') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    disk_dir = str(tmp_path / 'cache')
+    RenderCache(disk_dir=disk_dir).put('abcdef', 'rendered')
+
+    cache = RenderCache(disk_dir=disk_dir)
+    assert cache.get('abcdef') == 'rendered'
+    assert cache.stats()['disk_hits'] == 1
+    assert cache.get('abcdef') == 'rendered'
+    assert cache.stats()['hits'] == 1
+
+
+def test_disk_tier_size_eviction(tmp_path):
+    disk_dir = str(tmp_path / 'cache')
+    cache = RenderCache(disk_dir=disk_dir, disk_max_bytes=10)
+    cache.put('aa1', 'x' * 6)
+    os.utime(cache._disk_path('aa1'), (1, 1))
+    cache.put('bb2', 'y' * 6)
+    assert not os.path.exists(cache._disk_path('aa1'))
+    assert os.path.exists(cache._disk_path('bb2'))
+
+
+def test_generate_hit_skips_subprocess(client, stub_kustomize):
+    first = client.post('/generate', json={'yaml_content': SAMPLE_YAML})
+    second = client.post('/generate', json={'yaml_content': SAMPLE_YAML + '\n# edited comment\n'})
+
+    assert first.headers['X-Render-Cache'] == 'MISS'
+    assert second.headers['X-Render-Cache'] == 'HIT'
+    assert first.json['output'] == second.json['output']
+    assert stub_kustomize() == 1
+
+    stats = client.get('/cache/stats').json['render_cache']
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+
+def test_generate_failures_are_not_cached(client, stub_kustomize):
+    bad = SAMPLE_YAML + 'commonLabels:\n  app: FAIL\n'
+    assert client.post('/generate', json={'yaml_content': bad}).json['success'] is False
+    assert client.post('/generate', json={'yaml_content': bad}).json['success'] is False
+    assert stub_kustomize() == 2
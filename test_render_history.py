@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite render history and the /history endpoints
+"""
+
+import threading
+import time
+
+import app as app_module
+from render_history import RenderHistory, content_hash
+
+SAMPLE_YAML = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+namespace: history
+"""
+
+
+def test_outputs_are_deduplicated_and_compressed(tmp_path):
+    history = RenderHistory(str(tmp_path / 'history.sqlite3'))
+    output = 'kind: ConfigMap\n' * 5000
+    for sample in ('a', 'b', 'a'):
+        history.record('/generate', SAMPLE_YAML, output, True, cache='MISS', sample=sample)
+    history.record('/generate', SAMPLE_YAML + '# edited\n', None, False, error='boom')
+    history.flush()
+
+    stats = history.stats()
+    assert stats['renders'] == 4
+    assert stats['blobs'] == 3  # two inputs, one output
+    assert stats['stored_bytes'] < stats['content_bytes'] / 10
+
+    newest, *_ = history.list()
+    assert newest['success'] is False and newest['error'] == 'boom'
+    assert [entry['sample'] for entry in history.list(sample='a')] == ['a', 'a']
+    matching = history.list(input_hash=content_hash(SAMPLE_YAML))
+    assert len(matching) == 3
+    entry = history.get(matching[0]['id'])
+    assert entry['input'] == SAMPLE_YAML and entry['output'] == output
+
+
+def test_record_does_not_wait_for_the_database(tmp_path):
+    history = RenderHistory(str(tmp_path / 'history.sqlite3'), max_queue=5)
+    # Hold the write lock so the writer thread is stuck
+    blocker = history._connect()
+    blocker.db.execute('BEGIN IMMEDIATE')
+    try:
+        started = time.monotonic()
+        results = [history.record('/generate', f"n: {index}\n", 'x', True) for index in range(20)]
+        assert time.monotonic() - started < 0.5
+        assert results.count(False) >= 14
+    finally:
+        blocker.__exit__(None, None, None)
+    history.flush()
+    assert history.stats()['dropped'] == results.count(False)
+
+
+def test_bad_entries_cost_neither_their_batch_nor_the_writer(tmp_path):
+    history = RenderHistory(str(tmp_path / 'history.sqlite3'))
+    # Held so the three entries queue up and are written as one batch
+    blocker = history._connect()
+    blocker.db.execute('BEGIN IMMEDIATE')
+    try:
+        history.record('/generate', SAMPLE_YAML, 'ok', True, sample='a')
+        history.record('/generate', SAMPLE_YAML, 'ok', True, sample='\ud800')
+        history.record('/generate', SAMPLE_YAML, 'ok', True, sample=['not', 'text'])
+        history.record('/generate', SAMPLE_YAML, 'ok', True, sample='b')
+    finally:
+        blocker.__exit__(None, None, None)
+    history.flush()
+    history.record('/generate', SAMPLE_YAML, 'ok', True, sample='after')
+    history.flush()
+
+    stats = history.stats()
+    assert (stats['recorded'], stats['write_errors'], stats['queue_depth']) == (3, 2, 0)
+    assert [entry['sample'] for entry in history.list()] == ['after', 'b', 'a']
+
+
+def test_blobs_purged_during_a_write_are_stored_again(tmp_path, monkeypatch):
+    history = RenderHistory(str(tmp_path / 'history.sqlite3'))
+    history.record('/generate', SAMPLE_YAML, 'ok', True)
+    history.flush()
+
+    # A purge lands between the writer's blob lookup and its insert
+    connect, calls = history._connect, []
+
+    def connect_racing_a_purge():
+        calls.append(1)
+        if len(calls) == 2:
+            with connect() as db:
+                db.execute('DELETE FROM renders')
+                history._delete_orphans(db)
+        return connect()
+
+    monkeypatch.setattr(history, '_connect', connect_racing_a_purge)
+    history._write([(time.time(), '/generate', None, SAMPLE_YAML, None, 'ok', True, None, 'MISS', 0.1)])
+    monkeypatch.undo()
+
+    entry = history.get(history.list()[0]['id'])
+    assert (entry['input'], entry['output']) == (SAMPLE_YAML, 'ok')
+
+
+def test_purge_by_age_and_size(tmp_path):
+    history = RenderHistory(str(tmp_path / 'history.sqlite3'))
+    for index in range(30):
+        history.record('/generate', f"index: {index}\n", f"output-{index}\n" * 200, True)
+    history.flush()
+    with history._connect() as db:
+        db.execute('UPDATE renders SET created_at = created_at - 3600 WHERE id <= 10')
+
+    assert history.purge(older_than=1800) == {'renders': 10, 'blobs': 20}
+    quota = history.stats()['stored_bytes'] // 2
+    deleted = history.purge(max_bytes=quota)
+    assert deleted['renders'] >= 10
+    assert history.stats()['stored_bytes'] <= quota
+    # The newest renders survive a size purge
+    assert history.list(limit=1)[0]['output_hash'] == content_hash('output-29\n' * 200)
+
+
+def test_history_endpoints(client, stub_kustomize):
+    for sample in ('default.yaml', 'default.yaml', None):
+        client.post('/generate', json={'yaml_content': SAMPLE_YAML, 'sample': sample})
+    client.post('/generate/stream', json={'yaml_content': SAMPLE_YAML + 'nameSuffix: FAIL\n'}).close()
+    app_module.render_history.flush()
+
+    listed = client.get('/history?sample=default.yaml').get_json()
+    assert [entry['cache'] for entry in listed['renders']] == ['HIT', 'MISS']
+    all_renders = client.get('/history?limit=2').get_json()
+    assert all_renders['renders'][0]['route'] == '/generate/stream'
+    assert all_renders['renders'][0]['success'] is False
+    older = client.get(f"/history?limit=2&until={all_renders['next_until']}").get_json()
+    assert len(older['renders']) == 2 and older['next_until'] is not None
+
+    render_id = listed['renders'][-1]['id']
+    entry = client.get(f"/history/{render_id}").get_json()
+    assert entry['input'] == SAMPLE_YAML
+    assert entry['output'] == '---\n' + SAMPLE_YAML
+    assert client.get('/history/999999').status_code == 404
+
+    assert client.post('/history/purge', json={}).status_code == 400
+    assert client.post('/history/purge', json={'older_than': 'old'}).status_code == 400
+    for sample in ('\ud800', 42):
+        response = client.post('/generate', json={'yaml_content': SAMPLE_YAML, 'sample': sample})
+        assert response.status_code == 400
+        assert client.post('/generate/stream', json={'yaml_content': SAMPLE_YAML, 'sample': sample}).status_code == 400
+
+    purged = client.post('/history/purge', json={'older_than': 0}).get_json()
+    assert purged['deleted']['renders'] == 4
+    assert purged['stats']['blobs'] == 0
+
+
+def test_generate_latency_does_not_include_history_writes(client, stub_kustomize, monkeypatch):
+    release = threading.Event()
+    original = app_module.render_history._write
+    monkeypatch.setattr(app_module.render_history, '_write', lambda batch: (release.wait(5), original(batch)))
+    try:
+        started = time.monotonic()
+        assert client.post('/generate', json={'yaml_content': SAMPLE_YAML}).get_json()['success']
+        assert time.monotonic() - started < 2
+    finally:
+        release.set()
+    app_module.render_history.flush()
+    assert app_module.render_history.stats()['renders'] == 1
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the asynchronous render job API
+"""
+
+import time
+
+import pytest
+
+import app as app_module
+from render_jobs import RenderJobQueue
+
+SAMPLE_YAML = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+namespace: admin
+"""
+
+
+@pytest.fixture
+def job_client(client, monkeypatch):
+    queue = RenderJobQueue(lambda yaml_content: app_module._render(yaml_content)[0], workers=1, max_queue=2)
+    monkeypatch.setattr(app_module, 'render_jobs', queue)
+    return client
+
+
+def test_submit_and_long_poll(job_client):
+    submitted = job_client.post('/jobs', json={'yaml_content': SAMPLE_YAML})
+    assert submitted.status_code == 202
+
+    job = job_client.get(f"/jobs/{submitted.json['job_id']}?wait=10").json
+    assert job['status'] == 'done'
+    assert job['result']['success'] is True
+    assert 'namespace: admin' in job['result']['output']
+    assert job['wait_time'] >= 0
+
+
+def test_unknown_job_is_404(job_client):
+    assert job_client.get('/jobs/does-not-exist').status_code == 404
+
+
+def test_queue_full_sheds_load_and_samples_stay_responsive(job_client, monkeypatch):
+    monkeypatch.setenv('STUB_KUSTOMIZE_SLEEP', '0.5')
+    ids = []
+    for i in range(3):
+        response = job_client.post('/jobs', json={'yaml_content': SAMPLE_YAML + f"nameSuffix: -{i}\n"})
+        ids.append(response.json.get('job_id'))
+    statuses = [job_client.post('/jobs', json={'yaml_content': SAMPLE_YAML + 'nameSuffix: -x\n'}).status_code
+                for _ in range(2)]
+    assert 429 in statuses
+
+    started = time.time()
+    assert job_client.get('/samples').status_code == 200
+    assert time.time() - started < 0.4
+
+    stats = job_client.get('/jobs/stats').json
+    assert stats['workers'] == 1
+    assert stats['running'] + stats['queue_depth'] >= 1
+
+    for job_id in ids:
+        if job_id:
+            assert job_client.get(f"/jobs/{job_id}?wait=10").json['status'] == 'done'
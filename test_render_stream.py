@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed /generate output
+"""
+
+import json
+import socket
+import sys
+import threading
+import time
+
+import pytest
+from werkzeug.serving import make_server
+
+import app as app_module
+from render_stream import BuildCancelled, ResourceLimits, StreamingBuild, peer_closed, run_build
+
+SAMPLE_YAML = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+namespace: admin
+"""
+
+
+def _frames(response):
+    return [json.loads(line) for line in response.data.decode().splitlines()]
+
+
+def test_stream_emits_chunks_then_end_frame(client, stub_kustomize):
+    response = client.post('/generate/stream', json={'yaml_content': SAMPLE_YAML})
+    frames = _frames(response)
+    response.close()
+
+    assert response.headers['X-Render-Cache'] == 'MISS'
+    assert frames[-1] == {'type': 'end', 'success': True, 'returncode': 0, 'error': None}
+    assert ''.join(frame['data'] for frame in frames[:-1]) == '---\n' + SAMPLE_YAML
+    assert app_module.build_admission.stats()['in_flight'] == 0
+
+    # The streamed render populated the cache for both endpoints
+    cached = client.post('/generate/stream', json={'yaml_content': SAMPLE_YAML})
+    assert cached.headers['X-Render-Cache'] == 'HIT'
+    assert client.post('/generate', json={'yaml_content': SAMPLE_YAML}).headers['X-Render-Cache'] == 'HIT'
+    assert stub_kustomize() == 1
+
+
+def test_stream_reports_failure_in_end_frame(client):
+    response = client.post('/generate/stream', json={'yaml_content': SAMPLE_YAML + 'nameSuffix: FAIL\n'})
+    end = _frames(response)[-1]
+    response.close()
+    assert end['success'] is False
+    assert end['returncode'] == 1
+    assert 'stub build failed' in end['error']
+
+
+def test_streaming_build_is_incremental_and_bounded():
+    script = ("import sys, time\n"
+              "sys.stdout.write('first\\n'); sys.stdout.flush(); time.sleep(0.5)\n"
+              "sys.stdout.write('x' * 1000000); sys.stderr.write('warn')\n")
+    closed = []
+    build = StreamingBuild([sys.executable, '-c', script], timeout=10, on_close=[lambda: closed.append(True)])
+
+    started = time.monotonic()
+    chunks = build.iter_stdout(chunk_size=4096)
+    assert next(chunks) == 'first\n'
+    assert time.monotonic() - started < 0.45
+    assert all(len(chunk) <= 4096 for chunk in chunks)
+    assert build.returncode == 0 and build.stderr == 'warn'
+
+    build.close()
+    build.close()
+    assert closed == [True]
+
+
+def test_streaming_build_deadline_kills_process():
+    build = StreamingBuild([sys.executable, '-c', 'import time; time.sleep(30)'], timeout=0.2)
+    assert list(build.iter_stdout()) == []
+    assert build.timed_out and build.returncode != 0
+    build.close()
+
+
+def _alive(pid):
+    """True if pid is running (zombies waiting for a reaper count as gone)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def test_deadline_kills_grandchildren(tmp_path):
+    pid_file = tmp_path / 'grandchild.pid'
+    script = ("import subprocess, sys, time\n"
+              "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+              f"open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+              "time.sleep(30)\n")
+    build = StreamingBuild([sys.executable, '-c', script], timeout=0.5)
+    assert list(build.iter_stdout()) == []
+    build.close()
+    assert build.timed_out
+    grandchild = int(pid_file.read_text())
+    deadline = time.monotonic() + 2
+    while _alive(grandchild) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _alive(grandchild)
+
+
+def test_runaway_output_is_truncated():
+    script = "import sys\nfor _ in range(100): sys.stdout.write('x' * 100000)\n"
+    result = run_build([sys.executable, '-c', script], timeout=10,
+                       limits=ResourceLimits(max_output_bytes=1024 * 1024))
+    assert len(result.stdout) == 1024 * 1024
+    assert result.returncode != 0
+    assert 'exceeded the 1048576 byte limit' in result.stderr
+
+
+def test_cpu_and_memory_limits_apply_to_the_build():
+    started = time.monotonic()
+    spin = run_build([sys.executable, '-c', 'while True: pass'], timeout=20,
+                     limits=ResourceLimits(cpu_seconds=1))
+    assert spin.returncode != 0
+    assert time.monotonic() - started < 10
+
+    hog = run_build([sys.executable, '-c', "b = bytearray(2 * 1024 ** 3)"], timeout=20,
+                    limits=ResourceLimits(address_space_bytes=512 * 1024 ** 2))
+    assert hog.returncode != 0 and 'MemoryError' in hog.stderr
+
+
+def test_limits_are_in_place_before_the_build_starts():
+    # A child forked at once (as kustomize forks helm) must already run limited
+    script = "import resource; print(resource.getrlimit(resource.RLIMIT_CPU))"
+    result = run_build([sys.executable, '-c', script], timeout=10, limits=ResourceLimits(cpu_seconds=7))
+    assert result.stdout.strip() == '(7, 7)'
+
+
+def test_should_abort_cancels_the_build():
+    aborted = threading.Event()
+    threading.Timer(0.2, aborted.set).start()
+    started = time.monotonic()
+    with pytest.raises(BuildCancelled):
+        run_build([sys.executable, '-c', 'import time; time.sleep(30)'], timeout=30,
+                  should_abort=aborted.is_set, poll_interval=0.05)
+    assert time.monotonic() - started < 5
+
+
+def test_peer_closed_detects_hangup_but_not_pipelined_data():
+    server, client = socket.socketpair()
+    assert peer_closed(server) is False
+    client.sendall(b'GET / HTTP/1.1\r\n')
+    assert peer_closed(server) is False
+    server.recv(100)
+    client.close()
+    assert peer_closed(server) is True
+    server.close()
+    assert peer_closed(None) is False
+
+
+def test_generate_kills_build_when_client_disconnects(client, stub_kustomize, monkeypatch):
+    monkeypatch.setenv('STUB_KUSTOMIZE_SLEEP', '10')
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cancelled_before = app_module.BUILDS_CANCELLED._snapshot().get((), 0)
+    try:
+        body = json.dumps({'yaml_content': SAMPLE_YAML + 'nameSuffix: -abandoned\n'}).encode()
+        with socket.create_connection(('127.0.0.1', server.server_port)) as connection:
+            connection.sendall(b"POST /generate HTTP/1.1\r\nHost: test\r\nContent-Type: application/json\r\n"
+                               + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            while stub_kustomize() == 0:
+                time.sleep(0.02)
+
+        deadline = time.monotonic() + 5
+        while app_module.BUILDS_CANCELLED._snapshot().get((), 0) == cancelled_before:
+            assert time.monotonic() < deadline, 'build was not cancelled'
+            time.sleep(0.05)
+    finally:
+        server.shutdown()
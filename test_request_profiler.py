@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for Server-Timing headers and sampled request profiling
+"""
+
+import marshal
+import pstats
+
+import pytest
+
+import app as app_module
+from request_profiler import RequestProfiler, UnsafeProfileDir
+
+KUSTOMIZATION = 'kind: Kustomization\nnamespace: prod\n'
+ADMIN = {'Authorization': 'Bearer s3cret'}
+
+
+def _stages(response):
+    return {entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')}
+
+
+def test_server_timing_reports_stages(client, stub_kustomize):
+    generated = client.post('/generate', json={'yaml_content': KUSTOMIZATION})
+    assert {'request_parse', 'parse', 'preflight', 'cache_lookup', 'workspace', 'kustomize', 'cleanup',
+            'serialize', 'total'} <= _stages(generated)
+    # A cache hit never reaches the subprocess
+    cached = client.post('/generate', json={'yaml_content': KUSTOMIZATION})
+    assert 'kustomize' not in _stages(cached) and 'cache_lookup' in _stages(cached)
+
+    assert {'parse', 'payload', 'serialize', 'total'} <= _stages(
+        client.post('/validate', json={'yaml_content': KUSTOMIZATION}))
+    assert {'catalog', 'serialize'} <= _stages(client.get('/samples'))
+    duration = generated.headers['Server-Timing'].split('total;dur=')[1]
+    assert float(duration) > 0
+
+
+def test_admin_endpoints_need_the_token(client, monkeypatch):
+    assert client.get('/admin/profiling').status_code == 404
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 's3cret')
+    assert client.get('/admin/profiling').status_code == 401
+    assert client.get('/admin/profiling', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/admin/profiling', headers=ADMIN).get_json()['sample_rate'] == 0.0
+    assert client.post('/admin/profiling', headers=ADMIN, json={'sample_rate': 2}).status_code == 400
+
+
+def test_sampled_profiles_aggregate_and_keep_the_slowest(client, stub_kustomize, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 's3cret')
+    monkeypatch.setattr(app_module, 'profiler', RequestProfiler(str(tmp_path / 'shared'), max_slowest=2))
+    assert client.get('/admin/profiling/aggregate', headers=ADMIN).status_code == 404
+
+    assert client.post('/admin/profiling', headers=ADMIN, json={'sample_rate': 1}).get_json()['sample_rate'] == 1
+    for index in range(3):
+        client.post('/validate', json={'yaml_content': f'kind: Kustomization\nnamespace: ns{index}\n'})
+    status = client.get('/admin/profiling', headers=ADMIN).get_json()
+    assert status['recent'] == 3
+    slowest = status['slowest']
+    assert len(slowest) == 2
+    assert slowest[0]['duration'] >= slowest[1]['duration']
+    assert slowest[0]['route'] == '/validate' and slowest[0]['status'] == 200
+    assert 'payload' in slowest[0]['stages']
+
+    aggregate = client.get('/admin/profiling/aggregate', headers=ADMIN)
+    assert aggregate.headers['X-Profiled-Requests'] == '3'
+    stats = marshal.loads(aggregate.data)
+    assert any(name == 'validate' for _, _, name in stats)
+    path = tmp_path / 'aggregate.pstats'
+    path.write_bytes(aggregate.data)
+    pstats.Stats(str(path))
+
+    text = client.get(f"/admin/profiling/slowest/{slowest[0]['name']}?format=text&sort=tottime", headers=ADMIN)
+    assert 'function calls' in text.get_data(as_text=True)
+    assert client.get('/admin/profiling/slowest/..%2Fcontrol.json', headers=ADMIN).status_code == 404
+
+    # Another worker sharing the directory picks up the switch
+    other = RequestProfiler(str(tmp_path / 'shared'))
+    assert other.sample_rate == 1
+    client.post('/admin/profiling', headers=ADMIN, json={'sample_rate': 0, 'clear': True})
+    other._next_check = 0
+    assert other.sample() is None
+    assert client.get('/admin/profiling', headers=ADMIN).get_json()['recent'] == 0
+
+
+def test_profiling_off_costs_no_profile(client, monkeypatch):
+    started = []
+    monkeypatch.setattr('cProfile.Profile.enable', lambda self: started.append(1))
+    client.get('/samples')
+    assert started == []
+    assert app_module.profiler.stats()['profiled'] == 0
+
+
+def test_profiler_is_released_when_a_view_raises(client, monkeypatch, tmp_path):
+    profiler = RequestProfiler(str(tmp_path / 'raising'))
+    profiler.set_sample_rate(1)
+    monkeypatch.setattr(app_module, 'profiler', profiler)
+    monkeypatch.setattr(app_module.build_admission, 'stats', lambda: 1 / 0)
+    monkeypatch.setitem(app_module.app.config, 'PROPAGATE_EXCEPTIONS', False)
+    for expected in (1, 2):
+        assert client.get('/admission/stats').status_code == 500
+        assert profiler.stats()['profiled'] == expected
+    assert profiler.slowest()[0]['status'] == 500
+
+
+@pytest.mark.parametrize('rate', [0.0, 1.0])
+def test_sample_rate_bounds(tmp_path, rate):
+    profiler = RequestProfiler(str(tmp_path))
+    profiler.set_sample_rate(rate)
+    profile = profiler.sample()
+    assert (profile is not None) == bool(rate)
+    if profile is not None:
+        profiler.finish(profile, 0.01, route='/x')
+        assert profiler.slowest()[0]['route'] == '/x'
+
+
+def test_refuses_a_directory_others_could_have_filled(tmp_path):
+    shared = tmp_path / 'world-writable'
+    (shared / 'recent').mkdir(parents=True)
+    shared.chmod(0o777)
+    with pytest.raises(UnsafeProfileDir, match='writable by other users'):
+        RequestProfiler(str(shared))
+
+    private = tmp_path / 'private'
+    private.mkdir(mode=0o700)
+    (tmp_path / 'link').symlink_to(private)
+    RequestProfiler(str(private))
+    with pytest.raises(UnsafeProfileDir, match='not a directory'):
+        RequestProfiler(str(tmp_path / 'link'))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory sample catalog and its HTTP caching
+"""
+
+import os
+
+import pytest
+
+import app as app_module
+from sample_catalog import SampleCatalog
+
+
+@pytest.fixture
+def samples_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'samples'
+    directory.mkdir()
+    (directory / 'qoin-helm.yaml').write_text('kind: Kustomization\n')
+    (directory / 'notes.txt').write_text('ignored\n')
+    monkeypatch.setattr(app_module, 'sample_catalog', SampleCatalog(str(directory), poll_interval=0))
+    return directory
+
+
+def test_catalog_detects_changes(samples_dir):
+    catalog = SampleCatalog(str(samples_dir), poll_interval=0)
+    assert [sample.display_name for sample in catalog.list()] == ['Qoin Helm']
+    first_etag = catalog.etag
+    reloads = catalog.reloads
+
+    catalog.list()
+    assert catalog.reloads == reloads
+
+    path = samples_dir / 'qoin-helm.yaml'
+    path.write_text('kind: Kustomization\nnamespace: admin\n')
+    os.utime(path, (1, 1))
+    (samples_dir / 'redis_cluster.yml').write_text('kind: Kustomization\n')
+    assert catalog.get('qoin-helm.yaml').content.endswith('namespace: admin\n')
+    assert catalog.get('redis_cluster.yml').display_name == 'Redis Cluster'
+    assert catalog.etag != first_etag
+
+    os.remove(path)
+    assert catalog.get('qoin-helm.yaml') is None
+
+
+def test_poll_interval_limits_rescans(samples_dir):
+    catalog = SampleCatalog(str(samples_dir), poll_interval=3600)
+    catalog.list()
+    (samples_dir / 'late.yaml').write_text('kind: Kustomization\n')
+    assert catalog.get('late.yaml') is None
+
+
+def test_samples_endpoints_answer_304(client, samples_dir):
+    listing = client.get('/samples')
+    assert listing.json == {'samples': [{'filename': 'qoin-helm.yaml', 'display_name': 'Qoin Helm'}]}
+    assert client.get('/samples', headers={'If-None-Match': listing.headers['ETag']}).status_code == 304
+
+    sample = client.get('/samples/qoin-helm.yaml')
+    assert sample.json == {'content': 'kind: Kustomization\n'}
+    assert 'Last-Modified' in sample.headers
+    assert client.get('/samples/qoin-helm.yaml',
+                      headers={'If-None-Match': sample.headers['ETag']}).status_code == 304
+
+    (samples_dir / 'qoin-helm.yaml').write_text('kind: Kustomization\nnamespace: x\n')
+    os.utime(samples_dir / 'qoin-helm.yaml', (2, 2))
+    assert client.get('/samples/qoin-helm.yaml',
+                      headers={'If-None-Match': sample.headers['ETag']}).status_code == 200
+
+
+def test_bulk_endpoint_and_unknown_files(client, samples_dir):
+    bulk = client.get('/samples/all').json['samples']
+    assert bulk == [{'filename': 'qoin-helm.yaml', 'display_name': 'Qoin Helm', 'size': 20,
+                     'content': 'kind: Kustomization\n'}]
+    assert client.get('/samples/missing.yaml').status_code == 404
+    assert client.get('/samples/notes.txt').status_code == 400
+    assert client.get('/samples/..%2Fapp.yaml').status_code == 404
+
+
+def test_non_utf8_sample_is_skipped(client, samples_dir, caplog):
+    (samples_dir / 'latin1.yaml').write_bytes('namespace: café\n'.encode('latin-1'))
+    assert client.get('/samples').json == {'samples': [{'filename': 'qoin-helm.yaml', 'display_name': 'Qoin Helm'}]}
+    assert [sample['filename'] for sample in client.get('/samples/all').json['samples']] == ['qoin-helm.yaml']
+    assert client.get('/samples/latin1.yaml').status_code == 404
+    # Reported once, not on every rescan
+    assert sum('latin1.yaml' in record.getMessage() for record in caplog.records) == 1
+
+    (samples_dir / 'latin1.yaml').write_text('namespace: café\n', encoding='utf-8')
+    os.utime(samples_dir / 'latin1.yaml', (3, 3))
+    assert client.get('/samples/latin1.yaml').json == {'content': 'namespace: café\n'}
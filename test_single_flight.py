@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for coalescing identical concurrent renders
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as app_module
+from single_flight import SingleFlight
+
+SAMPLE_YAML = """apiVersion: kustomize.config.k8s.io/v1beta1
+kind: Kustomization
+namespace: admin
+"""
+
+
+def run_together(flights, fn, callers, release):
+    """Call fn through flights from several threads, setting release once all have arrived"""
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        futures = [executor.submit(flights.do, 'key', fn) for _ in range(callers)]
+        while flights.stats()['leaders'] + flights.stats()['coalesced'] < callers:
+            pass
+        release.set()
+        return futures
+
+
+def test_concurrent_callers_share_one_call():
+    release = threading.Event()
+    flights = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return 'rendered'
+
+    futures = run_together(flights, work, 5, release)
+    results = [future.result() for future in futures]
+    assert len(calls) == 1
+    assert sorted(leader for _, leader in results) == [False, False, False, False, True]
+    assert {value for value, _ in results} == {'rendered'}
+    assert flights.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 4}
+
+    # The key is forgotten once the leader finishes
+    assert flights.do('key', lambda: 'again') == ('again', True)
+
+
+def test_errors_are_shared_with_waiters():
+    release = threading.Event()
+    flights = SingleFlight()
+
+    def work():
+        release.wait(5)
+        raise RuntimeError('kustomize exploded')
+
+    futures = run_together(flights, work, 3, release)
+    for future in futures:
+        with pytest.raises(RuntimeError, match='kustomize exploded'):
+            future.result()
+    assert flights.stats()['in_flight'] == 0
+
+
+def test_private_errors_make_waiters_run_again():
+    class Cancelled(Exception):
+        pass
+
+    release = threading.Event()
+    flights = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            raise Cancelled('leader cancelled')
+        return 'rendered'
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(flights.do, 'key', work, (Cancelled,)) for _ in range(3)]
+        while flights.stats()['leaders'] + flights.stats()['coalesced'] < 3:
+            pass
+        release.set()
+    # Only the leader sees its error; the waiters run the call again and get a result
+    assert sum(isinstance(future.exception(), Cancelled) for future in futures) == 1
+    assert [future.result()[0] for future in futures if future.exception() is None] == ['rendered', 'rendered']
+    assert 2 <= len(calls) <= 3
+
+
+def test_identical_generate_requests_fork_one_build(client, stub_kustomize, monkeypatch):
+    monkeypatch.setenv('STUB_KUSTOMIZE_SLEEP', '0.5')
+    flights = SingleFlight()
+    monkeypatch.setattr(app_module, 'render_flights', flights)
+
+    def generate():
+        with app_module.app.test_client() as test_client:
+            response = test_client.post('/generate', json={'yaml_content': SAMPLE_YAML})
+            return response.headers['X-Render-Cache'], response.json
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: generate(), range(4)))
+
+    assert stub_kustomize() == 1
+    assert all(payload['success'] and 'namespace: admin' in payload['output'] for _, payload in results)
+    statuses = sorted(status for status, _ in results)
+    # Late arrivals may find the finished render in the cache instead
+    assert statuses.count('MISS') == 1
+    assert set(statuses) <= {'MISS', 'COALESCED', 'HIT'}
+    assert flights.stats()['coalesced'] == statuses.count('COALESCED')
+    assert 'kustomize_builder_renders_coalesced_total' in client.get('/metrics').get_data(as_text=True)
+
+
+def test_shared_failures_and_timeouts(client, stub_kustomize, monkeypatch):
+    monkeypatch.setattr(app_module, 'BUILD_TIMEOUT', 1.0)
+    monkeypatch.setenv('STUB_KUSTOMIZE_SLEEP', '3')
+
+    def generate():
+        with app_module.app.test_client() as test_client:
+            return test_client.post('/generate', json={'yaml_content': SAMPLE_YAML + 'nameSuffix: -slow\n'}).json
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(lambda _: generate(), range(3)))
+    assert stub_kustomize() == 1
+    assert all(result['error'].startswith('Build timed out') for result in results)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk tool version probe cache
+"""
+
+import json
+import os
+
+import tool_versions
+
+COMMANDS = (('kustomize', ['kustomize', 'version']), ('missing', ['no-such-tool-xyz', 'version']))
+
+
+def test_probe_is_cached_by_binary_fingerprint(stub_kustomize, tmp_path):
+    cache_path = str(tmp_path / 'versions.json')
+    assert tool_versions.probe(cache_path, COMMANDS) == 'v5.0.0-stub unknown'
+
+    # Unknown results are not remembered, so a tool installed later is picked up
+    with open(cache_path) as f:
+        cached = json.load(f)
+    assert list(cached) == ['kustomize']
+
+    # Same binary: the stored answer is used without running it
+    cached['kustomize']['version'] = 'v5.0.0-cached'
+    with open(cache_path, 'w') as f:
+        json.dump(cached, f)
+    assert tool_versions.probe(cache_path, COMMANDS) == 'v5.0.0-cached unknown'
+
+    # A replaced binary is probed again
+    binary = tmp_path / 'bin' / 'kustomize'
+    os.utime(binary, ns=(0, binary.stat().st_mtime_ns + 1_000_000_000))
+    assert tool_versions.probe(cache_path, COMMANDS) == 'v5.0.0-stub unknown'
+
+
+def test_probe_without_cache_or_with_unreadable_cache(stub_kustomize, tmp_path):
+    assert tool_versions.probe(None, COMMANDS) == 'v5.0.0-stub unknown'
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{not json')
+    assert tool_versions.probe(str(broken), COMMANDS) == 'v5.0.0-stub unknown'
+    assert 'kustomize' in json.loads(broken.read_text())
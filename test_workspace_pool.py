@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-warmed build workspace pool
+"""
+
+import os
+
+from workspace_pool import WorkspacePool
+
+
+def test_workspaces_are_scrubbed_and_reused(tmp_path):
+    pool = WorkspacePool(1, root=str(tmp_path))
+    outside = tmp_path / 'chart-store'
+    outside.mkdir()
+    (outside / 'Chart.yaml').write_text('name: keep-me\n')
+
+    path = pool.acquire()
+    with open(os.path.join(path, 'kustomization.yaml'), 'w') as f:
+        f.write('kind: Kustomization\n')
+    os.makedirs(os.path.join(path, 'charts', 'qoin-1.0.0'))
+    os.symlink(str(outside), os.path.join(path, 'charts', 'qoin-1.0.0', 'qoin'))
+    os.symlink(str(outside), os.path.join(path, 'linked'))
+    pool.release(path)
+
+    assert os.listdir(path) == []
+    # Symlinked chart directories are unlinked, never followed
+    assert (outside / 'Chart.yaml').exists()
+    assert pool.acquire() == path
+    assert pool.stats()['hits'] == 2
+
+
+def test_exhausted_pool_falls_back_to_temp_dir(tmp_path):
+    pool = WorkspacePool(1, root=str(tmp_path))
+    pooled = pool.acquire()
+    fallback = pool.acquire()
+    assert not fallback.startswith(pool.base)
+    assert pool.stats()['fallbacks'] == 1
+
+    pool.release(fallback)
+    assert not os.path.exists(fallback)
+    pool.release(pooled)
+    assert os.path.isdir(pooled)
+    pool.close()
+    assert not os.path.exists(pool.base)
+
+
+def test_builds_use_the_pool(client):
+    for namespace in ('a', 'b', 'c'):
+        response = client.post('/generate', json={'yaml_content': f"kind: Kustomization\nnamespace: {namespace}\n"})
+        assert response.json['success'] is True
+    stats = client.get('/cache/stats').json['workspace_pool']
+    assert stats['hits'] == 3 and stats['fallbacks'] == 0
+    assert stats['free'] == 2
+    assert all(os.listdir(os.path.join(stats['root'], name)) == [] for name in os.listdir(stats['root']))
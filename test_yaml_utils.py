@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests for the libyaml fast path and /validate memoization
+"""
+
+import pytest
+import yaml
+
+import app as app_module
+import yaml_utils
+
+
+def test_load_and_dump_match_pure_python():
+    with open('samples/full-template.yaml', encoding='utf-8') as f:
+        content = f.read()
+    data = yaml_utils.load(content)
+    assert data == yaml.safe_load(content)
+    values = data['helmCharts'][0]['valuesInline']
+    assert yaml_utils.dump(values, default_flow_style=False, indent=2) == \
+        yaml.dump(values, default_flow_style=False, indent=2)
+
+
+def test_load_errors_keep_pure_python_message():
+    with pytest.raises(yaml.YAMLError) as excinfo:
+        yaml_utils.load('a: [b')
+    with pytest.raises(yaml.YAMLError) as expected:
+        yaml.safe_load('a: [b')
+    assert str(excinfo.value) == str(expected.value)
+
+
+def test_validate_parses_once_per_content(monkeypatch):
+    calls = []
+    real_load = yaml_utils.load
+    monkeypatch.setattr(yaml_utils, 'load', lambda content: calls.append(1) or real_load(content))
+    yaml_utils._parsed.clear()
+    app_module._validate_memo.clear()
+
+    content = ('kind: Kustomization\nhelmCharts:\n- name: qoin\n  repo: https://charts.example\n  version: 1.0.0\n'
+               '  valuesInline:\n    port: 8086\n')
+    client = app_module.app.test_client()
+    first = client.post('/validate', json={'yaml_content': content}).json
+    second = client.post('/validate', json={'yaml_content': content}).json
+
+    assert first == second
+    assert first['valid'] is True
+    assert '--set port=8086' in first['helm_command']
+    assert len(calls) == 1
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+kustomize/helm version probe, cached on disk by binary fingerprint
+
+Running `kustomize version` and `helm version` costs two process spawns on
+every cold start.  The answers only change when the binaries do, so they are
+kept in a small JSON file keyed by each binary's path, size and mtime.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+# (name, command) pairs, in the order the versions are reported
+COMMANDS = (
+    ('kustomize', ['kustomize', 'version']),
+    ('helm', ['helm', 'version', '--short']),
+)
+
+
+def fingerprint(executable):
+    """Identify the binary a command would run, or None if it is not on PATH"""
+    path = shutil.which(executable)
+    if path is None:
+        return None
+    info = os.stat(path)
+    return f"{os.path.realpath(path)}:{info.st_size}:{info.st_mtime_ns}"
+
+
+def run_probe(command, timeout=5):
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        return result.stdout.strip() if result.returncode == 0 else 'unknown'
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return 'unknown'
+
+
+def probe(cache_path=None, commands=COMMANDS):
+    """Return the space-joined tool versions, re-running only probes whose binary changed"""
+    cached = {}
+    if cache_path:
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+
+    versions, entries = [], {}
+    for name, command in commands:
+        key = fingerprint(command[0])
+        entry = cached.get(name)
+        if key is not None and entry and entry.get('fingerprint') == key:
+            version = entry['version']
+        else:
+            version = run_probe(command) if key is not None else 'unknown'
+        if version != 'unknown':
+            # A failed probe is retried next time rather than remembered
+            entries[name] = {'fingerprint': key, 'version': version}
+        versions.append(version)
+
+    if cache_path and entries != cached:
+        _write_atomic(cache_path, entries)
+    return ' '.join(versions)
+
+
+def _write_atomic(path, entries):
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tool-versions-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(temp_path, path)
+    except OSError:
+        # The cache is an optimization; an unwritable location just means probing next time
+        pass
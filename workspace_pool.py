@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Pool of pre-created build workspaces on a RAM-backed filesystem
+"""
+
+import atexit
+import os
+import queue
+import shutil
+import tempfile
+import threading
+
+
+def default_root():
+    """/dev/shm when it is usable, otherwise the regular temp dir"""
+    shm = '/dev/shm'
+    if os.path.isdir(shm) and os.access(shm, os.W_OK | os.X_OK):
+        return shm
+    return tempfile.gettempdir()
+
+
+class WorkspacePool:
+    """Hands out empty directories and scrubs them for reuse
+
+    When every pooled workspace is in use, acquire() falls back to a fresh
+    tempfile.mkdtemp() directory, which release() deletes as before.
+    """
+
+    def __init__(self, size, root=None):
+        self.size = size
+        self.root = root or default_root()
+        self.base = None
+
+        self._free = queue.SimpleQueue()
+        self._pooled = set()
+        self._lock = threading.Lock()
+        self._pid = None
+
+        self.hits = 0
+        self.fallbacks = 0
+        self.scrub_failures = 0
+
+    def acquire(self):
+        """Return an empty, private directory for one build"""
+        self._ensure_pool()
+        try:
+            path = self._free.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.fallbacks += 1
+            return tempfile.mkdtemp()
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def release(self, path):
+        """Scrub a workspace and return it to the pool (or delete a fallback dir)"""
+        if path not in self._pooled:
+            shutil.rmtree(path, ignore_errors=True)
+            return
+        try:
+            self._scrub(path)
+        except OSError:
+            # Never hand out a directory we could not empty; replace it instead
+            with self._lock:
+                self.scrub_failures += 1
+            shutil.rmtree(path, ignore_errors=True)
+            os.mkdir(path, 0o700)
+        self._free.put(path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'root': self.base,
+                'free': self._free.qsize(),
+                'hits': self.hits,
+                'fallbacks': self.fallbacks,
+                'scrub_failures': self.scrub_failures,
+            }
+
+    def close(self):
+        if self.base and self._pid == os.getpid():
+            shutil.rmtree(self.base, ignore_errors=True)
+
+    def _ensure_pool(self):
+        # Each process (e.g. each forked server worker) gets its own pool directory
+        if self._pid == os.getpid() or self.size <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.base = tempfile.mkdtemp(prefix=f"kustomize-builder-{os.getpid()}-", dir=self.root)
+            self._free = queue.SimpleQueue()
+            self._pooled = set()
+            for index in range(self.size):
+                path = os.path.join(self.base, f"ws-{index}")
+                os.mkdir(path, 0o700)
+                self._pooled.add(path)
+                self._free.put(path)
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    @staticmethod
+    def _scrub(path):
+        """Remove everything inside path without following symlinks out of it"""
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+        if os.listdir(path):
+            raise OSError(f"Workspace {path} is not empty after scrubbing")
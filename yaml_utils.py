@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Fast YAML loading and dumping, using libyaml when PyYAML was built with it
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+    LIBYAML = False
+
+
+def load(content):
+    """yaml.safe_load, through libyaml when available"""
+    try:
+        return yaml.load(content, Loader=SafeLoader)
+    except yaml.YAMLError:
+        if not LIBYAML:
+            raise
+        # libyaml's messages omit the source snippet, so re-parse to report the usual error
+        return yaml.safe_load(content)
+
+
+def dump(data, **kwargs):
+    """yaml.safe_dump, through libyaml when available"""
+    return yaml.dump(data, Dumper=SafeDumper, **kwargs)
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class MemoCache:
+    """Small thread-safe LRU keyed by content hash"""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, content, compute):
+        key = content_hash(content)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute(content)
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_parsed = MemoCache()
+
+
+def parse_counts():
+    """(hits, misses) of the load_cached memo"""
+    return _parsed.hits, _parsed.misses
+
+
+def load_cached(content):
+    """Parse content once per distinct input; raises yaml.YAMLError like load()
+
+    The returned document is shared between callers and must not be mutated.
+    """
+    outcome = _parsed.get_or_compute(content, _load_outcome)
+    if isinstance(outcome, yaml.YAMLError):
+        raise outcome
+    return outcome
+
+
+def _load_outcome(content):
+    try:
+        return load(content)
+    except yaml.YAMLError as e:
+        return e